@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Backtest vetorizado das regras de escanteio (requer numpy).
+
+Entrada em colunas (fixture, minuto, cantos casa, cantos fora, liga), vinda
+de uma fita gravada pelo bot (TAPE_RECORD), de um .npz ou gerada sinteticamente.
+Regras e sugestões vêm do mesmo plano compilado que o bot usa (rules.json,
+ou --rules para testar outro arquivo antes de recarregá-lo no bot); as
+liquidações espelham ResultEvaluator.evaluate_suggestion. --verify confere o
+resultado contra as funções escalares.
+
+numpy e pytest não vão para a imagem do bot; ficam em requirements-dev.txt:
+
+    pip install -r requirements-dev.txt
+
+    python backtest.py --tape fita.jsonl.gz
+    python backtest.py --npz temporada.npz --json resultado.json
+    python backtest.py --synthetic 20000 --verify
+    python backtest.py --synthetic 20000 --rules candidato.json
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+os.environ.setdefault("STATE_DB", ":memory:")
+os.environ.setdefault("TEAM_PROFILE_DB", ":memory:")
+import main  # noqa: E402
+
+BetKind = main.BetKind
+
+SIDE_NONE, SIDE_HOME, SIDE_AWAY, SIDE_EVEN, SIDE_BOTH = 0, 1, 2, 3, 4
+SIDE_NAMES = {SIDE_HOME: "Mandante", SIDE_AWAY: "Visitante", SIDE_EVEN: "Equilibrado"}
+
+# Resultado por sugestão: 1 GREEN, -1 RED, 0 pendente / não sugerida, 2 anulada
+GREEN, RED, PENDING, VOID = 1, -1, 0, 2
+
+# =========================================================
+# DADOS
+# =========================================================
+
+class Snapshots:
+    """
+    Snapshots ordenados por (fixture, minuto), com liquidação derivada:
+    último snapshot = final, último snapshot até o minuto 45 = intervalo
+    """
+    def __init__(self, fixture, minute, home, away, league=None):
+        order = np.lexsort((minute, fixture))
+        self.fixture = np.asarray(fixture, dtype=np.int64)[order]
+        self.minute = np.asarray(minute, dtype=np.int64)[order]
+        self.home = np.asarray(home, dtype=np.int64)[order]
+        self.away = np.asarray(away, dtype=np.int64)[order]
+        self.league = (np.asarray(league, dtype=object)[order] if league is not None
+                       else np.full(len(order), "?", dtype=object))
+
+        self.fixtures, self.first_row = np.unique(self.fixture, return_index=True)
+        self.fix_idx = np.searchsorted(self.fixtures, self.fixture)
+        last_row = np.r_[self.first_row[1:], len(self.fixture)] - 1
+        self.final_home = self.home[last_row]
+        self.final_away = self.away[last_row]
+
+        # Intervalo: total do último snapshot com minuto <= 45 (None se não houver)
+        first_half = np.flatnonzero(self.minute <= 45)
+        self.ht_total = np.full(len(self.fixtures), -1, dtype=np.int64)
+        if len(first_half):
+            fh_fix = self.fix_idx[first_half]
+            last_fh = np.r_[np.flatnonzero(np.diff(fh_fix)), len(fh_fix) - 1]
+            rows = first_half[last_fh]
+            self.ht_total[self.fix_idx[rows]] = self.home[rows] + self.away[rows]
+
+        self.rate_10 = recent_rate(self, 10)
+
+    def __len__(self):
+        return len(self.fixture)
+
+def recent_rate(snap: Snapshots, minutes: int) -> np.ndarray:
+    """
+    Ritmo dos últimos `minutes` minutos em cada linha, como CornerSeries.window:
+    parte do último snapshot do jogo até minuto - minutes (ou do primeiro).
+    NaN enquanto o jogo só tem um minuto de histórico
+    """
+    start = snap.first_row[snap.fix_idx]
+    stride = int(snap.minute.max(initial=0)) + minutes + 1
+    keys = snap.fix_idx * stride + snap.minute + minutes
+    ref = np.maximum(np.searchsorted(keys, snap.fix_idx * stride + snap.minute, side="right") - 1, start)
+    total = snap.home + snap.away
+    span = snap.minute - snap.minute[ref]
+    rate = np.where(span > 0, (total - total[ref]) / np.maximum(span, 1), 0.0)
+    return np.where(snap.minute == snap.minute[start], np.nan, rate)
+
+def load_tape(path: str) -> Snapshots:
+    cols: Dict[str, List] = {"fixture": [], "minute": [], "home": [], "away": [], "league": []}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec.get("status") != 200:
+                continue
+            path_ = rec["path"]
+            params = rec["params"]
+            if path_ != "/fixtures" or "ids" not in params:
+                continue
+            for item in json.loads(rec["body"]).get("response", []):
+                minute = item["fixture"]["status"].get("elapsed")
+                if minute is None:
+                    continue
+                stats = main.parse_corner_stats(item.get("statistics", []))
+                cols["fixture"].append(item["fixture"]["id"])
+                cols["minute"].append(minute)
+                cols["home"].append(stats["corners_home"])
+                cols["away"].append(stats["corners_away"])
+                cols["league"].append(item.get("league", {}).get("name", "?"))
+    return Snapshots(**cols)
+
+def load_npz(path: str) -> Snapshots:
+    data = np.load(path, allow_pickle=True)
+    league = data["league"] if "league" in data.files else None
+    return Snapshots(data["fixture"], data["minute"], data["home"], data["away"], league)
+
+def synthetic(n_fixtures: int, seed: int = 7) -> Snapshots:
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(1, 91)
+    rate = rng.uniform(0.05, 0.2, size=(n_fixtures, 1))
+    share = rng.uniform(0.3, 0.7, size=(n_fixtures, 1))
+    events = rng.random((n_fixtures, len(minutes))) < rate
+    to_home = rng.random((n_fixtures, len(minutes))) < share
+    home = np.cumsum(events & to_home, axis=1)
+    away = np.cumsum(events & ~to_home, axis=1)
+    leagues = np.array(main.PRIORITY_LEAGUES, dtype=object)
+    fixture = np.repeat(np.arange(n_fixtures), len(minutes))
+    return Snapshots(
+        fixture, np.tile(minutes, n_fixtures), home.ravel(), away.ravel(),
+        leagues[fixture % len(leagues)],
+    )
+
+# =========================================================
+# REGRAS E SUGESTÕES (VETORIZADAS)
+# =========================================================
+
+def rule_masks(minute: np.ndarray, home: np.ndarray, away: np.ndarray, rate_10: np.ndarray,
+               plan: main.RulePlan) -> np.ndarray:
+    """
+    Matriz booleana (regras, n) com os predicados compartilhados do plano
+    (rate_10 NaN nunca passa, como o bot sem histórico)
+    """
+    total = home + away
+    columns = {
+        "minute": minute,
+        "total": total,
+        "diff": np.abs(home - away),
+        "each": np.minimum(home, away),
+        "rate": total / np.maximum(minute, 1),
+        "rate_10": rate_10,
+    }
+    predicates = [columns[c] >= v if op == ">=" else columns[c] <= v for c, op, v in plan.predicates]
+    return np.stack([np.logical_and.reduce([predicates[i] for i in preds]) for preds in plan.rule_predicates])
+
+def entries(snap: Snapshots, masks: np.ndarray) -> np.ndarray:
+    """
+    Primeira linha de cada jogo com alguma regra (minuto >= 10, como no bot)
+    """
+    hit = masks.any(axis=0) & (snap.minute >= 10)
+    _, first = np.unique(snap.fixture[hit], return_index=True)
+    return np.flatnonzero(hit)[first]
+
+def suggestion_sides(home: np.ndarray, away: np.ndarray, minute: np.ndarray, entry_masks: np.ndarray,
+                     plan: main.RulePlan) -> np.ndarray:
+    """
+    Matriz (sugestões, n) com o lado sugerido por aposta (SIDE_NONE = não sugerida)
+    """
+    total = home + away
+    lead = np.where(home > away, SIDE_HOME, np.where(away > home, SIDE_AWAY, SIDE_EVEN))
+    sides = []
+    for spec in plan.suggestions:
+        ok = np.ones(len(home), dtype=bool)
+        if spec.requires_rule:
+            ok &= entry_masks[[spec.requires_rule in name for name in plan.names]].any(axis=0)
+        if spec.max_minute is not None:
+            ok &= minute <= spec.max_minute
+        if spec.min_total:
+            ok &= total >= spec.min_total
+        if spec.side == "lead":
+            ok &= lead != SIDE_EVEN
+        side = lead if spec.side in ("next", "lead") else SIDE_EVEN
+        sides.append(np.where(ok, side, SIDE_NONE))
+    return np.stack(sides) if sides else np.zeros((0, len(home)), dtype=np.int64)
+
+def next_corner_side(snap: Snapshots, entry_rows: np.ndarray) -> np.ndarray:
+    """
+    Lado do primeiro escanteio após cada entrada (SIDE_NONE se não houve,
+    SIDE_BOTH se os dois lados mudaram na mesma leitura)
+    """
+    entry_of_fixture = np.full(len(snap.fixtures), -1, dtype=np.int64)
+    entry_of_fixture[snap.fix_idx[entry_rows]] = entry_rows
+    row_entry = entry_of_fixture[snap.fix_idx]
+    valid = row_entry >= 0
+    rows = np.arange(len(snap))
+    after = valid & (rows > row_entry)
+    safe_entry = np.where(valid, row_entry, 0)
+    inc_home = after & (snap.home > snap.home[safe_entry])
+    inc_away = after & (snap.away > snap.away[safe_entry])
+
+    changed = np.flatnonzero(inc_home | inc_away)
+    result = np.full(len(entry_rows), SIDE_NONE, dtype=np.int64)
+    if len(changed):
+        fix, first = np.unique(snap.fix_idx[changed], return_index=True)
+        first_rows = changed[first]
+        side = np.where(inc_home[first_rows], np.where(inc_away[first_rows], SIDE_BOTH, SIDE_HOME), SIDE_AWAY)
+        pos = np.searchsorted(snap.fix_idx[entry_rows], fix)
+        result[pos] = side
+    return result
+
+def settle(snap: Snapshots, entry_rows: np.ndarray, sides: np.ndarray, plan: main.RulePlan) -> np.ndarray:
+    """
+    Matriz (sugestões, n_entradas) com GREEN / RED / PENDING por aposta
+    """
+    fix = snap.fix_idx[entry_rows]
+    home0 = snap.home[entry_rows]
+    away0 = snap.away[entry_rows]
+    final_home = snap.final_home[fix]
+    final_away = snap.final_away[fix]
+    ht_total = snap.ht_total[fix]
+
+    outcome = np.zeros_like(sides)
+
+    nxt = next_corner_side(snap, entry_rows)
+    for b, spec in enumerate(plan.suggestions):
+        suggested = sides[b] != SIDE_NONE
+        kind = BetKind.of(spec.bet_type)
+        if kind is BetKind.NEXT_CORNER:
+            green = (sides[b] == SIDE_EVEN) | (sides[b] == nxt)
+            result = np.where(green, GREEN, np.where(nxt == SIDE_BOTH, VOID, RED))
+            outcome[b] = np.where(suggested & (nxt != SIDE_NONE), result, PENDING)
+        elif kind is BetKind.TEAM_CORNERS:
+            green = np.where(sides[b] == SIDE_HOME, final_home > home0, final_away > away0)
+            outcome[b] = np.where(suggested, np.where(green, GREEN, RED), PENDING)
+        elif kind is BetKind.OVER_HT:
+            outcome[b] = np.where(suggested & (ht_total >= 0), np.where(ht_total >= 5, GREEN, RED), PENDING)
+        else:
+            outcome[b] = np.where(suggested, np.where(final_home + final_away >= 10, GREEN, RED), PENDING)
+    return outcome
+
+# =========================================================
+# RELATÓRIO
+# =========================================================
+
+def run(snap: Snapshots, plan: main.RulePlan) -> Dict:
+    t0 = time.perf_counter()
+    masks = rule_masks(snap.minute, snap.home, snap.away, snap.rate_10, plan)
+    rows = entries(snap, masks)
+    entry_masks = masks[:, rows]
+    sides = suggestion_sides(snap.home[rows], snap.away[rows], snap.minute[rows], entry_masks, plan)
+    outcome = settle(snap, rows, sides, plan)
+    elapsed = time.perf_counter() - t0
+
+    greens = (outcome == GREEN).sum(axis=0)
+    reds = (outcome == RED).sum(axis=0)
+
+    def rates(g: int, r: int) -> Dict:
+        return {"green": int(g), "red": int(r), "winrate": round(100 * g / (g + r), 1) if g + r else None}
+
+    per_rule = {name: rates(greens[entry_masks[i]].sum(), reds[entry_masks[i]].sum())
+                for i, name in enumerate(plan.names)}
+    per_bet = {spec.bet_type: rates((outcome[i] == GREEN).sum(), (outcome[i] == RED).sum())
+               for i, spec in enumerate(plan.suggestions)}
+    leagues = snap.league[rows]
+    per_league = {str(lg): rates(greens[leagues == lg].sum(), reds[leagues == lg].sum())
+                  for lg in sorted(set(leagues))}
+
+    return {
+        "rules": plan.source,
+        "snapshots": len(snap),
+        "fixtures": len(snap.fixtures),
+        "entries": len(rows),
+        "seconds": round(elapsed, 4),
+        "per_rule": per_rule,
+        "per_bet": per_bet,
+        "per_league": per_league,
+        "_rows": rows,
+        "_masks": masks,
+        "_sides": sides,
+        "_outcome": outcome,
+    }
+
+def print_report(report: Dict):
+    print(f"{report['snapshots']} snapshots | {report['fixtures']} jogos | "
+          f"{report['entries']} entradas | {report['seconds']}s")
+    for title, key in (("Regra", "per_rule"), ("Aposta", "per_bet"), ("Liga", "per_league")):
+        print(f"\n{title:<32} {'GREEN':>7} {'RED':>7} {'WR%':>6}")
+        for name, r in report[key].items():
+            wr = f"{r['winrate']:.1f}" if r["winrate"] is not None else "-"
+            print(f"{name:<32} {r['green']:>7} {r['red']:>7} {wr:>6}")
+
+# =========================================================
+# VERIFICAÇÃO CONTRA AS FUNÇÕES ESCALARES
+# =========================================================
+
+def verify(snap: Snapshots, report: Dict, plan: main.RulePlan, sample: Optional[int] = None) -> int:
+    masks = report["_masks"]
+    rows = np.arange(len(snap))
+    if sample and sample < len(rows):
+        rows = np.random.default_rng(0).choice(rows, sample, replace=False)
+
+    # Ritmo recente pela CornerSeries do bot, jogo a jogo em ordem de minuto
+    rates: List[Optional[float]] = []
+    series = None
+    for i in range(len(snap)):
+        if series is None or snap.fix_idx[i] != snap.fix_idx[i - 1]:
+            series = main.CornerSeries()
+        series.append(int(snap.minute[i]), int(snap.home[i]), int(snap.away[i]))
+        rates.append(series.features()["rate_10"] if series.size >= 2 else None)
+
+    errors = 0
+    snapshots = [(int(snap.minute[i]), int(snap.home[i]), int(snap.away[i])) for i in rows]
+    batch = plan.evaluate_batch(snapshots, [rates[i] for i in rows])
+    for i, (m, h, a), batch_hits in zip(rows, snapshots, batch):
+        expected = plan.evaluate(m, h + a, h, a, rates[i])
+        got = [plan.names[k] for k in range(len(plan.names)) if masks[k, i]]
+        if not (expected == got == batch_hits):
+            errors += 1
+            if errors <= 10:
+                print(f"regras divergem na linha {i} ({m}', {h}x{a}): {expected} != {got} / lote {batch_hits}")
+
+    # Sugestões e liquidação de cada entrada, passando pelo avaliador escalar
+    for j, row in enumerate(report["_rows"]):
+        fix = snap.fix_idx[row]
+        m, h, a = int(snap.minute[row]), int(snap.home[row]), int(snap.away[row])
+        stats = {"corners_home": h, "corners_away": a, "corners_total": h + a}
+        rules_hit = plan.evaluate(m, h + a, h, a, rates[row])
+        suggestions = main.IntelligentAnalyzer.generate_suggestions(stats, rules_hit, m, "H", "A", plan=plan)
+
+        md = main.MatchData(int(snap.fixtures[fix]), "H", "A", "L", 1, m, h, a)
+        md.is_finished = True
+        md.final_corners_home = int(snap.final_home[fix])
+        md.final_corners_away = int(snap.final_away[fix])
+        ht = int(snap.ht_total[fix])
+        md.half_time_corners = ht if ht >= 0 else None
+        later = np.flatnonzero((snap.fix_idx == fix) & (np.arange(len(snap)) > row))
+        for k in later:
+            if snap.home[k] > h and snap.away[k] > a:
+                md.next_corner_after_entry = main.NEXT_CORNER_BOTH
+                break
+            if snap.home[k] > h:
+                md.next_corner_after_entry = "Mandante"
+                break
+            if snap.away[k] > a:
+                md.next_corner_after_entry = "Visitante"
+                break
+
+        expected = {}
+        for sug in suggestions:
+            result = main.ResultEvaluator.evaluate_suggestion(sug, md)
+            expected[[s.bet_type for s in plan.suggestions].index(sug.bet_type)] = (
+                sug.side or SIDE_NAMES[SIDE_EVEN], result)
+
+        got = {}
+        for b in range(len(plan.suggestions)):
+            side = int(report["_sides"][b, j])
+            if side == SIDE_NONE:
+                continue
+            res = {GREEN: "GREEN", RED: "RED", PENDING: None, VOID: "VOID"}[int(report["_outcome"][b, j])]
+            got[b] = (SIDE_NAMES[side], res)
+
+        if expected != got:
+            errors += 1
+            if errors <= 10:
+                print(f"liquidação diverge no jogo {md.fixture_id}: {expected} != {got}")
+
+    print(f"Verificação: {len(rows)} snapshots, {len(report['_rows'])} entradas, {errors} divergências")
+    return errors
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest vetorizado das regras de escanteio")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--tape", help="fita gzip gravada com TAPE_RECORD")
+    src.add_argument("--npz", help="arquivo .npz com fixture, minute, home, away [, league]")
+    src.add_argument("--synthetic", type=int, metavar="N", help="gera N jogos sintéticos")
+    parser.add_argument("--verify", action="store_true", help="confere contra as funções escalares")
+    parser.add_argument("--verify-sample", type=int, metavar="N", help="verifica só N snapshots aleatórios")
+    parser.add_argument("--rules", help="arquivo de regras (padrão: o mesmo do bot)")
+    parser.add_argument("--json", help="grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            plan = main.compile_rules(json.load(f), args.rules)
+    else:
+        plan = main.rule_engine.plan
+
+    if args.tape:
+        snap = load_tape(args.tape)
+    elif args.npz:
+        snap = load_npz(args.npz)
+    else:
+        snap = synthetic(args.synthetic)
+
+    report = run(snap, plan)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in report.items() if not k.startswith("_")}, f, ensure_ascii=False, indent=2)
+
+    if args.verify:
+        return 1 if verify(snap, report, plan, args.verify_sample) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+Benchmark do main_loop contra servidores locais que imitam a API-Football
+(v3.football.api-sports.io) e o Bot API do Telegram.
+
+Cada escala roda num subprocesso próprio (RSS e estado global isolados).
+O intervalo entre ciclos é pulado por um relógio virtual; pausas curtas
+(backoff, 429) continuam reais. Por padrão todo jogo é consultado em todo
+ciclo (pior caso); --policy mantém a cadência de produção.
+
+    python benchmark.py
+    python benchmark.py --fixtures 10 200 --cycles 20 --latency 0.05 --error-rate 0.02
+    python benchmark.py --json atual.json --compare base.json
+    python benchmark.py --decode 300 1000     # só decodificação: tempo e pico de memória
+    python benchmark.py --memory 10000        # bytes retidos por jogo acompanhado
+    python benchmark.py --fixtures 200 --chats 500   # mesmo custo de API com 500 chats assinando
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import gc
+import argparse
+import logging
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_SCALES = [10, 100, 500, 1000, 2000]
+REAL_SLEEP_MAX = 10      # pausas até este tamanho são esperadas de verdade
+LAG_PROBE_INTERVAL = 0.01
+
+# (nome, país) como a API-Football devolve; as dez primeiras são as prioritárias
+LEAGUES = [
+    ("Premier League", "England"), ("La Liga", "Spain"), ("Serie A", "Italy"),
+    ("Bundesliga", "Germany"), ("Ligue 1", "France"), ("UEFA Champions League", "World"),
+    ("UEFA Europa League", "World"), ("Serie A", "Brazil"), ("Championship", "England"),
+    ("Eredivisie", "Netherlands"),
+]
+OTHER_LEAGUES = [
+    ("League One", "England"), ("Segunda División", "Spain"), ("Serie B", "Italy"),
+    ("2. Bundesliga", "Germany"), ("Primeira Liga", "Portugal"), ("Serie B", "Brazil"),
+]
+ALL_LEAGUES = LEAGUES + OTHER_LEAGUES
+
+# =========================================================
+# SERVIDORES FALSOS
+# =========================================================
+
+class StubApiFootball:
+    """
+    /fixtures (live=all|ids, ids=, date=), /fixtures/statistics e /leagues com
+    latência, taxa de erro e rajadas de 429 configuráveis. Cada live= avança o
+    relógio dos jogos; jogos encerrados são trocados por novos para manter N ao
+    vivo. other_share acrescenta jogos de ligas fora da lista prioritária
+    """
+    def __init__(self, n: int, latency: float, jitter: float, error_rate: float,
+                 burst_every: int, burst_len: int, minutes_per_cycle: int, seed: int,
+                 other_share: float = 0.0):
+        self.rng = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_len = burst_len
+        self.minutes_per_cycle = minutes_per_cycle
+        self.next_id = 1
+        self.fixtures: Dict[int, Dict] = {}
+        for _ in range(n):
+            self._new_fixture(self.rng.randint(10, 85))
+        for _ in range(int(n * other_share)):
+            self._new_fixture(self.rng.randint(10, 85), other=True)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.by_endpoint: Dict[str, int] = {}
+        self.by_key: Dict[str, int] = {}
+
+    def _new_fixture(self, minute: int, other: bool = False):
+        fid = self.next_id
+        self.next_id += 1
+        rate = self.rng.uniform(0.05, 0.2)
+        league = OTHER_LEAGUES[fid % len(OTHER_LEAGUES)] if other else LEAGUES[fid % len(LEAGUES)]
+        self.fixtures[fid] = {
+            "id": fid,
+            "league": league,
+            "minute": minute,
+            "rate": rate,
+            "corners": [int(minute * rate * 0.6), int(minute * rate * 0.4)],
+        }
+
+    def _advance(self):
+        for fid in list(self.fixtures):
+            f = self.fixtures[fid]
+            for _ in range(self.minutes_per_cycle):
+                if self.rng.random() < f["rate"]:
+                    f["corners"][0 if self.rng.random() < 0.55 else 1] += 1
+            f["minute"] += self.minutes_per_cycle
+            if f["minute"] > 95:
+                del self.fixtures[fid]
+                self._new_fixture(1, other=f["league"] in OTHER_LEAGUES)
+
+    def _fixture_json(self, f: Dict, with_stats: bool = False) -> Dict:
+        minute = min(f["minute"], 90)
+        item = {
+            "fixture": {"id": f["id"], "timestamp": int(time.time()) - minute * 60,
+                        "status": {"short": "1H" if minute <= 45 else "2H", "elapsed": minute}},
+            "league": {"id": ALL_LEAGUES.index(f["league"]) + 1, "name": f["league"][0],
+                       "country": f["league"][1]},
+            "teams": {"home": {"id": f["id"] * 2, "name": f"Casa {f['id']}"},
+                      "away": {"id": f["id"] * 2 + 1, "name": f"Fora {f['id']}"}},
+            "goals": {"home": 0, "away": 0},
+            "score": {},
+        }
+        if with_stats:
+            item["statistics"] = [
+                {"team": {}, "statistics": [{"type": "Corner Kicks", "value": f["corners"][0]}]},
+                {"team": {}, "statistics": [{"type": "Corner Kicks", "value": f["corners"][1]}]},
+            ]
+        return item
+
+    async def _gate(self, request: web.Request, endpoint: str) -> Optional[web.Response]:
+        self.requests += 1
+        self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+        key = request.headers.get("x-apisports-key", "")
+        self.by_key[key] = self.by_key.get(key, 0) + 1
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.burst_every and self.requests % self.burst_every < self.burst_len:
+            self.throttled += 1
+            return web.Response(status=429, text="Too many requests", headers={"Retry-After": "1"})
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=500, text="Internal error")
+        return None
+
+    async def fixtures_handler(self, request: web.Request) -> web.Response:
+        q = request.query
+        endpoint = "live" if "live" in q else "ids" if "ids" in q else "date"
+        failure = await self._gate(request, endpoint)
+        if failure:
+            return failure
+        if "live" in q:
+            self._advance()
+            wanted = None if q["live"] == "all" else {int(x) for x in q["live"].split("-") if x}
+            return web.json_response({"response": [
+                self._fixture_json(f) for f in self.fixtures.values()
+                if wanted is None or ALL_LEAGUES.index(f["league"]) + 1 in wanted
+            ]})
+        if "ids" in q:
+            ids = [int(x) for x in q["ids"].split("-") if x]
+            return web.json_response({"response": [
+                self._fixture_json(self.fixtures[fid], with_stats=True) for fid in ids if fid in self.fixtures
+            ]})
+        return web.json_response({"response": [self._fixture_json(f) for f in self.fixtures.values()]})
+
+    async def statistics_handler(self, request: web.Request) -> web.Response:
+        failure = await self._gate(request, "statistics")
+        if failure:
+            return failure
+        f = self.fixtures.get(int(request.query.get("fixture", 0)))
+        return web.json_response({"response": self._fixture_json(f, True)["statistics"] if f else []})
+
+    async def leagues_handler(self, request: web.Request) -> web.Response:
+        failure = await self._gate(request, "leagues")
+        if failure:
+            return failure
+        return web.json_response({"response": [
+            {"league": {"id": i + 1, "name": name}, "country": {"name": country}}
+            for i, (name, country) in enumerate(ALL_LEAGUES)
+        ]})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/leagues", self.leagues_handler)
+        app.router.add_get("/fixtures", self.fixtures_handler)
+        app.router.add_get("/fixtures/statistics", self.statistics_handler)
+        return app
+
+class StubTelegram:
+    """
+    Bot API mínimo: sendMessage, editMessageText e getMe
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.next_id = 1
+        self.sends = 0
+        self.edits = 0
+        self.alerts = 0
+
+    async def handler(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}})
+
+        text = str(data.get("text", ""))
+        chat = {"id": int(data.get("chat_id", 1)), "type": "group", "title": "bench"}
+        if method == "sendMessage":
+            message_id = self.next_id
+            self.next_id += 1
+            self.sends += 1
+            if text.lstrip().startswith("🚨"):
+                self.alerts += 1
+        elif method == "editMessageText":
+            message_id = int(data.get("message_id", 0))
+            self.edits += 1
+        else:
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found"}, status=404)
+
+        return web.json_response({"ok": True, "result": {
+            "message_id": message_id, "date": int(time.time()), "chat": chat, "text": text}})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handler)
+        return app
+
+async def serve(app: web.Application) -> (web.AppRunner, int):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+# =========================================================
+# EXECUÇÃO DE UMA ESCALA (SUBPROCESSO)
+# =========================================================
+
+def pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+def summarize_ms(values: List[float]) -> Dict:
+    return {
+        "p50": round(pct(values, 50) * 1000, 2),
+        "p90": round(pct(values, 90) * 1000, 2),
+        "p99": round(pct(values, 99) * 1000, 2),
+        "max": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+async def run_one(args, n: int) -> Dict:
+    api = StubApiFootball(n, args.latency, args.jitter, args.error_rate,
+                          args.burst_every, args.burst_len, args.minutes_per_cycle, args.seed,
+                          args.other_share)
+    tg = StubTelegram(args.tg_latency)
+    api_runner, api_port = await serve(api.app())
+    tg_runner, tg_port = await serve(tg.app())
+
+    # Chats extras assinando tudo, metade em inglês, além do CHAT_ID
+    subscriptions_file = ""
+    if args.chats:
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+            json.dump({"chats": [{"chat_id": 1000 + i, "language": "en" if i % 2 else "pt"}
+                                 for i in range(args.chats)]}, f)
+        subscriptions_file = f.name
+
+    os.environ.update({
+        "API_BASE": f"http://127.0.0.1:{api_port}",
+        "TELEGRAM_API_BASE": f"http://127.0.0.1:{tg_port}/bot",
+        "API_KEYS": ",".join(f"bench{i}" for i in range(args.keys)),
+        "TELEGRAM_TOKEN": "123456:bench",
+        "CHAT_ID": "1",
+        "STATE_DB": ":memory:",
+        "TEAM_PROFILE_DB": ":memory:",
+        "SUBSCRIPTIONS_FILE": subscriptions_file,
+    })
+    import main
+
+    class BenchClock(main.ReplayClock):
+        # Só o intervalo entre ciclos é pulado; as tarefas de fundo rodam
+        # com pausas reais (ver CACHE_SWEEP_INTERVAL abaixo) e o SQLite na
+        # thread, como em produção. Antes de pular, o pipeline termina o
+        # ciclo, como faria durante a espera real
+        run_blocking = main.Clock.run_blocking
+
+        async def sleep(self, seconds: float):
+            seconds = max(seconds, 0)
+            target = self._now + seconds
+            if seconds > REAL_SLEEP_MAX and main.pipeline:
+                await main.pipeline.drain()
+            await asyncio.sleep(seconds if seconds <= REAL_SLEEP_MAX else 0)
+            self._now = max(self._now, target)
+
+    main.logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    main.clock = BenchClock(time.time())
+    main.CACHE_SWEEP_INTERVAL = main.PROFILE_CHECK_INTERVAL = REAL_SLEEP_MAX
+    for key in main.req_counter.keys:
+        key.counter.daily_limit = 10 ** 9
+    main.smart_cache._live_cache_ttl = 0
+    main.outbox.bucket = main.TokenBucket(10 ** 6, 10 ** 6)
+    main.outbox.chat_rate = main.outbox.chat_burst = 10 ** 6
+    if not args.policy:
+        main.FIXTURE_POLL_WARM = main.FIXTURE_POLL_COLD = main.FIXTURE_POLL_RARE = 0
+
+    lags: List[float] = []
+
+    async def lag_probe():
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lags.append(max(time.perf_counter() - t0 - LAG_PROBE_INTERVAL, 0.0))
+
+    cycles: List[Dict] = []
+    probe = asyncio.create_task(lag_probe())
+    background = main.start_background_tasks()
+    t0 = time.perf_counter()
+    try:
+        await main.main_loop(max_cycles=args.cycles, on_cycle=cycles.append)
+        try:
+            await asyncio.wait_for(main.outbox.drain(), timeout=30)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        wall = time.perf_counter() - t0
+        probe.cancel()
+        for task in background:
+            task.cancel()
+        await api_runner.cleanup()
+        await tg_runner.cleanup()
+        if subscriptions_file:
+            os.unlink(subscriptions_file)
+
+    steady = cycles[1:] or cycles
+    durations = [c["seconds"] for c in steady]
+    return {
+        "fixtures": n,
+        "cycles": len(cycles),
+        "wall_seconds": round(wall, 3),
+        "first_cycle_ms": round(cycles[0]["seconds"] * 1000, 2) if cycles else None,
+        "cycle_ms": summarize_ms(durations),
+        "processed_per_cycle": round(sum(c["processed"] for c in steady) / max(len(steady), 1), 1),
+        "requests_per_cycle": round(sum(c["requests"] for c in steady) / max(len(steady), 1), 2),
+        "kb_per_cycle": round(sum(c["bytes"] for c in steady) / 1024 / max(len(steady), 1), 1),
+        "parse_ms_per_cycle": round(sum(c["parse_seconds"] for c in steady) * 1000 / max(len(steady), 1), 2),
+        "stub_requests": api.requests,
+        "stub_requests_by_endpoint": api.by_endpoint,
+        "stub_requests_by_key": api.by_key,
+        "stub_errors": api.errors,
+        "stub_429": api.throttled,
+        "chats": len(main.subscriptions.index),
+        "alerts": tg.alerts,
+        "alerts_per_sec": round(tg.alerts / wall, 2) if wall else 0.0,
+        "telegram_calls": tg.sends + tg.edits,
+        "loop_lag_ms": summarize_ms(lags),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+# =========================================================
+# DECODIFICAÇÃO
+# =========================================================
+
+def realistic_fixture(fid: int, rng: random.Random) -> Dict:
+    """
+    Item de /fixtures com o volume de uma resposta real: eventos, escalações,
+    estatísticas completas e jogadores
+    """
+    def team(side: int) -> Dict:
+        return {"id": fid * 2 + side, "name": f"Time {fid}-{side}",
+                "logo": f"https://media.api-sports.io/football/teams/{fid * 2 + side}.png", "winner": None}
+
+    stat_types = ["Shots on Goal", "Shots off Goal", "Total Shots", "Blocked Shots", "Shots insidebox",
+                  "Shots outsidebox", "Fouls", "Corner Kicks", "Offsides", "Ball Possession", "Yellow Cards",
+                  "Red Cards", "Goalkeeper Saves", "Total passes", "Passes accurate", "Passes %",
+                  "expected_goals", "goals_prevented"]
+    players = [{"player": {"id": fid * 100 + i, "name": f"Jogador {i}", "number": i, "pos": "M", "grid": None}}
+               for i in range(18)]
+    return {
+        "fixture": {"id": fid, "referee": "Árbitro", "timezone": "UTC", "date": "2026-10-17T15:00:00+00:00",
+                    "timestamp": 1_760_713_200, "periods": {"first": 1_760_713_200, "second": None},
+                    "venue": {"id": fid, "name": f"Estádio {fid}", "city": "Cidade"},
+                    "status": {"long": "First Half", "short": "1H", "elapsed": rng.randint(10, 45), "extra": None}},
+        "league": {"id": 39, "name": "Premier League", "country": "England",
+                   "logo": "https://media.api-sports.io/football/leagues/39.png",
+                   "flag": "https://media.api-sports.io/flags/gb.svg", "season": 2026, "round": "Regular Season - 8"},
+        "teams": {"home": team(0), "away": team(1)},
+        "goals": {"home": 0, "away": 1},
+        "score": {"halftime": {"home": None, "away": None}, "fulltime": {"home": None, "away": None},
+                  "extratime": {"home": None, "away": None}, "penalty": {"home": None, "away": None}},
+        "events": [{"time": {"elapsed": i * 3, "extra": None}, "team": team(i % 2),
+                    "player": {"id": i, "name": f"Jogador {i}"}, "assist": {"id": None, "name": None},
+                    "type": "Card", "detail": "Yellow Card", "comments": None} for i in range(15)],
+        "lineups": [{"team": team(side), "formation": "4-3-3", "startXI": players[:11], "substitutes": players[11:],
+                     "coach": {"id": side, "name": "Técnico"}} for side in (0, 1)],
+        "statistics": [{"team": team(side), "statistics": [
+            {"type": t, "value": rng.randint(0, 12)} for t in stat_types]} for side in (0, 1)],
+        "players": [{"team": team(side), "players": [
+            {"player": p["player"], "statistics": [{"games": {"minutes": 45, "rating": "6.9"},
+                                                    "shots": {"total": 1, "on": 0}, "passes": {"total": 20}}]}
+            for p in players]} for side in (0, 1)],
+    }
+
+class ChunkReader:
+    """Entrega um corpo em memória em pedaços, como o StreamReader do aiohttp"""
+    def __init__(self, body: bytes):
+        self.body = body
+        self.pos = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        await asyncio.sleep(0)
+        end = len(self.body) if n < 0 else self.pos + n
+        chunk = self.body[self.pos:end]
+        self.pos = end
+        return chunk
+
+def measure_decoder(fn, repeats: int) -> Dict:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    data = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return {"ms": round(min(times) * 1000, 2), "peak_mb": round(peak / 2 ** 20, 2),
+            "retained_mb": round(retained / 2 ** 20, 2)}
+
+def run_decode(n: int, repeats: int) -> Dict:
+    """
+    Compara o caminho antigo (json.loads do documento inteiro) com o compacto
+    (orjson/json + recorte) e o streaming (ijson item a item)
+    """
+    os.environ.setdefault("STATE_DB", ":memory:")
+    os.environ.setdefault("TEAM_PROFILE_DB", ":memory:")
+    import main
+
+    rng = random.Random(n)
+    body = json.dumps({"get": "fixtures", "errors": [], "results": n,
+                       "response": [realistic_fixture(fid, rng) for fid in range(1, n + 1)]}).encode()
+
+    def compact_loads():
+        return {"response": [main.compact_fixture(item) for item in main.json_loads(body)["response"]]}
+
+    paths = {"json.loads (antes)": lambda: json.loads(body), "compacto": compact_loads}
+    if main.ijson:
+        paths["streaming"] = lambda: asyncio.run(main.stream_fixtures(ChunkReader(body), main.compact_fixture))[0]
+
+    reference = compact_loads()
+    result = {"fixtures": n, "body_kb": round(len(body) / 1024, 1),
+              "parser": "orjson" if main.orjson else "json", "paths": {}}
+    for name, fn in paths.items():
+        if name != "json.loads (antes)":
+            assert fn() == reference, f"{name} diverge do recorte de referência"
+        result["paths"][name] = measure_decoder(fn, repeats)
+    return result
+
+def print_decode(results: List[Dict]):
+    print(f"{'jogos':>6} {'corpo KB':>9}  {'caminho':<20} {'ms':>8} {'pico MB':>8} {'retido MB':>10}")
+    for r in results:
+        for name, m in r["paths"].items():
+            print(f"{r['fixtures']:>6} {r['body_kb']:>9}  {name:<20} {m['ms']:>8} {m['peak_mb']:>8} {m['retained_mb']:>10}")
+
+# =========================================================
+# MEMÓRIA
+# =========================================================
+
+MEMORY_SNAPSHOTS = 32         # leituras de estatística por jogo (anel cheio)
+MEMORY_REQUESTS_PER_DAY = 10000
+
+def run_memory(n: int) -> Dict:
+    """
+    Bytes retidos por jogo acompanhado: cada jogo passa pelo caminho real
+    (recorte do /fixtures, detector, cache, série, entrada com sugestões e
+    índice de liquidação) e o tracemalloc mede o que fica em cada estrutura
+    """
+    os.environ.setdefault("STATE_DB", ":memory:")
+    os.environ.setdefault("TEAM_PROFILE_DB", ":memory:")
+    import main
+    main.logger.setLevel(logging.WARNING)
+
+    rng = random.Random(n)
+    plan = main.rule_engine.plan
+    main.smart_cache.max_entries = n
+    items = [{**realistic_fixture(fid, rng), "league": dict(zip(("name", "country"), rng.choice(ALL_LEAGUES)), id=fid % 16)}
+             for fid in range(1, n + 1)]
+    # O live=all não traz estatísticas; elas chegam pelo /fixtures?ids=
+    stats = {item["fixture"]["id"]: main.parse_corner_stats(item.pop("statistics")) for item in items}
+    body = json.dumps({"response": items}).encode()
+    del items
+    active_matches: Dict[int, "main.MatchData"] = {}
+    sizes: Dict[str, int] = {}
+
+    def stage(name: str, fn):
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        gc.collect()
+        sizes[name] = tracemalloc.get_traced_memory()[0] - before
+
+    def parse_live() -> List[Dict]:
+        return [main.compact_fixture(item) for item in main.json_loads(body)["response"]]
+
+    tracemalloc.start()
+    live: List[Dict] = []
+    stage("ao vivo (recorte)", lambda: live.extend(parse_live()))
+    main.smart_cache.set_live_matches(live)
+    ids = {m["fixture"]["id"] for m in live}
+
+    def detect():
+        for m in live:
+            main.change_detector.diff_live(m)
+        main.poll_queue.sync(ids, main.clock.monotonic())
+    stage("detector + agenda", detect)
+
+    def cache():
+        for m in live:
+            fid = m["fixture"]["id"]
+            main.smart_cache.set_stats(fid, stats[fid], m["fixture"]["status"]["short"],
+                                       m["fixture"]["status"]["elapsed"])
+            main.change_detector.diff_stats(fid, stats[fid])
+    stage("cache de estatísticas", cache)
+
+    def series():
+        for fid, s in stats.items():
+            for minute in range(MEMORY_SNAPSHOTS):
+                main.corner_series.update(fid, minute, s["corners_home"] * minute // MEMORY_SNAPSHOTS,
+                                          s["corners_away"] * minute // MEMORY_SNAPSHOTS)
+    stage("séries de escanteios", series)
+
+    def entries():
+        for m in live:
+            fid = m["fixture"]["id"]
+            minute = m["fixture"]["status"]["elapsed"]
+            home, away = m["teams"]["home"]["name"], m["teams"]["away"]["name"]
+            s = stats[fid]
+            md = main.MatchData(fid, home, away, m["league"]["name"], fid, minute,
+                                s["corners_home"], s["corners_away"])
+            md.suggestions = main.IntelligentAnalyzer.generate_suggestions(
+                s, plan.names, minute, home, away, main.corner_series.features(fid), plan)
+            active_matches[fid] = md
+            main.track_entry(md)
+    stage("entradas + liquidação", entries)
+
+    # Ciclo seguinte: a lista nova substitui a antiga enquanto as entradas
+    # seguem com os nomes lidos no ciclo anterior
+    def next_cycle():
+        fresh = parse_live()
+        main.smart_cache.set_live_matches(fresh)
+        live[:] = fresh
+    stage("ao vivo (ciclo seguinte)", next_cycle)
+
+    def requests():
+        for _ in range(MEMORY_REQUESTS_PER_DAY):
+            main.req_counter.increment()
+    stage(f"contador ({MEMORY_REQUESTS_PER_DAY} req/dia)", requests)
+    tracemalloc.stop()
+
+    per_fixture = {name: round(size / n) for name, size in sizes.items()}
+    return {"fixtures": n, "suggestions": sum(len(md.suggestions) for md in active_matches.values()),
+            "stages": per_fixture, "bytes_per_fixture": sum(per_fixture.values()),
+            "total_mb": round(sum(sizes.values()) / 2 ** 20, 2)}
+
+def print_memory(results: List[Dict]):
+    for r in results:
+        print(f"{r['fixtures']} jogos, {r['suggestions']} sugestões: {r['bytes_per_fixture']} bytes/jogo "
+              f"({r['total_mb']} MB)")
+        for name, size in r["stages"].items():
+            print(f"  {name:<28} {size:>7} bytes/jogo")
+
+# =========================================================
+# ORQUESTRAÇÃO E COMPARAÇÃO
+# =========================================================
+
+SCALE_ARGS = ["cycles", "latency", "jitter", "error_rate", "burst_every", "burst_len",
+              "minutes_per_cycle", "tg_latency", "seed", "other_share", "keys", "chats"]
+
+def run_scale_subprocess(args, n: int) -> Dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-one", str(n)]
+    for name in SCALE_ARGS:
+        cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    if args.policy:
+        cmd.append("--policy")
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Escala {n} falhou:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def print_table(results: List[Dict]):
+    print(f"{'jogos':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/ciclo':>10} {'KB/ciclo':>9} {'parse ms':>9} "
+          f"{'chats':>6} {'alertas/s':>10} {'lag p99':>8} {'RSS MB':>7}")
+    for r in results:
+        print(f"{r['fixtures']:>6} {r['cycle_ms']['p50']:>9} {r['cycle_ms']['p99']:>9} "
+              f"{r['requests_per_cycle']:>10} {r['kb_per_cycle']:>9} {r['parse_ms_per_cycle']:>9} "
+              f"{r.get('chats', 1):>6} {r['alerts_per_sec']:>10} {r['loop_lag_ms']['p99']:>8} {r['peak_rss_mb']:>7}")
+
+COMPARED = [("cycle_ms", "p50"), ("cycle_ms", "p99"), ("requests_per_cycle", None), ("kb_per_cycle", None),
+            ("loop_lag_ms", "p99"), ("peak_rss_mb", None)]
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    base = {r["fixtures"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get(r["fixtures"])
+        if not b:
+            continue
+        for key, sub in COMPARED:
+            if key not in b:
+                continue
+            cur = r[key][sub] if sub else r[key]
+            old = b[key][sub] if sub else b[key]
+            if old and cur > old * (1 + tolerance):
+                name = f"{key}.{sub}" if sub else key
+                regressions.append(f"{r['fixtures']} jogos: {name} {old} → {cur} (+{(cur / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do CornerBot com API-Football e Telegram falsos")
+    parser.add_argument("--fixtures", type=int, nargs="+", default=DEFAULT_SCALES, help="escalas (jogos ao vivo)")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="latência base da API (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 500")
+    parser.add_argument("--burst-every", type=int, default=0, help="a cada N requisições inicia uma rajada de 429")
+    parser.add_argument("--burst-len", type=int, default=0, help="tamanho da rajada de 429")
+    parser.add_argument("--minutes-per-cycle", type=int, default=3)
+    parser.add_argument("--tg-latency", type=float, default=0.01, help="latência do Telegram (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--other-share", type=float, default=0.0,
+                        help="jogos extras de ligas não prioritárias, como fração de N")
+    parser.add_argument("--keys", type=int, default=1, help="chaves no pool da API")
+    parser.add_argument("--chats", type=int, default=0, help="chats assinantes além do CHAT_ID")
+    parser.add_argument("--policy", action="store_true", help="mantém a cadência de produção por jogo")
+    parser.add_argument("--json", help="grava os resultados em JSON")
+    parser.add_argument("--compare", help="JSON de referência para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--decode", type=int, nargs="+", help="mede só a decodificação de N jogos")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--memory", type=int, nargs="+", help="mede só os bytes retidos por jogo acompanhado")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--run-memory", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.decode:
+        results = [run_decode(n, args.repeats) for n in args.decode]
+        print(f"parser: {results[0]['parser']}")
+        print_decode(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "decode": results}, f, indent=2)
+        return 0
+
+    if args.memory:
+        # Um subprocesso por escala: os singletons do main acumulam estado
+        results = []
+        for n in args.memory:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-memory", str(n)],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"Escala {n} falhou:\n{proc.stderr[-2000:]}")
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        print_memory(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "memory": results}, f, indent=2)
+        return 0
+
+    if args.run_memory is not None:
+        print(json.dumps(run_memory(args.run_memory)))
+        return 0
+
+    if args.run_one is not None:
+        print(json.dumps(asyncio.run(run_one(args, args.run_one))))
+        return 0
+
+    results = []
+    for n in args.fixtures:
+        print(f"▶ {n} jogos...", file=sys.stderr)
+        results.append(run_scale_subprocess(args, n))
+    print_table(results)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {name: getattr(args, name) for name in SCALE_ARGS + ["policy"]},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️ regressão: {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,45 +1,148 @@
 #!/usr/bin/env python3
 import os
 import asyncio
+import bisect
+import gzip
+import hashlib
+import heapq
+import hmac
 import logging
+import math
 import random
 import json
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+import socket
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Set, Sized, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from contextvars import ContextVar
+from enum import Enum, IntEnum
+from datetime import datetime, timedelta, time as dtime
 
 import aiohttp
 from aiohttp import web
 from telegram import Bot
+from telegram.error import BadRequest, RetryAfter
+from telegram.request import HTTPXRequest
+
+# Decodificadores opcionais: orjson acelera o parse, ijson permite ler o
+# /fixtures em streaming sem montar o documento inteiro na memória
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+json_loads = orjson.loads if orjson else json.loads
 
 # =========================================================
 # CONFIGURAÇÕES OTIMIZADAS
 # =========================================================
 
 API_KEY = os.getenv("API_KEY")
-BASE = "https://v3.football.api-sports.io"
+# Várias chaves: API_KEYS=chave1,chave2:300 (":limite" opcional, senão API_DAILY_LIMIT)
+API_KEYS = os.getenv("API_KEYS", API_KEY or "")
+API_DAILY_LIMIT = int(os.getenv("API_DAILY_LIMIT", 110))
+KEY_COOLDOWN = 60             # pausa de uma chave após 429 sem Retry-After
+BASE = os.getenv("API_BASE", "https://v3.football.api-sports.io")
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org/bot")
 CHAT_ID_ENV = os.getenv("CHAT_ID")
 
-if not API_KEY or not TELEGRAM_TOKEN or not CHAT_ID_ENV:
-    raise RuntimeError("Variáveis de ambiente não definidas")
+# Rotas administrativas do servidor web exigem o header X-Admin-Token; sem
+# ADMIN_TOKEN definido, só atendem chamadas locais (127.0.0.1 / ::1)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_HEADER = "X-Admin-Token"
+
+# Gravação / replay de respostas da API (rodadas offline e aceleradas)
+TAPE_RECORD = os.getenv("TAPE_RECORD")
+TAPE_REPLAY = os.getenv("TAPE_REPLAY")
+REPLAY_OUTPUT = os.getenv("REPLAY_OUTPUT")
+
+def check_env():
+    if not TAPE_REPLAY and (not API_KEYS or not TELEGRAM_TOKEN or not CHAT_ID_ENV):
+        raise RuntimeError("Variáveis de ambiente não definidas")
 
-CHAT_ID = int(CHAT_ID_ENV)
+CHAT_ID = int(CHAT_ID_ENV or 0)
 
-# ESTRATÉGIA: Dividir o dia em janelas de monitoramento
+# ESTRATÉGIA: Distribuir o orçamento diário pelo tempo com jogos ao vivo.
+# PEAK_HOURS serve de previsão quando a agenda do dia não está disponível
 PEAK_HOURS = [(14, 17), (19, 23)]
 
 # Intervalos inteligentes
-POLL_INTERVAL_PEAK = 180      # 3 min nos horários de pico
-POLL_INTERVAL_NORMAL = 600    # 10 min fora de pico
-POLL_INTERVAL_LOW = 1800      # 30 min madrugada
+POLL_INTERVAL_MIN = 60        # nunca mais que 1 ciclo por minuto
+POLL_INTERVAL_LOW = 1800      # 30 min sem jogos previstos
+BUDGET_RESERVE = 5            # requisições guardadas para imprevistos
+MATCH_WINDOW = 115 * 60       # duração estimada de um jogo (com intervalo)
+SCHEDULER_SLOT = 300          # granularidade da previsão de demanda
+LIVE_HORIZON = 45 * 60        # tempo mínimo assumido para jogos já ao vivo
+
+# Regras e sugestões declarativas, recarregadas quando o arquivo muda
+RULES_FILE = os.getenv("RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+RULES_CHECK_INTERVAL = 5
+
+# Histórico de escanteios por jogo (anel de snapshots minuto/casa/fora)
+CORNER_SERIES_SIZE = 32       # snapshots guardados por jogo
+
+# Perfis de escanteios por time, pré-carregados com o orçamento que sobra fora do pico
+TEAM_PROFILE_DB = os.getenv("TEAM_PROFILE_DB", ":memory:" if TAPE_REPLAY else "cornerbot-profiles.db")
+PROFILE_MATCHES = 10          # últimos jogos encerrados na média de cada time
+PROFILE_TTL_DAYS = 3
+PROFILE_CHECK_INTERVAL = 600  # com que frequência o job vê se pode rodar
+PROFILE_QUIET_LEAD = 3600     # só roda sem jogo ao vivo e sem início na próxima hora
+PROFILE_TEAMS_PER_ROUND = 10  # times por rodada (listas em paralelo, estatísticas em lote)
+PROFILE_MIN_EDGE = 1.0        # diferença mínima de cantos/jogo esperados para desempatar
+
+# Cadência por jogo conforme a proximidade de uma regra
+FIXTURE_POLL_HOT = 0          # falta 1 escanteio: todo ciclo
+FIXTURE_POLL_WARM = 360       # faltam 2 escanteios
+FIXTURE_POLL_COLD = 900       # faltam 3 ou mais
+FIXTURE_POLL_RARE = 1800      # nenhuma regra alcançável / só liquidação
+MAX_CORNER_RATE = 0.25        # teto otimista de escanteios por minuto
+MATCH_END_MINUTE = 90         # fim previsto para regras sem minuto máximo
 
-CONCURRENT_REQUESTS = 2
-STAT_TTL = 300  # 5 minutos de cache
+# Corpos acima disto (ou sem Content-Length) são lidos em streaming quando há
+# ijson; abaixo, orjson/json de uma vez é mais rápido e o pico é pequeno
+STREAM_MIN_BYTES = int(os.getenv("STREAM_MIN_BYTES", 256 * 1024))
+
+CONCURRENT_REQUESTS = 5     # requisições simultâneas no fan-out por jogo
+PIPELINE_LOADERS = CONCURRENT_REQUESTS  # workers do estágio de estatísticas (um lote cada)
+PIPELINE_QUEUE_SIZE = 64    # itens por fila entre estágios; cheia, segura o estágio anterior
+EVAL_BATCH_MAX = 200        # jogos por lote no estágio de regras
+STATS_BATCH_SIZE = 20       # máximo de ids por chamada /fixtures?ids=
+STATS_FALLBACK_MAX = 3      # consultas individuais por lote para jogos que o lote não trouxe
+STAT_TTL = 300  # 5 minutos de cache (status desconhecido)
+STAT_TTL_LIVE = 150           # jogo em andamento
+STAT_TTL_FAST = 60            # reta final de cada tempo
+STAT_TTL_BREAK = 900          # intervalo: nada muda
+STAT_TTL_FINISHED = 60        # encerrado: só o suficiente para liquidar
+STALE_GRACE = 300             # tempo extra em que uma entrada vencida ainda é servida
+STATS_CACHE_MAX = 2000        # máximo de jogos no cache de estatísticas
+CACHE_SWEEP_INTERVAL = 60     # limpeza periódica do cache
 REQUEST_TIMEOUT = 20
 MAX_RETRIES = 2
 BACKOFF_FACTOR = 2
+RETRY_AFTER_MAX = 120         # teto para o Retry-After do servidor
+
+# Resiliência do upstream
+BREAKER_FAILURES = 5          # falhas seguidas (5xx/timeout/rede) que abrem o disjuntor do endpoint
+BREAKER_COOLDOWN = 30         # pausa da 1ª abertura; dobra a cada sonda que falha
+BREAKER_COOLDOWN_MAX = 600
+RETRY_BUDGET_RATIO = 0.2      # fichas de retry ganhas por resposta boa
+RETRY_BUDGET_MAX = 10
+CYCLE_DEADLINE = 45           # segundos que um ciclo pode esperar pela API (backoff incluído)
+HEDGE_MIN_DELAY = 0.5         # live=all ganha uma cópia ao passar do p95 (nunca antes disto)
+HEDGE_DEFAULT_DELAY = 2.0     # enquanto não há amostras suficientes de latência
+HEDGE_MIN_SAMPLES = 20
 
 # Ligas prioritárias
 PRIORITY_LEAGUES = [
@@ -48,11 +151,278 @@ PRIORITY_LEAGUES = [
     "Brasileirão Série A", "Championship", "Eredivisie"
 ]
 
+# Nome e país de cada liga prioritária na API-Football (resolvidos para ids)
+PRIORITY_LEAGUE_LOOKUP = {
+    "Premier League": ("Premier League", "England"),
+    "LaLiga": ("La Liga", "Spain"),
+    "Serie A": ("Serie A", "Italy"),
+    "Bundesliga": ("Bundesliga", "Germany"),
+    "Ligue 1": ("Ligue 1", "France"),
+    "Champions League": ("UEFA Champions League", "World"),
+    "Europa League": ("UEFA Europa League", "World"),
+    "Brasileirão Série A": ("Serie A", "Brazil"),
+    "Championship": ("Championship", "England"),
+    "Eredivisie": ("Eredivisie", "Netherlands"),
+}
+LEAGUE_IDS_TTL_DAYS = 7       # revalida os ids resolvidos uma vez por semana
+
+# Telegram: um grupo aceita ~20 mensagens por minuto e o bot, ~30 por segundo no total
+TELEGRAM_RATE_PER_MIN = 20    # por chat
+TELEGRAM_BURST = 5
+TELEGRAM_GLOBAL_RATE = 30     # mensagens/s somando todos os chats
+TELEGRAM_WORKERS = 8          # envios simultâneos (sempre em chats diferentes)
+TELEGRAM_MAX_ATTEMPTS = 3
+
+# Assinaturas: cada chat escolhe ligas, regras e idioma; CHAT_ID recebe tudo
+# em português se não estiver no arquivo
+SUBSCRIPTIONS_FILE = os.getenv("SUBSCRIPTIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                  "subscriptions.json"))
+SUBSCRIPTIONS_CHECK_INTERVAL = 5
+DEFAULT_LANGUAGE = "pt"
+
+# Modo distribuído: vários workers (WORKER_ID distintos) dividem os jogos
+# coordenados por um SQLite compartilhado em COORD_DB
+COORD_DB = os.getenv("COORD_DB")
+WORKER_ID = os.getenv("WORKER_ID") or socket.gethostname()
+WORKER_TTL = 30               # sem heartbeat por isso, o worker é dado como morto
+HEARTBEAT_INTERVAL = 10
+
+# Persistência local (sobrevive a reinícios do processo); replay usa memória
+STATE_DB = os.getenv("STATE_DB", ":memory:" if TAPE_REPLAY else
+                     f"cornerbot-{WORKER_ID}.db" if COORD_DB else "cornerbot.db")
+STATE_FLUSH_INTERVAL = 5      # segundos entre gravações em lote
+
 LOG_LEVEL = logging.INFO
 logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger("cornerbot")
 
-bot = Bot(token=TELEGRAM_TOKEN)
+# =========================================================
+# RELÓGIO, GRAVAÇÃO E REPLAY
+# =========================================================
+
+class Clock:
+    """
+    Fonte única de tempo do bot; o replay troca por um relógio virtual
+    """
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def run_blocking(self, executor: ThreadPoolExecutor, fn: Callable, *args):
+        """
+        Trabalho bloqueante (SQLite) fora do event loop
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+class ReplayClock(Clock):
+    """
+    Relógio de eventos discretos: os sleeps entram numa fila de despertares e
+    run() só avança o tempo virtual quando todas as tarefas estão bloqueadas,
+    direto para o próximo despertar (empates na ordem de chegada). Sem pausas
+    reais nem threads, a mesma fita dá sempre a mesma saída.
+
+    "Todas bloqueadas" vem da fila de prontos do loop padrão do asyncio
+    (loop._ready, interna do CPython). Em outro loop (ex.: uvloop) o relógio
+    só cede SETTLE_YIELDS vezes antes de avançar: funciona, mas a ordem
+    deixa de ser garantida
+    """
+    SETTLE_YIELDS = 100
+
+    def __init__(self, start: float):
+        self._now = start
+        self._timers: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = 0
+        self._added = asyncio.Event()
+        self.wakeups = 0
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._now)
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        wakeup = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._timers, (self._now + seconds, self._seq, wakeup))
+        self._added.set()
+        await wakeup
+
+    async def run_blocking(self, executor: ThreadPoolExecutor, fn: Callable, *args):
+        # Numa thread o trabalho terminaria em tempo real, fora da ordem virtual
+        await asyncio.sleep(0)
+        return fn(*args)
+
+    async def _settle(self, ready: Optional[Sized]):
+        # Cede a vez até nenhuma outra tarefa estar pronta para rodar
+        await asyncio.sleep(0)
+        if ready is None:
+            for _ in range(self.SETTLE_YIELDS):
+                await asyncio.sleep(0)
+            return
+        while ready:
+            await asyncio.sleep(0)
+
+    @staticmethod
+    def _ready_queue() -> Optional[Sized]:
+        return getattr(asyncio.get_running_loop(), "_ready", None)
+
+    async def run(self):
+        ready = self._ready_queue()
+        if ready is None:
+            logger.warning("Loop sem fila de prontos visível: replay sem ordem garantida")
+        while True:
+            await self._settle(ready)
+            # Despertares de sleeps cancelados são descartados
+            while self._timers and self._timers[0][2].done():
+                heapq.heappop(self._timers)
+            if not self._timers:
+                self._added.clear()
+                await self._added.wait()
+                continue
+            when, _, wakeup = heapq.heappop(self._timers)
+            self._now = max(self._now, when)
+            self.wakeups += 1
+            wakeup.set_result(None)
+
+clock = Clock()
+
+def params_key(params: Dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+class TapeRecorder:
+    """
+    Grava cada resposta bruta da API como uma linha JSON num arquivo gzip
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.records = 0
+
+    def record(self, url: str, params: Dict, status: int, body: bytes):
+        self._file.write(json.dumps({
+            "t": clock.time(),
+            "path": url.replace(BASE, ""),
+            "params": {k: str(v) for k, v in params.items()},
+            "status": status,
+            "body": body.decode("utf-8", errors="replace"),
+        }) + "\n")
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+
+class TapePlayer:
+    """
+    Devolve, para cada requisição, a última resposta gravada até o instante
+    virtual atual. Lotes /fixtures?ids= são remontados jogo a jogo
+    """
+    def __init__(self, path: str):
+        self._by_key: Dict[Tuple, Tuple[List[float], List[Dict]]] = {}
+        self._by_fixture: Dict[int, Tuple[List[float], List[Dict]]] = {}
+        self.start = None
+        self.end = None
+        self.records = 0
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("status") != 200:
+                    continue
+                body = json.loads(rec["body"])
+                t = rec["t"]
+                self._append(self._by_key, (rec["path"], params_key(rec["params"])), t, body)
+                if rec["path"] == "/fixtures" and "ids" in rec["params"]:
+                    for item in body.get("response", []):
+                        self._append(self._by_fixture, item["fixture"]["id"], t, item)
+                self.start = t if self.start is None else min(self.start, t)
+                self.end = t if self.end is None else max(self.end, t)
+                self.records += 1
+
+        if self.start is None:
+            raise RuntimeError(f"Fita vazia: {path}")
+        logger.info(f"Fita carregada: {self.records} respostas, "
+                    f"{datetime.fromtimestamp(self.start)} → {datetime.fromtimestamp(self.end)}")
+
+    @staticmethod
+    def _append(index: Dict, key, t: float, value):
+        times, values = index.setdefault(key, ([], []))
+        # Gravações chegam em ordem, mas a fita pode ter sido concatenada
+        i = bisect.bisect_right(times, t)
+        times.insert(i, t)
+        values.insert(i, value)
+
+    @staticmethod
+    def _latest(index: Dict, key, t: float):
+        entry = index.get(key)
+        if not entry:
+            return None
+        times, values = entry
+        i = bisect.bisect_right(times, t)
+        return values[i - 1] if i else None
+
+    def lookup(self, url: str, params: Dict, t: float) -> Optional[Dict]:
+        path = url.replace(BASE, "")
+        body = self._latest(self._by_key, (path, params_key(params)), t)
+        if body is not None:
+            return body
+
+        if path == "/fixtures" and "ids" in params:
+            items = []
+            for fid in str(params["ids"]).split("-"):
+                item = self._latest(self._by_fixture, int(fid), t)
+                if item is not None:
+                    items.append(item)
+            return {"response": items}
+        return None
+
+class FakeBot:
+    """
+    Substitui o Bot do Telegram no replay e guarda a transcrição
+    """
+    def __init__(self):
+        self.transcript: List[Dict] = []
+        self._next_id = 1
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        message_id = self._next_id
+        self._next_id += 1
+        self.transcript.append({"t": clock.time(), "kind": "send", "chat_id": chat_id, "message_id": message_id,
+                                "text": text})
+
+        class _Message:
+            pass
+        msg = _Message()
+        msg.message_id = message_id
+        return msg
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None):
+        self.transcript.append({"t": clock.time(), "kind": "edit", "chat_id": chat_id, "message_id": message_id,
+                                "text": text})
+        return True
+
+tape_recorder = TapeRecorder(TAPE_RECORD) if TAPE_RECORD else None
+
+# Sem token (replay ou ferramentas que importam o módulo) usa o bot falso
+# Uma conexão por worker do outbox (o padrão do HTTPXRequest é uma só)
+bot = Bot(token=TELEGRAM_TOKEN, base_url=TELEGRAM_API_BASE,
+          request=HTTPXRequest(connection_pool_size=TELEGRAM_WORKERS)) if TELEGRAM_TOKEN and not TAPE_REPLAY else FakeBot()
 
 # =========================================================
 # ESTATÍSTICAS GLOBAIS
@@ -74,7 +444,23 @@ class BotStats:
             self.total_greens += 1
         else:
             self.total_reds += 1
-        self.active_entries -= 1
+    
+    def finish_entry(self):
+        self.active_entries = max(self.active_entries - 1, 0)
+    
+    def to_dict(self) -> Dict:
+        return {
+            "total_entries": self.total_entries,
+            "total_greens": self.total_greens,
+            "total_reds": self.total_reds,
+            "active_entries": self.active_entries,
+        }
+    
+    def load_dict(self, d: Dict):
+        self.total_entries = d.get("total_entries", 0)
+        self.total_greens = d.get("total_greens", 0)
+        self.total_reds = d.get("total_reds", 0)
+        self.active_entries = d.get("active_entries", 0)
     
     def get_winrate(self) -> float:
         total = self.total_greens + self.total_reds
@@ -96,16 +482,176 @@ class BotStats:
 
 bot_stats = BotStats()
 
+# =========================================================
+# MÉTRICAS (PROMETHEUS)
+# =========================================================
+
+class Histogram:
+    """
+    Buckets fixos e contadores pré-alocados: observe() é só bisect + somas
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Limite superior do bucket que contém o quantil q (None acima do último)
+        """
+        target = q * self.count
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return bound
+        return None
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+CYCLE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TELEGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+ENDPOINT_LIVE = "live"
+ENDPOINT_IDS = "ids"
+ENDPOINT_STATISTICS = "statistics"
+ENDPOINT_SCHEDULE = "schedule"
+ENDPOINT_OTHER = "other"
+
+class Metrics:
+    def __init__(self):
+        self.api_latency = {
+            ep: Histogram(API_LATENCY_BUCKETS)
+            for ep in (ENDPOINT_LIVE, ENDPOINT_IDS, ENDPOINT_STATISTICS, ENDPOINT_SCHEDULE, ENDPOINT_OTHER)
+        }
+        self.cycle_duration = Histogram(CYCLE_BUCKETS)
+        self.telegram_latency = {"send": Histogram(TELEGRAM_BUCKETS), "edit": Histogram(TELEGRAM_BUCKETS)}
+        self.api_retries = 0
+        self.api_backoff_seconds = 0.0
+        self.api_failures = 0
+        self.api_wasted = 0
+        self.api_hedges = 0
+        self.api_hedge_wins = 0
+        self.api_deadline_exceeded = 0
+        self.api_bytes = 0
+        self.api_parse_seconds = 0.0
+        self.cycles = 0
+        self.active_matches: Dict = {}
+
+    def render(self) -> str:
+        lines = [
+            "# HELP cornerbot_api_latency_seconds Latência das chamadas à API-Football",
+            "# TYPE cornerbot_api_latency_seconds histogram",
+        ]
+        for ep, h in self.api_latency.items():
+            lines += h.render("cornerbot_api_latency_seconds", f'endpoint="{ep}"')
+        lines += [
+            "# HELP cornerbot_cycle_duration_seconds Duração de cada ciclo do loop principal",
+            "# TYPE cornerbot_cycle_duration_seconds histogram",
+        ]
+        lines += self.cycle_duration.render("cornerbot_cycle_duration_seconds")
+        lines += [
+            "# HELP cornerbot_telegram_latency_seconds Latência de envio/edição no Telegram",
+            "# TYPE cornerbot_telegram_latency_seconds histogram",
+        ]
+        for method, h in self.telegram_latency.items():
+            lines += h.render("cornerbot_telegram_latency_seconds", f'method="{method}"')
+
+        remaining = req_counter.daily_limit - req_counter.count
+        for name, kind, value, help_text in (
+            ("cornerbot_api_retries_total", "counter", self.api_retries, "Novas tentativas em _fetch_json"),
+            ("cornerbot_api_backoff_seconds_total", "counter", self.api_backoff_seconds, "Tempo total em backoff"),
+            ("cornerbot_api_failures_total", "counter", self.api_failures, "Chamadas que esgotaram as tentativas"),
+            ("cornerbot_api_wasted_requests_total", "counter", self.api_wasted,
+             "Requisições contadas na cota sem trazer dados (429/4xx/5xx)"),
+            ("cornerbot_api_hedges_total", "counter", self.api_hedges, "Cópias disparadas do live=all"),
+            ("cornerbot_api_hedge_wins_total", "counter", self.api_hedge_wins, "Cópias que responderam primeiro"),
+            ("cornerbot_api_deadline_exceeded_total", "counter", self.api_deadline_exceeded,
+             "Chamadas abandonadas pelo prazo do ciclo"),
+            ("cornerbot_retry_budget_tokens", "gauge", retry_budget.tokens, "Fichas de retry disponíveis"),
+            ("cornerbot_retry_denied_total", "counter", retry_budget.denied, "Retries negados por falta de folga"),
+            ("cornerbot_api_bytes_total", "counter", self.api_bytes, "Bytes baixados da API-Football"),
+            ("cornerbot_api_parse_seconds_total", "counter", self.api_parse_seconds, "Tempo gasto decodificando JSON"),
+            ("cornerbot_requests_today", "gauge", req_counter.count, "Requisições usadas hoje"),
+            ("cornerbot_budget_remaining", "gauge", remaining, "Requisições restantes no orçamento diário"),
+            ("cornerbot_shard_workers", "gauge", len(coordinator.members) if coordinator else 1, "Workers ativos"),
+            ("cornerbot_shard_leader", "gauge", int(coordinator.is_leader) if coordinator else 1, "1 se este worker é o líder"),
+            ("cornerbot_shard_duplicates_blocked_total", "counter", coordinator.duplicates_blocked if coordinator else 0,
+             "Alertas barrados por já terem sido enviados por outro worker"),
+            ("cornerbot_api_keys_cooling", "gauge", sum(1 for k in req_counter.keys if k.cooling()), "Chaves em pausa por 429"),
+            ("cornerbot_cache_hit_ratio", "gauge", smart_cache.hit_ratio(), "Taxa de acerto do SmartCache"),
+            ("cornerbot_cache_hits_total", "counter", smart_cache.hits, "Acertos do SmartCache"),
+            ("cornerbot_cache_misses_total", "counter", smart_cache.misses, "Faltas do SmartCache"),
+            ("cornerbot_cache_evictions_total", "counter", smart_cache.evictions, "Despejos por tamanho no SmartCache"),
+            ("cornerbot_cycles_total", "counter", self.cycles, "Ciclos executados"),
+            ("cornerbot_subscribed_chats", "gauge", len(subscriptions.index), "Chats com assinatura ativa"),
+            ("cornerbot_entry_fanout_total", "counter", subscriptions.fanout, "Mensagens de entrada enfileiradas"),
+            ("cornerbot_telegram_queue", "gauge", outbox._unfinished, "Envios e edições na fila do Telegram"),
+            ("cornerbot_telegram_flood_waits_total", "counter", outbox.flood_waits, "Respostas de flood wait"),
+            ("cornerbot_team_profiles", "gauge", len(team_profiles), "Perfis de times válidos em disco"),
+            ("cornerbot_profile_requests_total", "counter", team_profiles.requests,
+             "Requisições gastas no pré-carregamento de perfis"),
+            ("cornerbot_pipeline_inflight", "gauge", len(pipeline.inflight) if pipeline else 0,
+             "Jogos despachados ainda não avaliados"),
+            ("cornerbot_active_matches", "gauge", len(self.active_matches), "Jogos com entrada acompanhados"),
+            ("cornerbot_pending_matches", "gauge", settlements.matches, "Jogos com sugestões pendentes"),
+            ("cornerbot_pending_suggestions", "gauge", len(settlements), "Sugestões aguardando liquidação"),
+            ("cornerbot_settlement_woken_total", "counter", settlements.woken, "Sugestões acordadas por gatilhos"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+        lines += ["# HELP cornerbot_key_requests_today Requisições usadas hoje por chave",
+                  "# TYPE cornerbot_key_requests_today gauge"]
+        lines += [f'cornerbot_key_requests_today{{key="{k.label}"}} {k.counter.count}' for k in req_counter.keys]
+        lines += ["# HELP cornerbot_key_throttled_total Respostas 429 por chave",
+                  "# TYPE cornerbot_key_throttled_total counter"]
+        lines += [f'cornerbot_key_throttled_total{{key="{k.label}"}} {k.throttled}' for k in req_counter.keys]
+        lines += ["# HELP cornerbot_breaker_state Disjuntor por endpoint (0 fechado, 1 meio-aberto, 2 aberto)",
+                  "# TYPE cornerbot_breaker_state gauge"]
+        lines += [f'cornerbot_breaker_state{{endpoint="{b.endpoint}"}} {int(b.state)}' for b in breakers.values()]
+        lines += ["# HELP cornerbot_breaker_short_circuits_total Chamadas recusadas com o disjuntor aberto",
+                  "# TYPE cornerbot_breaker_short_circuits_total counter"]
+        lines += [f'cornerbot_breaker_short_circuits_total{{endpoint="{b.endpoint}"}} {b.short_circuits}'
+                  for b in breakers.values()]
+        lines += ["# HELP cornerbot_breaker_opens_total Vezes que o disjuntor abriu",
+                  "# TYPE cornerbot_breaker_opens_total counter"]
+        lines += [f'cornerbot_breaker_opens_total{{endpoint="{b.endpoint}"}} {b.opens}' for b in breakers.values()]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
 # =========================================================
 # CONTADOR DE REQUISIÇÕES
 # =========================================================
 
 class RequestCounter:
-    def __init__(self, daily_limit=110):
+    def __init__(self, daily_limit=110, label: str = ""):
         self.daily_limit = daily_limit
+        self.label = label
         self.count = 0
-        self.last_reset = datetime.now().date()
-        self.history = []
+        self.last_reset = clock.now().date()
+        self.by_hour = array("I", bytes(4 * 24))  # requisições do dia por hora (tamanho fixo)
+        self.saved = 0  # requisições economizadas pelo lote de estatísticas
         
     def can_request(self) -> bool:
         self._check_reset()
@@ -114,32 +660,272 @@ class RequestCounter:
     def increment(self):
         self._check_reset()
         self.count += 1
-        self.history.append(datetime.now())
+        self.by_hour[clock.now().hour] += 1
         remaining = self.daily_limit - self.count
         if remaining <= 10:
-            logger.warning(f"⚠️ ATENÇÃO: Apenas {remaining} requisições restantes!")
+            logger.warning(f"⚠️ ATENÇÃO: Apenas {remaining} requisições restantes{self.label and f' na chave {self.label}'}!")
         else:
-            logger.info(f"📊 Requisições: {self.count}/{self.daily_limit} ({remaining} restantes)")
+            logger.debug("📊 Requisições: %d/%d (%d restantes)", self.count, self.daily_limit, remaining)
+    
+    def add_saved(self, n: int):
+        self._check_reset()
+        self.saved += n
     
     def _check_reset(self):
-        today = datetime.now().date()
+        today = clock.now().date()
         if today > self.last_reset:
-            logger.info(f"🔄 Reset diário: {self.count} requisições usadas ontem")
+            logger.info(f"🔄 Reset diário{self.label and f' ({self.label})'}: {self.count} requisições usadas ontem")
             self.count = 0
             self.last_reset = today
-            self.history = []
+            self.by_hour = array("I", bytes(4 * 24))
+            self.saved = 0
+    
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "saved": self.saved, "date": self.last_reset.isoformat()}
+    
+    def load_dict(self, d: Dict):
+        # Só restaura se o contador salvo é de hoje
+        if d.get("date") == clock.now().date().isoformat():
+            self.count = d.get("count", 0)
+            self.saved = d.get("saved", 0)
+            self.last_reset = clock.now().date()
     
     def get_stats(self) -> str:
         remaining = self.daily_limit - self.count
-        return f"📊 {self.count}/{self.daily_limit} req ({remaining} restantes)"
+        return f"📊 {self.count}/{self.daily_limit} req ({remaining} restantes, {self.saved} economizadas)"
+
+class ApiKey:
+    """
+    Uma chave da API-Football com cota diária e pausa (429) próprias
+    """
+    def __init__(self, key: str, daily_limit: int):
+        self.key = key
+        # Persistido pelo hash para não gravar a chave no banco
+        self.id = hashlib.sha1(key.encode()).hexdigest()[:12]
+        self.label = f"…{key[-4:]}" if key else "replay"
+        self.counter = RequestCounter(daily_limit, self.label)
+        self.cooldown_until = 0.0
+        self.throttled = 0
+
+    def headroom(self) -> int:
+        self.counter._check_reset()
+        return self.counter.daily_limit - self.counter.count
+
+    def cooling(self) -> float:
+        return max(self.cooldown_until - clock.monotonic(), 0.0)
+
+class KeyPool:
+    """
+    Soma a cota de várias chaves. Cada requisição vai para a chave com mais
+    folga; um 429 pausa só a chave atingida. Fala a mesma interface do
+    RequestCounter (count, daily_limit, can_request...) com os totais
+    """
+    def __init__(self, keys: List[ApiKey]):
+        self.keys = keys or [ApiKey("", API_DAILY_LIMIT)]
+        self.saved = 0  # requisições economizadas pelo lote de estatísticas
+        self.last_reset = clock.now().date()
+
+    @classmethod
+    def from_env(cls, spec: str) -> "KeyPool":
+        keys = []
+        for item in spec.split(","):
+            key, _, limit = item.strip().partition(":")
+            if key:
+                keys.append(ApiKey(key, int(limit) if limit else API_DAILY_LIMIT))
+        return cls(keys)
+
+    @property
+    def count(self) -> int:
+        return sum(k.counter.count for k in self.keys)
+
+    @property
+    def daily_limit(self) -> int:
+        return sum(k.counter.daily_limit for k in self.keys)
+
+    def can_request(self) -> bool:
+        return any(k.headroom() > 0 for k in self.keys)
+
+    def acquire(self) -> Optional[ApiKey]:
+        """
+        Chave com mais folga fora de pausa; None se todas estão pausadas ou sem cota
+        """
+        available = [k for k in self.keys if k.headroom() > 0 and not k.cooling()]
+        return max(available, key=ApiKey.headroom) if available else None
+
+    def wait_time(self) -> float:
+        """
+        Segundos até alguma chave com cota sair da pausa
+        """
+        waits = [k.cooling() for k in self.keys if k.headroom() > 0]
+        return min(waits) if waits else 0.0
+
+    def increment(self, key: Optional[ApiKey] = None):
+        (key or self.keys[0]).counter.increment()
+
+    def throttle(self, key: ApiKey, seconds: Optional[float]):
+        seconds = seconds if seconds is not None else KEY_COOLDOWN
+        key.cooldown_until = clock.monotonic() + seconds
+        key.throttled += 1
+        logger.warning(f"⏸️ Chave {key.label} em pausa por {seconds:.0f}s (429)")
+
+    def sync_remaining(self, key: ApiKey, remaining: int):
+        """
+        Ajusta o contador pelo x-ratelimit-requests-remaining da API (outros
+        processos ou o painel podem ter gasto a mesma cota)
+        """
+        used = key.counter.daily_limit - remaining
+        if used > key.counter.count:
+            key.counter.count = used
+
+    def add_saved(self, n: int):
+        self._check_reset()
+        self.saved += n
+
+    def _check_reset(self):
+        for k in self.keys:
+            k.counter._check_reset()
+        today = clock.now().date()
+        if today > self.last_reset:
+            self.last_reset = today
+            self.saved = 0
+
+    def to_dict(self) -> Dict:
+        return {"keys": {k.id: k.counter.to_dict() for k in self.keys},
+                "saved": self.saved, "date": self.last_reset.isoformat()}
+
+    def load_dict(self, d: Dict):
+        if "keys" not in d:
+            # Formato antigo: um só contador, atribuído à primeira chave
+            self.keys[0].counter.load_dict(d)
+            return
+        for k in self.keys:
+            if k.id in d["keys"]:
+                k.counter.load_dict(d["keys"][k.id])
+        if d.get("date") == clock.now().date().isoformat():
+            self.saved = d.get("saved", 0)
+
+    def get_stats(self) -> str:
+        remaining = self.daily_limit - self.count
+        line = f"📊 {self.count}/{self.daily_limit} req ({remaining} restantes, {self.saved} economizadas)"
+        if len(self.keys) == 1:
+            return line
+        per_key = [
+            f"  🔑 {k.label}: {k.counter.count}/{k.counter.daily_limit}"
+            f"{f' | pausa {k.cooling():.0f}s' if k.cooling() else ''}"
+            f"{f' | {k.throttled}x 429' if k.throttled else ''}"
+            for k in self.keys
+        ]
+        return "\n".join([line] + per_key)
 
-req_counter = RequestCounter()
+req_counter = KeyPool.from_env(API_KEYS)
 
 # =========================================================
 # DATA CLASSES
 # =========================================================
 
-@dataclass
+class Trigger(Enum):
+    """
+    Evento do jogo que liquida apostas
+    """
+    NEXT_CORNER = "next_corner"
+    HALF_TIME = "half_time"
+    FULL_TIME = "full_time"
+
+class BetKind(IntEnum):
+    """
+    Apostas que o ResultEvaluator sabe liquidar, resolvidas uma vez (na
+    criação) pelo trecho do bet_type em BET_MARKERS
+    """
+    NEXT_CORNER = 0
+    TEAM_CORNERS = 1
+    OVER_HT = 2
+    OVER_FT = 3
+
+    @classmethod
+    def of(cls, bet_type: str) -> "BetKind":
+        for kind, marker in BET_MARKERS.items():
+            if marker in bet_type:
+                return kind
+        raise ValueError(f"aposta sem liquidação conhecida: {bet_type}")
+
+    @property
+    def trigger(self) -> Trigger:
+        return BET_TRIGGERS[self]
+
+BET_MARKERS = {
+    BetKind.NEXT_CORNER: "Próximo",
+    BetKind.TEAM_CORNERS: "Cantos por equipe",
+    BetKind.OVER_HT: "Over HT",
+    BetKind.OVER_FT: "Over FT",
+}
+
+BET_TRIGGERS = {
+    BetKind.NEXT_CORNER: Trigger.NEXT_CORNER,
+    BetKind.TEAM_CORNERS: Trigger.FULL_TIME,
+    BetKind.OVER_HT: Trigger.HALF_TIME,
+    BetKind.OVER_FT: Trigger.FULL_TIME,
+}
+
+# Os dois times bateram escanteio entre duas leituras: ordem desconhecida
+NEXT_CORNER_BOTH = "Ambos"
+
+FINISHED_STATUSES = ("FT", "AET", "PEN")
+ABANDONED_STATUSES = ("PST", "CANC", "ABD", "AWD", "WO")
+FIRST_HALF_STATUSES = ("1H",)
+# Status que provam que o intervalo já passou (SUSP/INT/BT/LIVE não provam)
+PAST_HALF_TIME_STATUSES = ("2H", "ET", "P") + FINISHED_STATUSES
+
+class FixtureStatus(IntEnum):
+    """
+    Status curto da API-Football como inteiro, para o que fica guardado por
+    jogo; str() devolve o código original
+    """
+    UNKNOWN = 0
+    TBD = 1
+    NS = 2
+    FIRST_HALF = 3
+    HALF_TIME = 4
+    SECOND_HALF = 5
+    EXTRA_TIME = 6
+    BREAK_TIME = 7
+    PENALTIES = 8
+    SUSPENDED = 9
+    INTERRUPTED = 10
+    FINISHED = 11
+    FINISHED_AET = 12
+    FINISHED_PEN = 13
+    POSTPONED = 14
+    CANCELLED = 15
+    ABANDONED = 16
+    AWARDED = 17
+    WALKOVER = 18
+    LIVE = 19
+
+    @classmethod
+    def of(cls, short: Optional[str]) -> "FixtureStatus":
+        return STATUS_CODES.get(short, cls.UNKNOWN)
+
+    @property
+    def short(self) -> Optional[str]:
+        return STATUS_SHORTS[self]
+
+    def __str__(self):
+        return str(self.short)
+
+STATUS_SHORTS = dict(zip(FixtureStatus, (
+    None, "TBD", "NS", "1H", "HT", "2H", "ET", "BT", "P", "SUSP", "INT",
+    "FT", "AET", "PEN", "PST", "CANC", "ABD", "AWD", "WO", "LIVE",
+)))
+STATUS_CODES = {short: status for status, short in STATUS_SHORTS.items() if short}
+
+def intern_name(s: Optional[str]) -> Optional[str]:
+    """
+    Nomes de time e liga se repetem em todo payload; internados, cada nome
+    existe uma vez só na memória
+    """
+    return sys.intern(s) if isinstance(s, str) else s
+
+@dataclass(slots=True)
 class BetSuggestion:
     bet_type: str
     side: Optional[str]
@@ -149,8 +935,16 @@ class BetSuggestion:
     corners_at_entry_away: int
     predicted_next_corner: Optional[str] = None
     result: Optional[str] = None  # "GREEN", "RED", "PENDING"
+    kind: Optional[BetKind] = None
+
+    def __post_init__(self):
+        # Estados antigos não têm kind (ou o guardam como o trecho do bet_type)
+        if self.kind is None or isinstance(self.kind, str):
+            self.kind = BetKind.of(self.kind or self.bet_type)
+        else:
+            self.kind = BetKind(self.kind)
 
-@dataclass
+@dataclass(slots=True)
 class MatchData:
     fixture_id: int
     home_team: str
@@ -168,230 +962,2335 @@ class MatchData:
     is_finished: bool = False
     half_time_corners: Optional[int] = None
     result_updated: bool = False
+    first_half_corners: int = 0   # último total visto no 1º tempo (se o intervalo passar sem leitura)
+    messages: Dict[int, int] = field(default_factory=dict)  # chat_id -> message_id da entrada
+
+    def fired_triggers(self) -> Set[Trigger]:
+        """
+        Gatilhos que já aconteceram, pelos fatos registrados no jogo
+        """
+        fired = set()
+        if self.next_corner_after_entry is not None:
+            fired.add(Trigger.NEXT_CORNER)
+        if self.half_time_corners is not None:
+            fired.add(Trigger.HALF_TIME)
+        if self.is_finished:
+            fired.add(Trigger.FULL_TIME)
+        return fired
 
 # =========================================================
 # CACHE PERSISTENTE
 # =========================================================
 
+def stats_ttl_for(status: Optional[str], minute: Optional[int]) -> int:
+    if status in ("HT", "BT", "P"):
+        return STAT_TTL_BREAK
+    if status in FINISHED_STATUSES:
+        return STAT_TTL_FINISHED
+    if minute is None:
+        return STAT_TTL
+    if minute >= 80 or 40 <= minute <= 45:
+        return STAT_TTL_FAST
+    return STAT_TTL_LIVE
+
 class SmartCache:
-    def __init__(self):
-        self._stats_cache: Dict[int, Tuple[float, Dict]] = {}
+    """
+    LRU com TTL por entrada e relógio monotônico. Entradas vencidas ainda
+    podem ser servidas por STALE_GRACE segundos enquanto são atualizadas
+    """
+    def __init__(self, max_entries: int = STATS_CACHE_MAX):
+        self.max_entries = max_entries
+        # fixture_id -> (expira_em, valor)
+        self._stats_cache: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
         self._live_cache: Optional[Tuple[float, List]] = None
         self._live_cache_ttl = 120
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
         
     def get_stats(self, fixture_id: int) -> Optional[Dict]:
         entry = self._stats_cache.get(fixture_id)
-        if not entry:
+        if not entry or clock.monotonic() > entry[0]:
+            self.misses += 1
             return None
-        ts, val = entry
-        if (asyncio.get_event_loop().time() - ts) > STAT_TTL:
-            del self._stats_cache[fixture_id]
+        self._stats_cache.move_to_end(fixture_id)
+        self.hits += 1
+        return entry[1]
+    
+    def is_fresh(self, fixture_id: int) -> bool:
+        entry = self._stats_cache.get(fixture_id)
+        return entry is not None and clock.monotonic() <= entry[0]
+    
+    def get_stale(self, fixture_id: int) -> Optional[Dict]:
+        entry = self._stats_cache.get(fixture_id)
+        if not entry or clock.monotonic() > entry[0] + STALE_GRACE:
             return None
-        return val
+        self.stale_hits += 1
+        return entry[1]
+    
+    def set_stats(self, fixture_id: int, value: Dict, status: Optional[str] = None, minute: Optional[int] = None):
+        self._stats_cache[fixture_id] = (clock.monotonic() + stats_ttl_for(status, minute), value)
+        self._stats_cache.move_to_end(fixture_id)
+        while len(self._stats_cache) > self.max_entries:
+            self._stats_cache.popitem(last=False)
+            self.evictions += 1
+    
+    def forget(self, live_ids: Set[int]):
+        # Jogo que saiu do ao vivo (encerrado) não volta a ser consultado
+        for fid in [fid for fid in self._stats_cache if fid not in live_ids]:
+            del self._stats_cache[fid]
+
+    def sweep(self) -> int:
+        limit = clock.monotonic() - STALE_GRACE
+        expired = [fid for fid, (expires, _) in self._stats_cache.items() if expires < limit]
+        for fid in expired:
+            del self._stats_cache[fid]
+        self.expirations += len(expired)
+        return len(expired)
     
-    def set_stats(self, fixture_id: int, value: Dict):
-        self._stats_cache[fixture_id] = (asyncio.get_event_loop().time(), value)
+    async def run_sweeper(self):
+        while True:
+            await clock.sleep(CACHE_SWEEP_INTERVAL)
+            removed = self.sweep()
+            if removed:
+                logger.debug(f"Cache: {removed} entradas expiradas removidas")
+            # Sobrevive a reinícios: gravado a cada limpeza, não a cada ciclo
+            state_store.put("stats_cache", self.export_stats())
     
     def get_live_matches(self) -> Optional[List]:
         if not self._live_cache:
             return None
         ts, matches = self._live_cache
-        if (asyncio.get_event_loop().time() - ts) > self._live_cache_ttl:
+        if (clock.monotonic() - ts) > self._live_cache_ttl:
             self._live_cache = None
             return None
         return matches
     
     def set_live_matches(self, matches: List):
-        self._live_cache = (asyncio.get_event_loop().time(), matches)
+        self._live_cache = (clock.monotonic(), matches)
+    
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def get_summary(self) -> str:
+        return (f"🗄 Cache: {len(self._stats_cache)}/{self.max_entries} jogos | "
+                f"hit {self.hit_ratio() * 100:.0f}% ({self.hits}/{self.hits + self.misses}) | "
+                f"stale {self.stale_hits} | evict {self.evictions} | exp {self.expirations}")
+    
+    def export_stats(self) -> Dict:
+        # Validade convertida para horário de parede, que sobrevive ao reinício
+        offset = clock.time() - clock.monotonic()
+        return {str(fid): [expires + offset, val] for fid, (expires, val) in self._stats_cache.items()}
+    
+    def load_stats(self, d: Dict):
+        offset = clock.time() - clock.monotonic()
+        now_wall = clock.time()
+        for fid, (wall_expires, val) in d.items():
+            if wall_expires + STALE_GRACE >= now_wall:
+                self._stats_cache[int(fid)] = (wall_expires - offset, val)
 
 smart_cache = SmartCache()
 
+# Cliente ativo (criado em main_loop), exposto para o keep-alive
+api_client: Optional["OptimizedApiClient"] = None
+pipeline: Optional["FixturePipeline"] = None
+
+# =========================================================
+# PERSISTÊNCIA
+# =========================================================
+
+def match_to_dict(md: MatchData) -> Dict:
+    return asdict(md)
+
+def match_from_dict(d: Dict) -> MatchData:
+    d = dict(d)
+    d["suggestions"] = [BetSuggestion(**s) for s in d.get("suggestions", [])]
+    for name in ("home_team", "away_team", "league"):
+        d[name] = intern_name(d.get(name))
+    # Chaves do JSON voltam como string; estados antigos só têm a mensagem do CHAT_ID
+    d["messages"] = {int(chat): mid for chat, mid in d.get("messages", {}).items()}
+    if not d["messages"] and d.get("message_id") is not None:
+        d["messages"] = {CHAT_ID: d["message_id"]}
+    return MatchData(**d)
+
+class StateStore:
+    """
+    SQLite em modo WAL. As escritas ficam acumuladas (a última versão de cada
+    chave vence) e são gravadas em lote numa thread dedicada, fora do event loop.
+    O arquivo só é aberto no primeiro uso: importar o módulo não cria nada
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: Dict[Tuple[str, object], Optional[str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self.writes = 0
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS matches "
+                               "(fixture_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            self._conn.commit()
+        return self._conn
+    
+    def put(self, key: str, value):
+        self._pending[("kv", key)] = json.dumps(value)
+    
+    def put_match(self, md: MatchData):
+        self._pending[("matches", md.fixture_id)] = json.dumps(match_to_dict(md))
+    
+    def delete_match(self, fixture_id: int):
+        self._pending[("matches", fixture_id)] = None
+    
+    def get(self, key: str):
+        row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def load_matches(self) -> Dict[int, MatchData]:
+        matches = {}
+        for fid, data in self.conn.execute("SELECT fixture_id, data FROM matches"):
+            try:
+                matches[fid] = match_from_dict(json.loads(data))
+            except Exception as e:
+                logger.error(f"Estado inválido para o jogo {fid}: {e}")
+        return matches
+    
+    def _write_batch(self, batch: Dict[Tuple[str, object], Optional[str]]):
+        conn = self.conn
+        with conn:
+            for (table, key), value in batch.items():
+                if table == "kv":
+                    conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+                elif value is None:
+                    conn.execute("DELETE FROM matches WHERE fixture_id = ?", (key,))
+                else:
+                    conn.execute("INSERT OR REPLACE INTO matches (fixture_id, data) VALUES (?, ?)", (key, value))
+        self.writes += len(batch)
+    
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await clock.run_blocking(self._executor, self._write_batch, batch)
+        except Exception as e:
+            logger.error(f"Erro ao gravar estado: {e}")
+    
+    async def run(self):
+        while True:
+            await clock.sleep(STATE_FLUSH_INTERVAL)
+            await self.flush()
+    
+    def close(self):
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._write_batch(batch)
+        self._executor.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+state_store = StateStore(STATE_DB)
+
+# =========================================================
+# COORDENAÇÃO ENTRE SHARDS
+# =========================================================
+
+class Coordinator:
+    """
+    Coordena workers pelo SQLite compartilhado: heartbeat, líder por lease
+    (só ele chama /fixtures?live= e publica a lista), partição dos jogos por
+    rendezvous hashing e trava por jogo contra alertas duplicados. Quando um
+    worker morre, só os jogos dele mudam de dono
+    """
+    def __init__(self, path: str, worker_id: str):
+        self.worker_id = worker_id
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leader (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                           "worker_id TEXT NOT NULL, expires REAL NOT NULL)")
+        # interval: próximo ciclo do líder, base para os outros julgarem se a lista venceu
+        self._conn.execute("CREATE TABLE IF NOT EXISTS live (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                           "fetched REAL NOT NULL, interval REAL NOT NULL, data TEXT NOT NULL)")
+        # Um alerta por jogo: quem insere primeiro envia; data guarda a entrada para o próximo dono
+        self._conn.execute("CREATE TABLE IF NOT EXISTS alerts (fixture_id INTEGER PRIMARY KEY, "
+                           "worker_id TEXT NOT NULL, claimed REAL NOT NULL, data TEXT)")
+        self._conn.commit()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coordinator")
+        self._pending: Dict[int, Optional[str]] = {}
+        # Jogos travados por outro worker: não tenta de novo, só adota
+        self.blocked: Set[int] = set()
+        self.members: List[str] = []
+        self.is_leader = False
+        self.needs_adoption = False
+        self.rebalances = 0
+        self.duplicates_blocked = 0
+        self.handed_off = 0
+        self.adopted = 0
+        self.stale_reads = 0
+
+    async def _run(self, fn, *args):
+        return await clock.run_blocking(self._executor, fn, *args)
+
+    def _heartbeat_sync(self, now: float) -> Tuple[List[str], bool]:
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO workers (worker_id, heartbeat) VALUES (?, ?)",
+                               (self.worker_id, now))
+            self._conn.execute("INSERT OR IGNORE INTO leader (id, worker_id, expires) VALUES (1, ?, ?)",
+                               (self.worker_id, now + WORKER_TTL))
+            leader = self._conn.execute(
+                "UPDATE leader SET worker_id = ?, expires = ? WHERE id = 1 AND (worker_id = ? OR expires < ?)",
+                (self.worker_id, now + WORKER_TTL, self.worker_id, now)
+            ).rowcount == 1
+            self._conn.execute("DELETE FROM workers WHERE heartbeat < ?", (now - 10 * WORKER_TTL,))
+            self._conn.execute("DELETE FROM alerts WHERE claimed < ?", (now - 86400,))
+            members = [row[0] for row in self._conn.execute(
+                "SELECT worker_id FROM workers WHERE heartbeat >= ? ORDER BY worker_id", (now - WORKER_TTL,))]
+        return members, leader
+
+    async def heartbeat(self):
+        members, leader = await self._run(self._heartbeat_sync, clock.time())
+        if leader != self.is_leader:
+            logger.info(f"👑 {self.worker_id} {'assumiu' if leader else 'deixou'} a liderança")
+        if members != self.members:
+            logger.info(f"🧩 Workers: {', '.join(members)} (antes: {', '.join(self.members) or '-'})")
+            self.rebalances += 1
+            self.needs_adoption = True
+        self.members, self.is_leader = members, leader
+
+    def owner(self, fixture_id: int) -> str:
+        if not self.members:
+            return self.worker_id
+        return max(self.members, key=lambda w: zlib.crc32(f"{w}:{fixture_id}".encode()))
+
+    def owns(self, fixture_id: int) -> bool:
+        return self.owner(fixture_id) == self.worker_id
+
+    def _publish_live_sync(self, now: float, interval: float, data: str):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO live (id, fetched, interval, data) VALUES (1, ?, ?, ?)",
+                               (now, interval, data))
+
+    async def publish_live(self, matches: List[Dict], interval: float):
+        await self._run(self._publish_live_sync, clock.time(), interval, json.dumps(matches))
+
+    def _read_live_sync(self) -> Optional[Tuple[float, float, str]]:
+        return self._conn.execute("SELECT fetched, interval, data FROM live WHERE id = 1").fetchone()
+
+    async def read_live(self) -> Optional[List[Dict]]:
+        """
+        Lista publicada pelo líder; None se não há nenhuma ou se ela passou de
+        2 intervalos do líder sem ser renovada (líder travado ou morto antes
+        do fim do lease)
+        """
+        row = await self._run(self._read_live_sync)
+        if not row:
+            return None
+        fetched, interval, data = row
+        age = clock.time() - fetched
+        max_age = 2 * interval
+        if age > max_age:
+            self.stale_reads += 1
+            logger.warning(f"🧩 Lista ao vivo publicada há {age:.0f}s (máx. {max_age:.0f}s): buscando direto")
+            return None
+        return json_loads(data)
+
+    def _claim_sync(self, fixture_id: int, now: float) -> bool:
+        with self._conn:
+            return self._conn.execute(
+                "INSERT OR IGNORE INTO alerts (fixture_id, worker_id, claimed) VALUES (?, ?, ?)",
+                (fixture_id, self.worker_id, now)
+            ).rowcount == 1
+
+    async def claim_alert(self, fixture_id: int) -> bool:
+        if fixture_id in self.blocked:
+            return False
+        claimed = await self._run(self._claim_sync, fixture_id, clock.time())
+        if not claimed:
+            self.blocked.add(fixture_id)
+            self.duplicates_blocked += 1
+            logger.info(f"🔒 Alerta do jogo {fixture_id} já enviado por outro worker")
+        return claimed
+
+    def _release_sync(self, fixture_id: int):
+        with self._conn:
+            self._conn.execute("DELETE FROM alerts WHERE fixture_id = ? AND worker_id = ?", (fixture_id, self.worker_id))
+
+    async def release_alert(self, fixture_id: int):
+        await self._run(self._release_sync, fixture_id)
+
+    def put_match(self, md: MatchData):
+        self._pending[md.fixture_id] = json.dumps(match_to_dict(md))
+
+    def finish_match(self, fixture_id: int):
+        self._pending[fixture_id] = None
+
+    def _write_matches_sync(self, batch: Dict[int, Optional[str]]):
+        with self._conn:
+            self._conn.executemany("UPDATE alerts SET data = ? WHERE fixture_id = ? AND worker_id = ?",
+                                   [(data, fid, self.worker_id) for fid, data in batch.items()])
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        await self._run(self._write_matches_sync, batch)
+
+    def _adopt_sync(self, fixture_ids: List[int]) -> List[Tuple[int, str]]:
+        rows = []
+        with self._conn:
+            for i in range(0, len(fixture_ids), 500):
+                chunk = fixture_ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows += self._conn.execute(
+                    f"SELECT fixture_id, data FROM alerts WHERE fixture_id IN ({marks}) "
+                    f"AND worker_id != ? AND data IS NOT NULL", (*chunk, self.worker_id)
+                ).fetchall()
+            self._conn.executemany("UPDATE alerts SET worker_id = ? WHERE fixture_id = ?",
+                                   [(self.worker_id, fid) for fid, _ in rows])
+        return rows
+
+    async def adopt(self, fixture_ids: List[int]) -> List[MatchData]:
+        """
+        Assume as entradas de outros workers nestes jogos (para seguir editando a mensagem)
+        """
+        if not fixture_ids:
+            return []
+        adopted = []
+        for fid, data in await self._run(self._adopt_sync, fixture_ids):
+            try:
+                adopted.append(match_from_dict(json.loads(data)))
+            except Exception as e:
+                logger.error(f"Entrada inválida para o jogo {fid}: {e}")
+        self.adopted += len(adopted)
+        return adopted
+
+    async def run(self):
+        while True:
+            try:
+                await self.heartbeat()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erro na coordenação: {e}")
+            await clock.sleep(HEARTBEAT_INTERVAL)
+
+    def get_stats(self) -> str:
+        return (f"🧩 Worker {self.worker_id}{' (líder)' if self.is_leader else ''}: "
+                f"{len(self.members)} ativos | {self.rebalances} rebalanceamentos | "
+                f"{self.handed_off} entregues, {self.adopted} adotados | "
+                f"{self.duplicates_blocked} alertas duplicados evitados | "
+                f"{self.stale_reads} listas vencidas")
+
+    def close(self):
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._write_matches_sync(batch)
+        self._executor.shutdown(wait=True)
+        # Saída limpa: os outros rebalanceiam já, sem esperar o WORKER_TTL
+        with self._conn:
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+            self._conn.execute("UPDATE leader SET expires = 0 WHERE worker_id = ?", (self.worker_id,))
+        self._conn.close()
+
+coordinator = Coordinator(COORD_DB, WORKER_ID) if COORD_DB and not TAPE_REPLAY else None
+
+# =========================================================
+# GERENCIADOR DE HORÁRIOS
+# =========================================================
+
+class BudgetScheduler:
+    """
+    Escolhe o intervalo de cada ciclo distribuindo o orçamento restante
+    até meia-noite conforme a demanda prevista (jogos ao vivo + agenda do dia)
+    """
+    def __init__(self, counter: RequestCounter):
+        self.counter = counter
+        self.kickoffs: Optional[List[datetime]] = None
+        self.schedule_date = None
+        self.last_decision: Dict = {}
+
+    def needs_schedule(self) -> bool:
+        return self.schedule_date != clock.now().date()
+
+    def set_schedule(self, kickoffs: Optional[List[datetime]]):
+        self.kickoffs = sorted(kickoffs) if kickoffs is not None else None
+        self.schedule_date = clock.now().date()
+        if self.kickoffs is not None:
+            logger.info(f"📅 Agenda do dia: {len(self.kickoffs)} jogos prioritários")
+
+    @staticmethod
+    def cycle_cost(live_count: int) -> int:
+        # 1 req para /fixtures?live=all + 1 req por lote de estatísticas
+        return 1 + math.ceil(live_count / STATS_BATCH_SIZE)
+
+    def _expected_live(self, t: datetime) -> int:
+        if self.kickoffs is not None:
+            window = timedelta(seconds=MATCH_WINDOW)
+            return sum(1 for k in self.kickoffs if k <= t < k + window)
+
+        for start, end in PEAK_HOURS:
+            if start <= t.hour <= end:
+                return 1
+        return 0
+
+    def forecast_demand(self, now: datetime, live_count: int) -> float:
+        """
+        Custo previsto até meia-noite, em requisições × segundos de intervalo
+        """
+        midnight = datetime.combine(now.date() + timedelta(days=1), dtime.min)
+        horizon = now + timedelta(seconds=LIVE_HORIZON)
+        demand = 0.0
+        t = now
+        while t < midnight:
+            step = min(SCHEDULER_SLOT, (midnight - t).total_seconds())
+            expected = self._expected_live(t)
+            if t < horizon:
+                expected = max(expected, live_count)
+            if expected:
+                demand += self.cycle_cost(expected) * step
+            t += timedelta(seconds=step)
+        return demand
+
+    def _next_kickoff(self, now: datetime) -> Optional[datetime]:
+        for k in self.kickoffs or []:
+            if k > now:
+                return k
+        return None
+
+    def off_peak(self) -> bool:
+        """
+        Sem jogos ao vivo no último ciclo e sem início previsto na próxima hora
+        """
+        if self.kickoffs is None or self.last_decision.get("live", 1) != 0:
+            return False
+        now = clock.now()
+        next_kickoff = self._next_kickoff(now)
+        return next_kickoff is None or (next_kickoff - now).total_seconds() >= PROFILE_QUIET_LEAD
+
+    def spare_budget(self) -> int:
+        """
+        Requisições que sobrariam mesmo consultando no intervalo mínimo até meia-noite
+        """
+        self.counter._check_reset()
+        remaining = self.counter.daily_limit - self.counter.count - BUDGET_RESERVE
+        needed = self.forecast_demand(clock.now(), 0) / POLL_INTERVAL_MIN
+        return max(int(remaining - needed), 0)
+
+    def next_interval(self, live_count: int) -> int:
+        now = clock.now()
+        self.counter._check_reset()
+        remaining = self.counter.daily_limit - self.counter.count - BUDGET_RESERVE
+        demand = self.forecast_demand(now, live_count)
+
+        # Lista vazia com jogos previstos agora é falha na busca (5xx, breaker,
+        # prazo, cota): segue o orçamento em vez de esperar o próximo início
+        if live_count == 0 and self.kickoffs is not None and self._expected_live(now) == 0:
+            next_kickoff = self._next_kickoff(now)
+            interval = (next_kickoff - now).total_seconds() if next_kickoff else POLL_INTERVAL_LOW
+            reason = "aguardando próximo jogo"
+        elif remaining <= 0:
+            interval = POLL_INTERVAL_LOW
+            reason = "orçamento esgotado"
+        elif demand <= 0:
+            interval = POLL_INTERVAL_LOW
+            reason = "sem jogos previstos"
+        else:
+            interval = demand / remaining
+            reason = "orçamento distribuído"
+
+        interval = int(min(max(interval, POLL_INTERVAL_MIN), POLL_INTERVAL_LOW))
+        self.last_decision = {
+            "interval": interval,
+            "live": live_count,
+            "remaining": remaining,
+            "demand": round(demand),
+            "reason": reason,
+        }
+        return interval
+
+    def get_stats(self) -> str:
+        d = self.last_decision
+        if not d:
+            return "⏱ Agendador: aguardando primeiro ciclo"
+        agenda = len(self.kickoffs) if self.kickoffs is not None else "indisponível"
+        return (f"⏱ Intervalo: {d['interval']}s ({d['reason']}) | ao vivo: {d['live']} | "
+                f"orçamento: {d['remaining']} req | demanda: {d['demand']} | agenda: {agenda}")
+
+scheduler = BudgetScheduler(req_counter)
+
+class LeagueFilter:
+    """
+    Ligas prioritárias como conjunto de ids da API: vira o filtro live=39-140-...
+    no servidor e um teste O(1) no cliente. Enquanto os ids não são resolvidos,
+    compara (nome, país) exatos. Ligas assinadas por algum chat fora das
+    prioritárias entram na coleta também
+    """
+    def __init__(self):
+        self.ids: frozenset = frozenset()
+        self.extra_ids: frozenset = frozenset()
+        self.live_param = "all"
+        self.resolved_on: Optional[str] = None
+        self._names = frozenset(
+            (name.lower(), country.lower()) for name, country in PRIORITY_LEAGUE_LOOKUP.values()
+        )
+
+    def set_ids(self, ids: List[int], resolved_on: str):
+        self.ids = frozenset(ids)
+        self.resolved_on = resolved_on
+        self._update_live_param()
+
+    def set_extra_ids(self, ids: FrozenSet[int]):
+        extra = frozenset(ids) - self.ids
+        if extra != self.extra_ids:
+            logger.info(f"Ligas extras das assinaturas: {sorted(extra) or '-'}")
+        self.extra_ids = frozenset(ids)
+        self._update_live_param()
+
+    def _update_live_param(self):
+        fetch = self.ids | self.extra_ids
+        self.live_param = "-".join(str(i) for i in sorted(fetch)) if self.ids else "all"
+
+    def needs_resolve(self) -> bool:
+        if not self.ids or not self.resolved_on:
+            return True
+        age = clock.now().date() - datetime.fromisoformat(self.resolved_on).date()
+        return age.days >= LEAGUE_IDS_TTL_DAYS
+
+    def is_priority_name(self, name: str, country: str) -> bool:
+        return ((name or "").lower(), (country or "").lower()) in self._names
+
+    def matches(self, m: Dict) -> bool:
+        league = m.get("league") or {}
+        league_id = league.get("id")
+        if league_id in self.extra_ids:
+            return True
+        if self.ids:
+            return league_id in self.ids
+        return self.is_priority_name(league.get("name"), league.get("country"))
+
+league_filter = LeagueFilter()
+
+# =========================================================
+# UTIL
+# =========================================================
+
+def esc_html(s: str) -> str:
+    if s is None:
+        return ""
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def needs_statistics(m: Dict) -> bool:
+    status = m["fixture"]["status"]
+    minute = status.get("elapsed")
+    if minute is None or minute < 10:
+        return False
+    return status.get("short") not in FINISHED_STATUSES
+
+def has_team_stats(team_stats: Optional[List]) -> bool:
+    """
+    Leitura válida só com o bloco de estatísticas dos dois times; sem ele a
+    API ainda não tem os números (ou a chamada falhou) e zeros seriam falsos
+    """
+    return bool(team_stats) and len(team_stats) >= 2
+
+def parse_corner_stats(team_stats: List) -> Dict:
+    """
+    Extrai os escanteios de [{"team": ..., "statistics": [...]}, ...] (casa, fora)
+    """
+    result = {"corners_home": 0, "corners_away": 0, "corners_total": 0}
+    if not team_stats or len(team_stats) < 2:
+        return result
+
+    def get_value(stats, name):
+        for s in stats:
+            if name.lower() in s.get("type", "").lower():
+                try:
+                    return int(str(s.get("value", 0)).replace("%", ""))
+                except Exception:
+                    return 0
+        return 0
+
+    result["corners_home"] = get_value(team_stats[0].get("statistics", []), "corner")
+    result["corners_away"] = get_value(team_stats[1].get("statistics", []), "corner")
+    result["corners_total"] = result["corners_home"] + result["corners_away"]
+    return result
+
+def compact_fixture(item: Dict) -> Dict:
+    """
+    Recorta um item de /fixtures nos campos que o bot lê: id, status, liga,
+    times, gols e só as estatísticas de escanteio (eventos, escalações,
+    jogadores e placar por período ficam de fora). Status e nomes saem
+    internados: a lista ao vivo é refeita a cada ciclo com os mesmos textos
+    """
+    fixture = item.get("fixture") or {}
+    status = fixture.get("status") or {}
+    league = item.get("league") or {}
+    teams = item.get("teams") or {}
+    home = teams.get("home") or {}
+    away = teams.get("away") or {}
+    record = {
+        "fixture": {"id": fixture.get("id"), "timestamp": fixture.get("timestamp"),
+                    "status": {"short": intern_name(status.get("short")), "elapsed": status.get("elapsed")}},
+        "league": {"id": league.get("id"), "name": intern_name(league.get("name")),
+                   "country": intern_name(league.get("country"))},
+        "teams": {"home": {"id": home.get("id"), "name": intern_name(home.get("name"))},
+                  "away": {"id": away.get("id"), "name": intern_name(away.get("name"))}},
+        "goals": item.get("goals") or {},
+    }
+    if "statistics" in item:
+        record["statistics"] = [
+            {"statistics": [s for s in team.get("statistics") or [] if "corner" in (s.get("type") or "").lower()]}
+            for team in item["statistics"] or []
+        ]
+    return record
+
+class MeteredReader:
+    """
+    Repassa o corpo da resposta em pedaços, contando bytes e o tempo gasto
+    esperando a rede (para separar rede de parse nas métricas)
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+        self.wait = 0.0
+
+    async def read(self, n: int = -1) -> bytes:
+        t0 = time.perf_counter()
+        chunk = await self.stream.read(n)
+        self.wait += time.perf_counter() - t0
+        self.bytes += len(chunk)
+        return chunk
+
+async def stream_fixtures(content, compact: Callable[[Dict], Dict]) -> Tuple[Dict, int, float]:
+    """
+    Decodifica /fixtures item a item com ijson: só um jogo completo existe na
+    memória por vez. Devolve (documento compacto, bytes lidos, segundos de parse)
+    """
+    reader = MeteredReader(content)
+    t0 = time.perf_counter()
+    items = [compact(item) async for item in ijson.items_async(reader, "response.item", use_float=True)]
+    return {"response": items}, reader.bytes, time.perf_counter() - t0 - reader.wait
+
+# =========================================================
+# API CLIENT OTIMIZADO
+# =========================================================
+
+def endpoint_label(url: str, params: Dict) -> str:
+    if url.endswith("/statistics"):
+        return ENDPOINT_STATISTICS
+    if "live" in params:
+        return ENDPOINT_LIVE
+    if "ids" in params:
+        return ENDPOINT_IDS
+    if "date" in params:
+        return ENDPOINT_SCHEDULE
+    return ENDPOINT_OTHER
+
+def header_number(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+class KeyThrottled(aiohttp.ClientError):
+    """429 numa chave: troca de chave em vez de esperar o backoff"""
+
+class NoKeyAvailable(Exception):
+    """Todas as chaves sem cota: nenhuma requisição foi feita"""
+
+class UpstreamError(aiohttp.ClientError):
+    """5xx da API; retry_after vem do cabeçalho, se houver"""
+    def __init__(self, status: int, text: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {text[:200]}")
+        self.status = status
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """A espera (backoff, Retry-After, pausa de chave) passaria do prazo do ciclo"""
+
+# =========================================================
+# RESILIÊNCIA DO UPSTREAM
+# =========================================================
+
+# Prazo (clock.monotonic) das requisições do ciclo atual; None fora dos ciclos
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def time_left() -> Optional[float]:
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - clock.monotonic()
+
+def check_deadline(wait: float = 0.0):
+    left = time_left()
+    if left is not None and wait >= left:
+        raise DeadlineExceeded(f"espera de {wait:.1f}s, restam {max(left, 0):.1f}s no ciclo")
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+class CircuitBreaker:
+    """
+    Um por endpoint. Fechado: tudo passa. BREAKER_FAILURES falhas seguidas
+    abrem: as chamadas voltam None na hora, sem gastar requisição. Vencida a
+    pausa, fica meio-aberto e deixa passar uma sonda; sucesso fecha, falha
+    reabre com a pausa dobrada
+    """
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self.probing = False
+        self.opens = 0
+        self.short_circuits = 0
+
+    def allow(self) -> bool:
+        if self.state is BreakerState.OPEN:
+            if clock.monotonic() - self.opened_at < self.cooldown:
+                self.short_circuits += 1
+                return False
+            self.state = BreakerState.HALF_OPEN
+            self.probing = False
+            logger.info(f"🔌 Disjuntor {self.endpoint} meio-aberto: enviando sonda")
+        if self.state is BreakerState.HALF_OPEN:
+            if self.probing:
+                self.short_circuits += 1
+                return False
+            self.probing = True
+        return True
+
+    def success(self):
+        if self.state is not BreakerState.CLOSED:
+            logger.info(f"🔌 Disjuntor {self.endpoint} fechado")
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state is BreakerState.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, BREAKER_COOLDOWN_MAX)
+        elif self.state is BreakerState.OPEN or self.failures < BREAKER_FAILURES:
+            return
+        self.state = BreakerState.OPEN
+        self.opened_at = clock.monotonic()
+        self.probing = False
+        self.opens += 1
+        logger.warning(f"🔌 Disjuntor {self.endpoint} aberto por {self.cooldown}s ({self.failures} falhas seguidas)")
+
+    def release(self):
+        # Resultado neutro (429, prazo, 4xx): a sonda não conta nem como sucesso nem como falha
+        self.probing = False
+
+class RetryBudget:
+    """
+    Fichas de retry ganhas com respostas boas (RETRY_BUDGET_RATIO cada). Sem
+    ficha, ou sem folga no orçamento diário além da reserva, a falha volta na
+    hora em vez de virar outra requisição
+    """
+    def __init__(self):
+        self.tokens = float(RETRY_BUDGET_MAX)
+        self.denied = 0
+
+    def earn(self):
+        self.tokens = min(self.tokens + RETRY_BUDGET_RATIO, RETRY_BUDGET_MAX)
+
+    def spend(self) -> bool:
+        if self.tokens < 1 or req_counter.daily_limit - req_counter.count <= BUDGET_RESERVE:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        return True
+
+breakers = {ep: CircuitBreaker(ep) for ep in metrics.api_latency}
+retry_budget = RetryBudget()
+
+def breakers_summary() -> str:
+    states = ", ".join(f"{b.endpoint}: {b.state.name.lower()}" for b in breakers.values()
+                       if b.state is not BreakerState.CLOSED)
+    return (f"🔌 Disjuntores: {states or 'todos fechados'} | {sum(b.short_circuits for b in breakers.values())} "
+            f"recusadas | retries: {retry_budget.tokens:.1f} fichas, {retry_budget.denied} negados | "
+            f"{metrics.api_wasted} req desperdiçadas")
+
+class OptimizedApiClient:
+    def __init__(self, session: aiohttp.ClientSession, player: Optional[TapePlayer] = None):
+        self.session = session
+        self.player = player
+        self.semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+        # Atualizações em segundo plano: a referência segura a tarefa até o fim
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        # Single-flight: chamadas iguais em andamento compartilham a mesma tarefa
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def _fetch_json(self, url: str, params: dict = None,
+                          compact: Optional[Callable[[Dict], Dict]] = None) -> Optional[dict]:
+        """
+        compact, se dado, recorta cada item de "response" (em streaming quando há ijson)
+        """
+        params = params or {}
+        key = (url, params_key(params), compact)
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(self._fetch_json_upstream(url, params, compact))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        
+        # shield: cancelar um chamador não derruba a requisição dos outros
+        return await asyncio.shield(task)
+
+    async def _fetch_json_upstream(self, url: str, params: dict,
+                                   compact: Optional[Callable[[Dict], Dict]] = None) -> Optional[dict]:
+        if not req_counter.can_request():
+            logger.warning("⚠️ LIMITE DIÁRIO ATINGIDO! Aguardando reset...")
+            return None
+        
+        if self.player:
+            req_counter.increment(req_counter.acquire())
+            data = self.player.lookup(url, params, clock.time())
+            if data and compact:
+                data = {"response": [compact(item) for item in data.get("response", [])]}
+            return data
+        
+        endpoint = endpoint_label(url, params)
+        breaker = breakers[endpoint]
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                return None
+            try:
+                if endpoint == ENDPOINT_LIVE:
+                    data = await self._hedged_attempt(url, params, compact, endpoint)
+                else:
+                    data = await self._attempt(url, params, compact, endpoint)
+                breaker.success()
+                retry_budget.earn()
+                return data
+
+            except DeadlineExceeded as e:
+                breaker.release()
+                metrics.api_deadline_exceeded += 1
+                logger.warning(f"Prazo do ciclo esgotado em {endpoint}: {e}")
+                return None
+
+            except NoKeyAvailable:
+                # Nada foi testado: não fecha o breaker nem ganha ficha de retry
+                breaker.release()
+                logger.warning("⚠️ LIMITE DIÁRIO ATINGIDO! Aguardando reset...")
+                return None
+
+            except Exception as e:
+                throttled = isinstance(e, KeyThrottled)
+                # 4xx (fora 429) não melhora tentando de novo
+                client_error = isinstance(e, aiohttp.ClientResponseError) and e.status < 500
+                if throttled or client_error:
+                    breaker.release()
+                else:
+                    breaker.failure()
+
+                attempt += 1
+                if client_error or attempt > MAX_RETRIES:
+                    metrics.api_failures += 1
+                    logger.error(f"Erro definitivo ao acessar {url}: {e}")
+                    return None
+                if not retry_budget.spend():
+                    metrics.api_failures += 1
+                    logger.warning(f"Sem folga para retry em {endpoint} ({e})")
+                    return None
+                metrics.api_retries += 1
+
+                if throttled:
+                    # A próxima volta escolhe outra chave (ou espera a pausa acabar)
+                    continue
+
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after:
+                    backoff = min(retry_after, RETRY_AFTER_MAX)
+                else:
+                    backoff = (BACKOFF_FACTOR ** attempt) + random.uniform(0, 1)
+                try:
+                    check_deadline(backoff)
+                except DeadlineExceeded as de:
+                    metrics.api_deadline_exceeded += 1
+                    logger.warning(f"Sem retry em {endpoint}: {de}")
+                    return None
+                metrics.api_backoff_seconds += backoff
+                logger.warning(f"Tentativa {attempt}/{MAX_RETRIES} falhou. Backoff {backoff:.2f}s")
+                await clock.sleep(backoff)
+
+    async def _acquire_key(self) -> Optional[ApiKey]:
+        while True:
+            key = req_counter.acquire()
+            if key is not None:
+                return key
+            # Todas as chaves com cota estão em pausa: espera a primeira liberar
+            wait = req_counter.wait_time()
+            if not wait:
+                return None
+            check_deadline(wait)
+            metrics.api_backoff_seconds += wait
+            await clock.sleep(wait)
+
+    async def _attempt(self, url: str, params: dict, compact: Optional[Callable[[Dict], Dict]],
+                       endpoint: str) -> Optional[dict]:
+        """
+        Uma requisição, sem retry. Erros sobem para a política de _fetch_json_upstream
+        """
+        key = await self._acquire_key()
+        if key is None:
+            raise NoKeyAvailable("todas as chaves sem cota")
+
+        left = time_left()
+        check_deadline()
+        async with self.semaphore:
+            timeout = aiohttp.ClientTimeout(total=min(REQUEST_TIMEOUT, left) if left is not None else REQUEST_TIMEOUT)
+            headers = {"x-apisports-key": key.key}
+            t0 = time.perf_counter()
+            async with self.session.get(url, headers=headers, params=params, timeout=timeout) as resp:
+                
+                req_counter.increment(key)
+                metrics.api_latency[endpoint].observe(time.perf_counter() - t0)
+                remaining = header_number(resp.headers, "x-ratelimit-requests-remaining")
+                if remaining is not None:
+                    req_counter.sync_remaining(key, int(remaining))
+                
+                if resp.status != 200:
+                    # Requisição contada na cota sem trazer dados
+                    metrics.api_wasted += 1
+
+                if resp.status == 429:
+                    req_counter.throttle(key, header_number(resp.headers, "Retry-After"))
+                    raise KeyThrottled(f"HTTP 429 na chave {key.label}")
+
+                if resp.status >= 500:
+                    raise UpstreamError(resp.status, await resp.text(), header_number(resp.headers, "Retry-After"))
+
+                resp.raise_for_status()
+                # A gravação precisa do corpo bruto, então não usa streaming
+                large = resp.content_length is None or resp.content_length >= STREAM_MIN_BYTES
+                if compact and ijson and large and not tape_recorder:
+                    data, size, parse_seconds = await stream_fixtures(resp.content, compact)
+                    metrics.api_bytes += size
+                    metrics.api_parse_seconds += parse_seconds
+                    return data
+
+                body = await resp.read()
+                if tape_recorder:
+                    tape_recorder.record(url, params, resp.status, body)
+                metrics.api_bytes += len(body)
+                t1 = time.perf_counter()
+                data = json_loads(body)
+                if compact:
+                    data = {"response": [compact(item) for item in data.get("response", [])]}
+                metrics.api_parse_seconds += time.perf_counter() - t1
+                return data
+
+    async def _hedged_attempt(self, url: str, params: dict, compact: Optional[Callable[[Dict], Dict]],
+                              endpoint: str) -> Optional[dict]:
+        """
+        Se a chamada passar do p95 de latência do endpoint, dispara uma cópia
+        (paga com ficha de retry) e fica com a primeira resposta boa
+        """
+        latency = metrics.api_latency[endpoint]
+        p95 = latency.quantile(0.95) if latency.count >= HEDGE_MIN_SAMPLES else HEDGE_DEFAULT_DELAY
+        delay = max(p95 or REQUEST_TIMEOUT, HEDGE_MIN_DELAY)
+
+        first = asyncio.ensure_future(self._attempt(url, params, compact, endpoint))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        left = time_left()
+        if (left is not None and left <= 0) or not retry_budget.spend():
+            return await first
+
+        metrics.api_hedges += 1
+        second = asyncio.ensure_future(self._attempt(url, params, compact, endpoint))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            metrics.api_hedge_wins += 1
+                        return task.result()
+                    # Falta de chave numa das cópias não esconde o erro real da outra
+                    if error is None or isinstance(error, NoKeyAvailable):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> str:
+        return f"🔀 Upstream: {self.upstream_calls} chamadas | {self.coalesced} coalescidas (economizadas)"
+
+    async def get_live_smart(self):
+        cached = smart_cache.get_live_matches()
+        if cached:
+            logger.info("Usando cache de jogos ao vivo (economizou 1 req)")
+            return cached
+        
+        # Com os ids resolvidos o próprio servidor filtra as ligas
+        url = f"{BASE}/fixtures"
+        j = await self._fetch_json(url, {"live": league_filter.live_param}, compact=compact_fixture)
+        
+        if not j:
+            return []
+        
+        matches = j.get("response", [])
+        filtered = [m for m in matches if league_filter.matches(m)]
+        
+        logger.info(f"Jogos filtrados: {len(filtered)}/{len(matches)} (ligas prioritárias)")
+        
+        smart_cache.set_live_matches(filtered)
+        return filtered
+
+    async def resolve_priority_leagues(self) -> bool:
+        """
+        Resolve as ligas prioritárias para ids numa única chamada e grava em disco
+        """
+        j = await self._fetch_json(f"{BASE}/leagues", {"current": "true"})
+        if not j:
+            return False
+
+        ids = [
+            item["league"]["id"] for item in j.get("response", [])
+            if league_filter.is_priority_name(item.get("league", {}).get("name"), item.get("country", {}).get("name"))
+        ]
+        if not ids:
+            logger.warning("Nenhuma liga prioritária resolvida; mantendo live=all")
+            return False
+
+        resolved_on = clock.now().date().isoformat()
+        league_filter.set_ids(ids, resolved_on)
+        state_store.put("league_ids", {"ids": ids, "resolved_on": resolved_on})
+        logger.info(f"Ligas prioritárias resolvidas: {len(ids)}/{len(PRIORITY_LEAGUE_LOOKUP)} (live={league_filter.live_param})")
+        return True
+
+    async def get_today_schedule(self) -> Optional[List[datetime]]:
+        url = f"{BASE}/fixtures"
+        j = await self._fetch_json(url, {"date": clock.now().strftime("%Y-%m-%d")}, compact=compact_fixture)
+
+        if not j:
+            return None
+
+        kickoffs = []
+        teams = set()
+        for m in j.get("response", []):
+            if not league_filter.matches(m):
+                continue
+            ts = m.get("fixture", {}).get("timestamp")
+            if ts:
+                kickoffs.append(datetime.fromtimestamp(ts))
+            teams.update(t["id"] for t in m["teams"].values() if t.get("id"))
+        team_profiles.want(teams)
+        return kickoffs
+
+    async def get_team_fixtures(self, team_id: int) -> List[Dict]:
+        """
+        Últimos PROFILE_MATCHES jogos encerrados de um time (sem estatísticas)
+        """
+        j = await self._fetch_json(f"{BASE}/fixtures", {"team": team_id, "last": PROFILE_MATCHES},
+                                   compact=compact_fixture)
+        if not j:
+            return []
+        return [m for m in j.get("response", []) if m["fixture"]["status"]["short"] in FINISHED_STATUSES]
+
+    async def get_full_statistics(self, fixture_id: int, status: Optional[str] = None, minute: Optional[int] = None):
+        cached = smart_cache.get_stats(fixture_id)
+        if cached:
+            return cached
+
+        # Serve a entrada vencida e atualiza em segundo plano
+        stale = smart_cache.get_stale(fixture_id)
+        if stale:
+            if fixture_id not in self._refreshing:
+                task = asyncio.create_task(self._fetch_statistics(fixture_id, status, minute))
+                self._refreshing[fixture_id] = task
+                task.add_done_callback(lambda _t: self._refreshing.pop(fixture_id, None))
+            return stale
+
+        return await self._fetch_statistics(fixture_id, status, minute)
+
+    async def _fetch_statistics(self, fixture_id: int, status: Optional[str], minute: Optional[int]):
+        url = f"{BASE}/fixtures/statistics"
+        j = await self._fetch_json(url, {"fixture": fixture_id})
+
+        # Falha (erro, breaker aberto, prazo/orçamento esgotado) ou resposta
+        # vazia: nada vai para o cache e quem chamou tenta de novo depois
+        resp = j.get("response") if j else None
+        if not has_team_stats(resp):
+            return None
+
+        result = parse_corner_stats(resp)
+        smart_cache.set_stats(fixture_id, result, status, minute)
+        return result
+
+    async def get_final_statistics(self, fixture_id: int, status: str, minute: Optional[int]):
+        """
+        Estatísticas de fim de jogo direto da API: o cache pode guardar o 2º tempo.
+        None se a leitura falhou
+        """
+        return await self._fetch_statistics(fixture_id, status, minute)
+
+    async def _fetch_statistics_chunk(self, fixture_ids: List[int]) -> Optional[List[Dict]]:
+        """
+        Um lote de /fixtures?ids=; None se a chamada falhou
+        """
+        url = f"{BASE}/fixtures"
+        j = await self._fetch_json(url, {"ids": "-".join(str(fid) for fid in fixture_ids)}, compact=compact_fixture)
+
+        if not j:
+            return None
+
+        loaded = []
+        for item in j.get("response", []):
+            fixture = item.get("fixture", {})
+            fid = fixture.get("id")
+            if fid is None:
+                continue
+            loaded.append(item)
+            if not has_team_stats(item.get("statistics")):
+                continue
+            status = fixture.get("status", {})
+            smart_cache.set_stats(
+                fid, parse_corner_stats(item.get("statistics", [])),
+                status.get("short"), status.get("elapsed")
+            )
+        return loaded
+
+    async def get_fixtures(self, fixture_ids: List[int]) -> List[Dict]:
+        """
+        Jogos completos (status + estatísticas) via /fixtures?ids=, 20 por requisição
+        """
+        chunks = [fixture_ids[i:i + STATS_BATCH_SIZE] for i in range(0, len(fixture_ids), STATS_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._fetch_statistics_chunk(c) for c in chunks))
+        return [item for items in results if items for item in items]
+
+    async def prefetch_statistics(self, fixture_ids: List[int]) -> Set[int]:
+        """
+        Busca estatísticas em lote via /fixtures?ids=a-b-c e preenche o cache.
+        Retorna os ids dos lotes que falharam (nada deles entrou no cache)
+        """
+        missing = [fid for fid in fixture_ids if not smart_cache.is_fresh(fid)]
+        if not missing:
+            return set()
+
+        chunks = [missing[i:i + STATS_BATCH_SIZE] for i in range(0, len(missing), STATS_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._fetch_statistics_chunk(c) for c in chunks))
+        loaded = sum(len(items) for items in results if items)
+        failed = {fid for chunk, items in zip(chunks, results) if items is None for fid in chunk}
+
+        saved = loaded - len(chunks)
+        if saved > 0:
+            req_counter.add_saved(saved)
+        logger.info(f"Estatísticas em lote: {loaded} jogos em {len(chunks)} req (economizou {max(saved, 0)} req)"
+                    f"{f', {len(failed)} sem resposta' if failed else ''}")
+        return failed
+
+# =========================================================
+# TELEGRAM
+# =========================================================
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = clock.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        now = clock.monotonic()
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self._refill(clock.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, clock.monotonic() + seconds)
+
+class ChatLane:
+    """
+    Fila de um chat: os envios saem em ordem, um por vez, no ritmo do
+    bucket do próprio chat
+    """
+    __slots__ = ("chat_id", "bucket", "jobs", "pending_edits", "scheduled")
+
+    def __init__(self, chat_id: int, bucket: TokenBucket):
+        self.chat_id = chat_id
+        self.bucket = bucket
+        self.jobs: deque = deque()
+        self.pending_edits: Dict[int, str] = {}
+        self.scheduled = False
+
+class TelegramOutbox:
+    """
+    Filas por chat drenadas por workers em segundo plano. Cada envio respeita
+    o bucket do chat e o bucket global do bot (e o retry_after); um chat
+    travado não segura os outros. Edições pendentes da mesma mensagem são
+    coalescidas (só o texto mais recente vai) e textos repetidos são descartados
+    """
+    LAST_TEXT_MAX = 1000
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.bucket = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE)
+        self.chat_rate = TELEGRAM_RATE_PER_MIN / 60
+        self.chat_burst = TELEGRAM_BURST
+        self._lanes: Dict[int, ChatLane] = {}
+        # (pronto em, ordem, chat_id) dos chats com envios na fila e sem worker
+        self._ready: List[Tuple[float, int, int]] = []
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._last_text: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flood_waits = 0
+
+    def _lane(self, chat_id: int) -> ChatLane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = ChatLane(chat_id, TokenBucket(self.chat_rate, self.chat_burst))
+        return lane
+
+    def _schedule(self, lane: ChatLane):
+        lane.scheduled = True
+        self._seq += 1
+        heapq.heappush(self._ready, (clock.monotonic() + lane.bucket.delay(), self._seq, lane.chat_id))
+        self._wakeup.set()
+
+    def _enqueue(self, lane: ChatLane, job: Tuple):
+        lane.jobs.append(job)
+        self._unfinished += 1
+        self._idle.clear()
+        if not lane.scheduled:
+            self._schedule(lane)
+
+    def send(self, chat_id: int, text: str) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._enqueue(self._lane(chat_id), ("send", text, fut))
+        return fut
+
+    def edit(self, chat_id: int, message_id: int, text: str):
+        lane = self._lane(chat_id)
+        if message_id in lane.pending_edits:
+            lane.pending_edits[message_id] = text
+            self.coalesced += 1
+            return
+        if self._last_text.get((chat_id, message_id)) == text:
+            self.dropped += 1
+            return
+        lane.pending_edits[message_id] = text
+        self._enqueue(lane, ("edit", message_id, None))
+
+    def _remember(self, chat_id: int, message_id: int, text: str):
+        key = (chat_id, message_id)
+        self._last_text[key] = text
+        self._last_text.move_to_end(key)
+        while len(self._last_text) > self.LAST_TEXT_MAX:
+            self._last_text.popitem(last=False)
+
+    async def _call(self, lane: ChatLane, kind: str, payload, text: str) -> Optional[int]:
+        for attempt in range(1, TELEGRAM_MAX_ATTEMPTS + 1):
+            wait = max(lane.bucket.delay(), self.bucket.delay())
+            while wait > 0:
+                await clock.sleep(wait)
+                wait = max(lane.bucket.delay(), self.bucket.delay())
+            lane.bucket.take()
+            self.bucket.take()
+            t0 = time.perf_counter()
+            try:
+                if kind == "send":
+                    msg = await self.bot.send_message(chat_id=lane.chat_id, text=text, parse_mode="HTML")
+                    return msg.message_id
+                await self.bot.edit_message_text(chat_id=lane.chat_id, message_id=payload, text=text,
+                                                 parse_mode="HTML")
+                return payload
+            except RetryAfter as e:
+                retry = e.retry_after
+                if isinstance(retry, timedelta):
+                    retry = retry.total_seconds()
+                self.flood_waits += 1
+                lane.bucket.pause(float(retry))
+                logger.warning(f"Telegram flood wait no chat {lane.chat_id}: {retry}s "
+                               f"(tentativa {attempt}/{TELEGRAM_MAX_ATTEMPTS})")
+            except BadRequest as e:
+                if kind == "edit" and "not modified" in str(e).lower():
+                    return payload
+                raise
+            finally:
+                metrics.telegram_latency[kind].observe(time.perf_counter() - t0)
+        return None
+
+    async def drain(self):
+        await self._idle.wait()
+
+    async def _process(self, lane: ChatLane, kind: str, payload, fut: Optional[asyncio.Future]):
+        try:
+            if kind == "edit":
+                text = lane.pending_edits.pop(payload, None)
+                if text is None or self._last_text.get((lane.chat_id, payload)) == text:
+                    self.dropped += 1
+                    return
+            else:
+                text = payload
+
+            message_id = await self._call(lane, kind, payload, text)
+            if message_id is None:
+                self.failed += 1
+            else:
+                self._remember(lane.chat_id, message_id, text)
+                if kind == "send":
+                    self.sent += 1
+                else:
+                    self.edited += 1
+            if fut is not None and not fut.done():
+                fut.set_result(message_id)
+
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Erro ao {'enviar' if kind == 'send' else 'editar'} mensagem no chat {lane.chat_id}: {e}")
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+    async def _worker(self):
+        while True:
+            while not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            ready_at, _, chat_id = heapq.heappop(self._ready)
+            lane = self._lanes[chat_id]
+            # Enquanto este worker segura o chat, nenhum outro o atende
+            wait = ready_at - clock.monotonic()
+            if wait > 0:
+                await clock.sleep(wait)
+            kind, payload, fut = lane.jobs.popleft()
+            try:
+                await self._process(lane, kind, payload, fut)
+            finally:
+                self._unfinished -= 1
+                if lane.jobs:
+                    self._schedule(lane)
+                else:
+                    lane.scheduled = False
+                if not self._unfinished:
+                    self._idle.set()
+
+    async def run(self):
+        await asyncio.gather(*(self._worker() for _ in range(TELEGRAM_WORKERS)))
+
+    def get_stats(self) -> str:
+        return (f"📨 Telegram: {self.sent} enviadas | {self.edited} editadas | "
+                f"{self.coalesced} coalescidas | {self.dropped} descartadas | "
+                f"{self.failed} falhas | fila {self._unfinished} em {len(self._ready)} chats")
+
+outbox = TelegramOutbox(bot)
+
+def safe_send(text: str, chat_id: int = CHAT_ID) -> asyncio.Future:
+    """
+    Enfileira o envio (por padrão no chat principal); o future resolve para
+    o message_id (ou None se falhar)
+    """
+    return outbox.send(chat_id, text)
+
+def safe_edit(chat_id: int, message_id: int, text: str):
+    outbox.edit(chat_id, message_id, text)
+
+# =========================================================
+# REGRAS
+# =========================================================
+
+@dataclass(frozen=True, slots=True)
+class RuleWindow:
+    name: str
+    min_minute: int
+    max_minute: Optional[int] = None
+    min_total: int = 0
+    max_total: Optional[int] = None
+    min_diff: int = 0
+    min_each: int = 0
+    min_rate: float = 0.0
+    min_rate_10: float = 0.0   # ritmo dos últimos 10 min (corner_series); sem histórico não dispara
+
+@dataclass(frozen=True, slots=True)
+class SuggestionSpec:
+    bet_type: str
+    side: Optional[str] = None            # "next" (próximo canto), "lead" (quem tem mais) ou None
+    requires_rule: Optional[str] = None   # trecho do nome de uma regra que precisa ter disparado
+    max_minute: Optional[int] = None
+    min_total: int = 0
+    reason: str = ""
+
+# Predicados por custo: os baratos primeiro para cortar cedo
+PREDICATE_COST = {"minute": 0, "total": 1, "diff": 2, "each": 2, "rate": 3, "rate_10": 4}
+RULE_INDEX_MAX_MINUTE = 130
+
+class RulePlan:
+    """
+    Regras e sugestões compiladas: cada condição vira um predicado único
+    (compartilhado entre regras) e cada regra, a lista dos seus predicados
+    do mais barato ao mais caro
+    """
+    def __init__(self, windows: List[RuleWindow], suggestions: List[SuggestionSpec], source: str):
+        self.windows = windows
+        self.suggestions = suggestions
+        self.source = source
+        self.names = [w.name for w in windows]
+
+        predicates: Dict[Tuple[str, str, float], int] = {}
+        self.rule_predicates: List[List[int]] = []
+        for w in windows:
+            conds = [("minute", ">=", w.min_minute)]
+            if w.max_minute is not None:
+                conds.append(("minute", "<=", w.max_minute))
+            if w.min_total:
+                conds.append(("total", ">=", w.min_total))
+            if w.max_total is not None:
+                conds.append(("total", "<=", w.max_total))
+            if w.min_diff:
+                conds.append(("diff", ">=", w.min_diff))
+            if w.min_each:
+                conds.append(("each", ">=", w.min_each))
+            if w.min_rate:
+                conds.append(("rate", ">=", w.min_rate))
+            if w.min_rate_10:
+                conds.append(("rate_10", ">=", w.min_rate_10))
+            conds.sort(key=lambda c: PREDICATE_COST[c[0]])
+            self.rule_predicates.append([predicates.setdefault(c, len(predicates)) for c in conds])
+        self.predicates = list(predicates)
+        # Regras que dependem dos lados (casa/fora), não só do total
+        self.needs_sides = [bool(w.min_diff or w.min_each) for w in windows]
+        # Regras que dependem da série do jogo (janela recente)
+        self.needs_window = [bool(w.min_rate_10) for w in windows]
+
+        # Para cada minuto, as janelas que ainda não fecharam (agenda por jogo)
+        self.index = [
+            [w for w in windows if w.max_minute is None or w.max_minute >= minute]
+            for minute in range(RULE_INDEX_MAX_MINUTE + 1)
+        ]
+
+    @staticmethod
+    def _value(column: str, minute: int, total: int, home: Optional[int], away: Optional[int],
+               rate_10: Optional[float] = None):
+        if column == "minute":
+            return minute
+        if column == "total":
+            return total
+        if column == "diff":
+            return abs(home - away)
+        if column == "each":
+            return min(home, away)
+        if column == "rate_10":
+            return rate_10
+        return total / max(minute, 1)
+
+    def evaluate(self, minute: Optional[int], total: int, home: Optional[int] = None,
+                 away: Optional[int] = None, rate_10: Optional[float] = None) -> List[str]:
+        if minute is None:
+            return []
+        has_sides = home is not None and away is not None
+        results: List[Optional[bool]] = [None] * len(self.predicates)
+        hits = []
+        for name, preds, needs_sides, needs_window in zip(self.names, self.rule_predicates, self.needs_sides,
+                                                          self.needs_window):
+            if (needs_sides and not has_sides) or (needs_window and rate_10 is None):
+                continue
+            for pi in preds:
+                ok = results[pi]
+                if ok is None:
+                    column, op, limit = self.predicates[pi]
+                    value = self._value(column, minute, total, home, away, rate_10)
+                    ok = results[pi] = value >= limit if op == ">=" else value <= limit
+                if not ok:
+                    break
+            else:
+                hits.append(name)
+        return hits
+
+    def evaluate_batch(self, snapshots: List[Tuple[int, int, int]],
+                       rates_10: Optional[List[Optional[float]]] = None) -> List[List[str]]:
+        """
+        Avalia (minuto, casa, fora) de todos os jogos de uma vez: cada
+        predicado vira uma máscara de bits calculada no máximo uma vez, e
+        uma regra para assim que a máscara zera. rates_10 traz o ritmo
+        recente de cada jogo (None sem histórico)
+        """
+        n = len(snapshots)
+        hits: List[List[str]] = [[] for _ in range(n)]
+        if not n:
+            return hits
+
+        columns: Dict[str, List] = {}
+        masks: Dict[int, int] = {}
+
+        def column(name: str) -> List:
+            if name not in columns:
+                if name == "rate_10":
+                    columns[name] = list(rates_10) if rates_10 is not None else [None] * n
+                else:
+                    columns[name] = [self._value(name, m, h + a, h, a) for m, h, a in snapshots]
+            return columns[name]
+
+        def mask(pi: int) -> int:
+            if pi not in masks:
+                name, op, limit = self.predicates[pi]
+                values = column(name)
+                bits = (v is not None and (v >= limit if op == ">=" else v <= limit) for v in reversed(values))
+                masks[pi] = int("".join("1" if b else "0" for b in bits), 2)
+            return masks[pi]
+
+        full = (1 << n) - 1
+        for name, preds in zip(self.names, self.rule_predicates):
+            rule_mask = full
+            for pi in preds:
+                rule_mask &= mask(pi)
+                if not rule_mask:
+                    break
+            while rule_mask:
+                low = rule_mask & -rule_mask
+                hits[low.bit_length() - 1].append(name)
+                rule_mask ^= low
+        return hits
+
+def compile_rules(config: Dict, source: str) -> RulePlan:
+    """
+    Valida o JSON de regras e monta o plano; qualquer erro aborta sem efeitos
+    """
+    windows = [RuleWindow(**r) for r in config["rules"]]
+    suggestions = [SuggestionSpec(**s) for s in config.get("suggestions", [])]
+
+    names = [w.name for w in windows]
+    if len(set(names)) != len(names):
+        raise ValueError("nomes de regra repetidos")
+    for w in windows:
+        for attr in ("min_minute", "max_minute", "min_total", "max_total", "min_diff", "min_each", "min_rate",
+                     "min_rate_10"):
+            value = getattr(w, attr)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"{w.name}: {attr} deve ser numérico")
+        if w.max_minute is not None and w.max_minute < w.min_minute:
+            raise ValueError(f"{w.name}: max_minute < min_minute")
+        if w.max_total is not None and w.max_total < w.min_total:
+            raise ValueError(f"{w.name}: max_total < min_total")
+    for s in suggestions:
+        BetKind.of(s.bet_type)
+        if s.side not in (None, "next", "lead"):
+            raise ValueError(f"{s.bet_type}: side inválido {s.side!r}")
+        if s.requires_rule and not any(s.requires_rule in n for n in names):
+            raise ValueError(f"{s.bet_type}: nenhuma regra contém {s.requires_rule!r}")
+    return RulePlan(windows, suggestions, source)
+
+class RuleEngine:
+    """
+    Mantém o plano ativo. Recarregar compila um plano novo por inteiro e só
+    então troca a referência: o ciclo em andamento termina com o plano antigo
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.plan = self._load()
+
+    def _load(self) -> RulePlan:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            plan = compile_rules(json.load(f), self.path)
+        self._mtime = mtime
+        return plan
+
+    def reload(self) -> Tuple[bool, str]:
+        try:
+            plan = self._load()
+        except Exception as e:
+            self.failed_reloads += 1
+            logger.error(f"Regras inválidas em {self.path}, mantendo as atuais: {e}")
+            return False, str(e)
+        self.plan = plan
+        self.reloads += 1
+        logger.info(f"📐 Regras recarregadas: {len(plan.windows)} regras, {len(plan.suggestions)} sugestões, "
+                    f"{len(plan.predicates)} predicados")
+        return True, f"{len(plan.windows)} regras, {len(plan.suggestions)} sugestões"
+
+    async def run_watcher(self):
+        while True:
+            await clock.sleep(RULES_CHECK_INTERVAL)
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError:
+                continue
+            if changed:
+                self.reload()
+
+    def get_stats(self) -> str:
+        return (f"📐 Regras: {len(self.plan.windows)} ativas | {len(self.plan.predicates)} predicados | "
+                f"{self.reloads} recargas ({self.failed_reloads} rejeitadas)")
+
+rule_engine = RuleEngine(RULES_FILE)
+
+def apply_rules_from_values(minute: Optional[int], corners: int, home: int = None, away: int = None) -> List[str]:
+    return rule_engine.plan.evaluate(minute, corners, home, away)
+
+# =========================================================
+# ASSINATURAS
+# =========================================================
+
+# Textos fixos das mensagens por idioma; tipos de aposta e justificativas
+# vêm do rules.json como estão
+MESSAGES = {
+    "pt": {
+        "entry_title": "ENTRADA DETECTADA!", "minute": "Minuto", "corners_now": "Escanteios no momento",
+        "home": "Casa", "away": "Fora", "total": "Total", "recent": "Últimos {span}min",
+        "average": "Média por jogo", "average_of": "últimos {n}", "rules": "Regras ativadas",
+        "suggestions": "Sugestões de apostas", "tracking": "Acompanhando resultado...",
+        "result_title": "ATUALIZAÇÃO DE RESULTADO", "corners_current": "Escanteios atuais",
+        "entry_at": "Entrada em {minute}'", "results": "Resultado das sugestões", "summary": "Resumo",
+        "pending": "PENDENTE",
+        "sides": {"Mandante": "Mandante", "Visitante": "Visitante", "Equilibrado": "Equilibrado"},
+    },
+    "en": {
+        "entry_title": "ENTRY DETECTED!", "minute": "Minute", "corners_now": "Corners right now",
+        "home": "Home", "away": "Away", "total": "Total", "recent": "Last {span}min",
+        "average": "Average per match", "average_of": "last {n}", "rules": "Rules triggered",
+        "suggestions": "Betting suggestions", "tracking": "Tracking the result...",
+        "result_title": "RESULT UPDATE", "corners_current": "Current corners",
+        "entry_at": "Entry at {minute}'", "results": "Suggestion results", "summary": "Summary",
+        "pending": "PENDING",
+        "sides": {"Mandante": "Home", "Visitante": "Away", "Equilibrado": "Balanced"},
+    },
+}
+
+@dataclass(frozen=True, slots=True)
+class Subscription:
+    chat_id: int
+    leagues: Optional[FrozenSet[int]] = None   # ids da API; None = todas as ligas acompanhadas
+    rules: Optional[FrozenSet[str]] = None     # nomes de regra; None = todas
+    language: str = DEFAULT_LANGUAGE
+
+class SubscriptionIndex:
+    """
+    Índice invertido (liga, regra) -> chats, com None como curinga nos dois
+    lados: um alerta acha os destinatários olhando só as chaves da sua liga
+    e das regras disparadas, sem percorrer os chats
+    """
+    def __init__(self, subscriptions: List[Subscription], source: str):
+        self.source = source
+        self.by_chat = {s.chat_id: s for s in subscriptions}
+        # Toda liga assinada precisa estar na coleta, senão o chat nunca recebe alerta
+        self.leagues: FrozenSet[int] = frozenset().union(*(s.leagues for s in subscriptions if s.leagues))
+        self._index: Dict[Tuple[Optional[int], Optional[str]], List[int]] = {}
+        for s in subscriptions:
+            for league in s.leagues or (None,):
+                for rule in s.rules or (None,):
+                    self._index.setdefault((league, rule), []).append(s.chat_id)
+
+    def recipients(self, league_id: Optional[int], rules_hit: List[str]) -> List[int]:
+        index = self._index
+        chats: Set[int] = set()
+        for league in (league_id, None):
+            chats.update(index.get((league, None), ()))
+            for rule in rules_hit:
+                chats.update(index.get((league, rule), ()))
+        return sorted(chats)
+
+    def language(self, chat_id: int) -> str:
+        s = self.by_chat.get(chat_id)
+        return s.language if s else DEFAULT_LANGUAGE
+
+    def __len__(self):
+        return len(self.by_chat)
+
+def compile_subscriptions(data: Dict, source: str) -> SubscriptionIndex:
+    """
+    Valida {"chats": [{"chat_id", "leagues"?, "rules"?, "language"?}, ...]}.
+    CHAT_ID entra com tudo em português se não estiver na lista
+    """
+    subscriptions = []
+    seen = set()
+    for i, item in enumerate(data.get("chats", [])):
+        where = f"chats[{i}]"
+        if not isinstance(item, dict) or not isinstance(item.get("chat_id"), int) or isinstance(item["chat_id"], bool):
+            raise ValueError(f"{where}: chat_id inteiro obrigatório")
+        unknown = set(item) - {"chat_id", "leagues", "rules", "language"}
+        if unknown:
+            raise ValueError(f"{where}: campos desconhecidos {sorted(unknown)}")
+        if item["chat_id"] in seen:
+            raise ValueError(f"{where}: chat {item['chat_id']} repetido")
+        seen.add(item["chat_id"])
+        leagues = item.get("leagues")
+        if leagues is not None and (not isinstance(leagues, list) or not all(
+                isinstance(x, int) and not isinstance(x, bool) for x in leagues)):
+            raise ValueError(f"{where}: leagues deve ser uma lista de ids de liga")
+        rules = item.get("rules")
+        if rules is not None and (not isinstance(rules, list) or not all(isinstance(x, str) for x in rules)):
+            raise ValueError(f"{where}: rules deve ser uma lista de nomes de regra")
+        language = item.get("language", DEFAULT_LANGUAGE)
+        if language not in MESSAGES:
+            raise ValueError(f"{where}: idioma {language!r} sem textos (disponíveis: {sorted(MESSAGES)})")
+        subscriptions.append(Subscription(
+            item["chat_id"],
+            frozenset(leagues) if leagues is not None else None,
+            frozenset(rules) if rules is not None else None,
+            language,
+        ))
+    if CHAT_ID not in seen:
+        subscriptions.append(Subscription(CHAT_ID))
+    return SubscriptionIndex(subscriptions, source)
+
+class SubscriptionRegistry:
+    """
+    Mantém o índice ativo, recarregado do arquivo quando ele muda. Os chats
+    compartilham a mesma coleta e avaliação: assinar não gasta requisição
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.fanout = 0
+        self.index = self._load()
+        league_filter.set_extra_ids(self.index.leagues)
+
+    def _load(self) -> SubscriptionIndex:
+        if not os.path.exists(self.path):
+            self._mtime = None
+            return compile_subscriptions({}, "padrão")
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            index = compile_subscriptions(json.load(f), self.path)
+        self._mtime = mtime
+        return index
+
+    def reload(self) -> Tuple[bool, str]:
+        try:
+            index = self._load()
+        except Exception as e:
+            self.failed_reloads += 1
+            logger.error(f"Assinaturas inválidas em {self.path}, mantendo as atuais: {e}")
+            return False, str(e)
+        self.index = index
+        league_filter.set_extra_ids(index.leagues)
+        self.reloads += 1
+        logger.info(f"📬 Assinaturas recarregadas: {len(index)} chats")
+        return True, f"{len(index)} chats"
+
+    async def run_watcher(self):
+        while True:
+            await clock.sleep(SUBSCRIPTIONS_CHECK_INTERVAL)
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError:
+                continue
+            if changed:
+                self.reload()
+
+    def get_stats(self) -> str:
+        return (f"📬 Assinaturas: {len(self.index)} chats | {self.fanout} mensagens de entrada | "
+                f"{self.reloads} recargas ({self.failed_reloads} rejeitadas)")
+
+subscriptions = SubscriptionRegistry(SUBSCRIPTIONS_FILE)
+
+# =========================================================
+# AGENDA POR JOGO
+# =========================================================
+
+def corners_to_rule(minute: int, home: int, away: int) -> Optional[int]:
+    """
+    Quantos escanteios ainda faltam para a regra mais próxima disparar,
+    ou None se nenhuma regra é alcançável
+    """
+    total = home + away
+    diff = abs(home - away)
+    best = None
+
+    for w in rule_engine.plan.index[min(max(minute, 0), RULE_INDEX_MAX_MINUTE)]:
+        needed = max(w.min_total - total, w.min_diff - diff, 0)
+        if w.min_each:
+            needed = max(needed, max(w.min_each - home, 0) + max(w.min_each - away, 0))
+        if w.min_rate:
+            at = max(minute, w.min_minute)
+            needed = max(needed, math.ceil(w.min_rate * at - 1e-9) - total)
+        # min_rate_10 depende da série do jogo: fica de fora (estimativa otimista)
+
+        if w.max_total is not None and total + needed > w.max_total:
+            continue
+        last_minute = w.max_minute if w.max_minute is not None else MATCH_END_MINUTE
+        if needed > 0 and needed > (last_minute - minute) * MAX_CORNER_RATE:
+            continue
+
+        if best is None or needed < best:
+            best = needed
+
+    return best
+
+def fixture_poll_delay(minute: int, home: int, away: int, md: Optional[MatchData]) -> int:
+    if md is not None:
+        # Já entramos: resta liquidar. Só o "Próximo Escanteio" depende da ordem dos cantos
+        fid = md.fixture_id
+        if settlements.has_ready(fid):
+            return FIXTURE_POLL_HOT
+        if settlements.waiting(fid, Trigger.NEXT_CORNER):
+            return FIXTURE_POLL_HOT
+        # O intervalo dura ~15min: WARM garante ao menos uma leitura nele
+        if minute <= 45 and settlements.waiting(fid, Trigger.HALF_TIME):
+            return FIXTURE_POLL_WARM
+        return FIXTURE_POLL_RARE
+
+    needed = corners_to_rule(minute, home, away)
+    if needed is None:
+        return FIXTURE_POLL_RARE
+    if needed <= 1:
+        return FIXTURE_POLL_HOT
+    if needed == 2:
+        return FIXTURE_POLL_WARM
+    return FIXTURE_POLL_COLD
+
+class FixturePollQueue:
+    """
+    Heap de (próxima consulta, fixture_id); entradas antigas são descartadas na leitura
+    """
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+
+    def schedule(self, fixture_id: int, delay: float, now: Optional[float] = None):
+        due = (now if now is not None else clock.monotonic()) + delay
+        self._due[fixture_id] = due
+        heapq.heappush(self._heap, (due, fixture_id))
+
+    def sync(self, live_ids: Set[int], now: float):
+        # Jogos novos (ou não reagendados) entram como devidos agora
+        for fid in list(self._due):
+            if fid not in live_ids:
+                del self._due[fid]
+        for fid in live_ids:
+            if fid not in self._due:
+                self.schedule(fid, 0, now)
+
+    def pop_due(self, now: float) -> Set[int]:
+        due = set()
+        while self._heap and self._heap[0][0] <= now:
+            t, fid = heapq.heappop(self._heap)
+            if self._due.get(fid) == t:
+                del self._due[fid]
+                due.add(fid)
+        if len(self._heap) > 4 * max(len(self._due), 16):
+            self._heap = [(t, fid) for fid, t in self._due.items()]
+            heapq.heapify(self._heap)
+        return due
+
+    def __len__(self):
+        return len(self._due)
+
+poll_queue = FixturePollQueue()
+
+# =========================================================
+# DETECÇÃO DE MUDANÇAS
+# =========================================================
+
+class Change(NamedTuple):
+    kind: str              # "status", "minute", "goal", "corner"
+    side: Optional[str]    # "home" / "away" para gol e escanteio
+    old: object
+    new: object
+
+    def __str__(self):
+        if self.side is not None and isinstance(self.old, int) and isinstance(self.new, int):
+            return f"{self.kind} {self.side} {self.new - self.old:+d}"
+        return f"{self.kind} {self.old} → {self.new}"
+
+class ChangeDetector:
+    """
+    Guarda a impressão digital de cada jogo e devolve só o que mudou desde
+    o último snapshot processado
+    """
+    def __init__(self):
+        self._live_fp: Dict[int, Tuple] = {}
+        self._stats_fp: Dict[int, Tuple[int, int]] = {}
+        self.changed = 0
+        self.unchanged = 0
+
+    @staticmethod
+    def live_fingerprint(m: Dict) -> Tuple:
+        status = m["fixture"]["status"]
+        goals = m.get("goals") or {}
+        return (FixtureStatus.of(status.get("short")), status.get("elapsed"), goals.get("home"), goals.get("away"))
+
+    def diff_live(self, m: Dict) -> List[Change]:
+        fid = m["fixture"]["id"]
+        new = self.live_fingerprint(m)
+        old = self._live_fp.get(fid)
+        self._live_fp[fid] = new
+
+        if old is None:
+            changes = [Change("status", None, None, new[0])]
+        else:
+            changes = []
+            if old[0] != new[0]:
+                changes.append(Change("status", None, old[0], new[0]))
+            if old[1] != new[1]:
+                changes.append(Change("minute", None, old[1], new[1]))
+            for side, i in (("home", 2), ("away", 3)):
+                if old[i] != new[i]:
+                    changes.append(Change("goal", side, old[i], new[i]))
+
+        if changes:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+        return changes
+
+    def diff_stats(self, fixture_id: int, stats: Dict) -> List[Change]:
+        new = (stats["corners_home"], stats["corners_away"])
+        old = self._stats_fp.get(fixture_id)
+        self._stats_fp[fixture_id] = new
+        if old is None:
+            return []
+        return [
+            Change("corner", side, old[i], new[i])
+            for side, i in (("home", 0), ("away", 1))
+            if old[i] != new[i]
+        ]
+
+    def invalidate(self, fixture_id: int):
+        # Leitura falhou: o próximo snapshot conta como mudança e o jogo volta
+        self._live_fp.pop(fixture_id, None)
+
+    def forget(self, live_ids: Set[int]):
+        for fp in (self._live_fp, self._stats_fp):
+            for fid in [fid for fid in fp if fid not in live_ids]:
+                del fp[fid]
+
+change_detector = ChangeDetector()
+
 # =========================================================
-# GERENCIADOR DE HORÁRIOS
+# SÉRIES DE ESCANTEIOS
 # =========================================================
 
-def get_current_interval() -> int:
-    now = datetime.now()
-    hour = now.hour
-    
-    if 0 <= hour < 6:
-        return POLL_INTERVAL_LOW
-    
-    for start, end in PEAK_HOURS:
-        if start <= hour <= end:
-            return POLL_INTERVAL_PEAK
-    
-    return POLL_INTERVAL_NORMAL
+class CornerSeries:
+    """
+    Anel de tamanho fixo com snapshots (minuto, casa, fora) num único
+    array('h'): ~400 bytes por jogo com 32 snapshots, inserção O(1) e
+    janelas móveis por busca binária no anel
+    """
+    __slots__ = ("data", "capacity", "start", "size")
 
-def is_priority_league(league_name: str) -> bool:
-    return any(pl.lower() in league_name.lower() for pl in PRIORITY_LEAGUES)
+    def __init__(self, capacity: int = CORNER_SERIES_SIZE):
+        self.data = array("h", bytes(6 * capacity))
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
 
-# =========================================================
-# UTIL
-# =========================================================
+    def _slot(self, i: int) -> int:
+        return 3 * ((self.start + i) % self.capacity)
 
-def esc_html(s: str) -> str:
-    if s is None:
-        return ""
-    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    def snapshot(self, i: int) -> Tuple[int, int, int]:
+        s = self._slot(i)
+        return self.data[s], self.data[s + 1], self.data[s + 2]
 
-# =========================================================
-# API CLIENT OTIMIZADO
-# =========================================================
+    def append(self, minute: int, home: int, away: int):
+        if self.size:
+            last_minute = self.data[self._slot(self.size - 1)]
+            if minute < last_minute:
+                return  # snapshot atrasado (cache antigo)
+            if minute == last_minute:
+                s = self._slot(self.size - 1)
+                self.data[s + 1], self.data[s + 2] = home, away
+                return
+        if self.size == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+        s = self._slot(self.size)
+        self.data[s], self.data[s + 1], self.data[s + 2] = minute, home, away
+        self.size += 1
 
-class OptimizedApiClient:
-    def __init__(self, session: aiohttp.ClientSession, api_key: str):
-        self.session = session
-        self.headers = {"x-apisports-key": api_key}
-        self.semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+    def _at_or_before(self, minute: int) -> int:
+        # Minutos crescem ao longo do anel; devolve o índice lógico (0 = mais antigo)
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.data[self._slot(mid)] <= minute:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(lo - 1, 0)
 
-    async def _fetch_json(self, url: str, params: dict = None) -> Optional[dict]:
-        if not req_counter.can_request():
-            logger.warning("⚠️ LIMITE DIÁRIO ATINGIDO! Aguardando reset...")
-            return None
-        
-        params = params or {}
-        attempt = 0
+    def window(self, minutes: int) -> Tuple[int, int, int]:
+        """
+        Escanteios (casa, fora) nos últimos `minutes` minutos e o trecho
+        realmente coberto pelo histórico
+        """
+        if self.size < 2:
+            return 0, 0, 0
+        last_minute, last_home, last_away = self.snapshot(self.size - 1)
+        first_minute, first_home, first_away = self.snapshot(self._at_or_before(last_minute - minutes))
+        return last_home - first_home, last_away - first_away, last_minute - first_minute
 
-        while attempt <= MAX_RETRIES:
-            try:
-                async with self.semaphore:
-                    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-                    async with self.session.get(url, headers=self.headers, params=params, timeout=timeout) as resp:
-                        
-                        req_counter.increment()
-                        
-                        if resp.status in (429, 500, 502, 503):
-                            text = await resp.text()
-                            raise aiohttp.ClientError(f"HTTP {resp.status}: {text}")
+    def features(self) -> Dict:
+        """
+        Ritmo de 5 e 10 minutos, ritmo por lado e momento (ritmo recente
+        menos a média do jogo), em escanteios por minuto
+        """
+        home_5, away_5, span_5 = self.window(5)
+        home_10, away_10, span_10 = self.window(10)
+        minute, home, away = self.snapshot(self.size - 1) if self.size else (0, 0, 0)
+        rate_10 = (home_10 + away_10) / span_10 if span_10 else 0.0
+        return {
+            "corners_5": home_5 + away_5, "span_5": span_5,
+            "corners_10": home_10 + away_10, "span_10": span_10,
+            "home_10": home_10, "away_10": away_10,
+            "rate_10": rate_10,
+            "home_rate_10": home_10 / span_10 if span_10 else 0.0,
+            "away_rate_10": away_10 / span_10 if span_10 else 0.0,
+            "momentum": rate_10 - (home + away) / minute if minute and span_10 else 0.0,
+        }
 
-                        resp.raise_for_status()
-                        return await resp.json()
+class CornerSeriesStore:
+    """
+    Uma CornerSeries por jogo ao vivo, alimentada a cada estatística processada
+    """
+    def __init__(self):
+        self._series: Dict[int, CornerSeries] = {}
 
-            except Exception as e:
-                attempt += 1
-                if attempt > MAX_RETRIES:
-                    logger.error(f"Erro definitivo ao acessar {url}: {e}")
-                    return None
+    def update(self, fixture_id: int, minute: int, home: int, away: int):
+        series = self._series.get(fixture_id)
+        if series is None:
+            series = self._series[fixture_id] = CornerSeries()
+        series.append(minute, home, away)
 
-                backoff = (BACKOFF_FACTOR ** attempt) + random.uniform(0, 1)
-                logger.warning(f"Tentativa {attempt}/{MAX_RETRIES} falhou. Backoff {backoff:.2f}s")
-                await asyncio.sleep(backoff)
+    def features(self, fixture_id: int) -> Optional[Dict]:
+        series = self._series.get(fixture_id)
+        return series.features() if series and series.size >= 2 else None
 
-        return None
+    def forget(self, live_ids: Set[int]):
+        for fid in [fid for fid in self._series if fid not in live_ids]:
+            del self._series[fid]
 
-    async def get_live_smart(self):
-        cached = smart_cache.get_live_matches()
-        if cached:
-            logger.info("Usando cache de jogos ao vivo (economizou 1 req)")
-            return cached
-        
-        url = f"{BASE}/fixtures"
-        j = await self._fetch_json(url, {"live": "all"})
-        
-        if not j:
-            return []
-        
-        matches = j.get("response", [])
-        filtered = [m for m in matches if is_priority_league(m.get("league", {}).get("name", ""))]
-        
-        logger.info(f"Jogos filtrados: {len(filtered)}/{len(matches)} (ligas prioritárias)")
-        
-        smart_cache.set_live_matches(filtered)
-        return filtered
+    def __len__(self) -> int:
+        return len(self._series)
 
-    async def get_full_statistics(self, fixture_id: int):
-        cached = smart_cache.get_stats(fixture_id)
-        if cached:
-            return cached
+corner_series = CornerSeriesStore()
 
-        url = f"{BASE}/fixtures/statistics"
-        j = await self._fetch_json(url, {"fixture": fixture_id})
+# =========================================================
+# PERFIS DE TIMES
+# =========================================================
 
-        result = {"corners_home": 0, "corners_away": 0, "corners_total": 0}
+class TeamProfile(NamedTuple):
+    team_id: int
+    matches: int              # 0 = sem estatísticas disponíveis (não busca de novo até expirar)
+    corners_for: float
+    corners_against: float
 
-        if not j:
-            return result
+def build_profile(team_id: int, fixtures: List[Dict], by_id: Dict[int, Dict]) -> TeamProfile:
+    corners_for = corners_against = matches = 0
+    for m in fixtures:
+        item = by_id.get(m["fixture"]["id"])
+        if item is None:
+            continue
+        stats = parse_corner_stats(item.get("statistics", []))
+        if not stats["corners_total"]:
+            continue
+        if m["teams"]["home"]["id"] == team_id:
+            corners_for += stats["corners_home"]
+            corners_against += stats["corners_away"]
+        else:
+            corners_for += stats["corners_away"]
+            corners_against += stats["corners_home"]
+        matches += 1
+    if not matches:
+        return TeamProfile(team_id, 0, 0.0, 0.0)
+    return TeamProfile(team_id, matches, corners_for / matches, corners_against / matches)
 
-        resp = j.get("response", [])
-        if not resp or len(resp) < 2:
-            return result
+def expected_corners(home: TeamProfile, away: TeamProfile) -> Tuple[float, float]:
+    """
+    Cantos esperados por jogo de cada lado: o que o time costuma fazer e o
+    que o adversário costuma ceder
+    """
+    return ((home.corners_for + away.corners_against) / 2,
+            (away.corners_for + home.corners_against) / 2)
 
-        home_stats = resp[0]["statistics"]
-        away_stats = resp[1]["statistics"]
+class TeamProfileStore:
+    """
+    Médias de escanteios por time num SQLite próprio (os workers de um host
+    podem dividir o arquivo), com validade. O caminho ao vivo só lê o dicionário
+    em memória; as requisições acontecem no job fora do pico. O arquivo é aberto
+    pelo job (run) e lido/gravado na thread dele, fora do event loop
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="team-profiles")
+        self._profiles: Dict[int, Tuple[TeamProfile, float]] = {}
+        self._pending: List[Tuple[int, str, float]] = []
+        self.wanted: Set[int] = set()
+        self.fetched = 0
+        self.requests = 0
 
-        def get_value(stats, name):
-            for s in stats:
-                if name.lower() in s.get("type", "").lower():
-                    try:
-                        return int(str(s.get("value", 0)).replace("%", ""))
-                    except Exception:
-                        return 0
-            return 0
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS team_profiles "
+                               "(team_id INTEGER PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        return self._conn
 
-        result["corners_home"] = get_value(home_stats, "corner")
-        result["corners_away"] = get_value(away_stats, "corner")
-        result["corners_total"] = result["corners_home"] + result["corners_away"]
+    def _load_sync(self, now: float) -> List[Tuple[int, str, float]]:
+        return self.conn.execute("SELECT team_id, data, expires FROM team_profiles WHERE expires > ?",
+                                 (now,)).fetchall()
 
-        smart_cache.set_stats(fixture_id, result)
-        return result
+    def _write_sync(self, rows: List[Tuple[int, str, float]]):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO team_profiles (team_id, data, expires) VALUES (?, ?, ?)",
+                                  rows)
 
-# =========================================================
-# TELEGRAM
-# =========================================================
+    async def reload(self):
+        rows = await clock.run_blocking(self._executor, self._load_sync, clock.time())
+        self._profiles = {team_id: (TeamProfile(*json.loads(data)), expires) for team_id, data, expires in rows}
 
-async def safe_send(text: str):
-    try:
-        return await bot.send_message(chat_id=CHAT_ID, text=text, parse_mode="HTML")
-    except Exception as e:
-        logger.error(f"Erro ao enviar mensagem: {e}")
-        return None
+    async def flush(self):
+        rows, self._pending = self._pending, []
+        if rows:
+            await clock.run_blocking(self._executor, self._write_sync, rows)
 
-async def safe_edit(message_id: int, text: str):
-    try:
-        await bot.edit_message_text(chat_id=CHAT_ID, message_id=message_id, text=text, parse_mode="HTML")
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao editar mensagem: {e}")
-        return False
+    def get(self, team_id: Optional[int]) -> Optional[TeamProfile]:
+        entry = self._profiles.get(team_id)
+        if entry is None or entry[1] <= clock.time():
+            return None
+        return entry[0]
 
-# =========================================================
-# REGRAS
-# =========================================================
+    def pair(self, m: Dict) -> Optional[Tuple[TeamProfile, TeamProfile]]:
+        home = self.get(m["teams"]["home"].get("id"))
+        away = self.get(m["teams"]["away"].get("id"))
+        if home is None or away is None or not home.matches or not away.matches:
+            return None
+        return home, away
 
-def apply_rules_from_values(minute: Optional[int], corners: int, home: int = None, away: int = None) -> List[str]:
-    checks: List[str] = []
-    if minute is None:
-        return checks
+    def want(self, team_ids):
+        self.wanted = set(team_ids)
+
+    def missing(self) -> List[int]:
+        return sorted(t for t in self.wanted if self.get(t) is None)
 
-    if 15 <= minute <= 35 and corners == 4:
-        checks.append("1️⃣ Over HT > 4.5")
+    def put(self, profile: TeamProfile):
+        expires = clock.time() + PROFILE_TTL_DAYS * 86400
+        self._profiles[profile.team_id] = (profile, expires)
+        self._pending.append((profile.team_id, json.dumps(list(profile)), expires))
 
-    if 55 <= minute <= 75 and corners in (8, 9):
-        checks.append("2️⃣ Over FT > 9.5")
+    async def prefetch(self, client: "OptimizedApiClient", budget: int) -> int:
+        """
+        Busca perfis faltantes sem passar de `budget` requisições: por rodada,
+        as listas de jogos de cada time e depois as estatísticas em lote
+        (times da mesma liga dividem jogos). Retorna quantos perfis gravou
+        """
+        requests_before = req_counter.count
+        done = 0
+        missing = self.missing()
+        while missing:
+            # Rodada encolhe até caber no que resta do orçamento
+            left = budget - (req_counter.count - requests_before)
+            teams = missing[:PROFILE_TEAMS_PER_ROUND]
+            while teams and len(teams) + math.ceil(len(teams) * PROFILE_MATCHES / STATS_BATCH_SIZE) > left:
+                teams = teams[:-1]
+            if not teams:
+                break
+            missing = missing[len(teams):]
+            lists = await asyncio.gather(*(client.get_team_fixtures(t) for t in teams))
+            fixture_ids = sorted({m["fixture"]["id"] for fixtures in lists for m in fixtures})
+            items = await client.get_fixtures(fixture_ids) if fixture_ids else []
+            by_id = {item["fixture"]["id"]: item for item in items}
+            for team_id, fixtures in zip(teams, lists):
+                if fixtures:
+                    self.put(build_profile(team_id, fixtures, by_id))
+                    done += 1
+            await self.flush()
 
-    if minute >= 12 and corners >= 3 and home is not None and away is not None:
-        if abs(home - away) >= 3:
-            checks.append("3️⃣ Próximo Escanteio")
+        spent = req_counter.count - requests_before
+        self.fetched += done
+        self.requests += spent
+        if done:
+            logger.info(f"📚 Perfis de times: {done} gravados com {spent} req ({len(self.missing())} faltando)")
+        return done
 
-    if minute >= 30 and home is not None and away is not None:
-        if abs(home - away) >= 3 and corners >= 6:
-            checks.append("4️⃣ AH asiático cantos")
+    async def run(self):
+        """
+        Job fora do pico: sem jogos ao vivo, longe do próximo início e só com
+        o orçamento que sobraria de qualquer forma. Com shards, só o líder
+        """
+        if TAPE_REPLAY:
+            return
+        try:
+            await self.reload()
+        except Exception as e:
+            logger.error(f"Erro ao ler perfis de times: {e}")
+        while True:
+            await clock.sleep(PROFILE_CHECK_INTERVAL)
+            try:
+                if api_client is None or (coordinator and not coordinator.is_leader):
+                    continue
+                # Outro worker pode ter gravado perfis no arquivo compartilhado
+                await self.reload()
+                if not self.missing() or not scheduler.off_peak():
+                    continue
+                spare = scheduler.spare_budget()
+                if spare > 0:
+                    await self.prefetch(api_client, spare)
+            except Exception as e:
+                logger.error(f"Erro no pré-carregamento de perfis: {e}")
 
-    if minute >= 25 and home is not None and away is not None:
-        if abs(home - away) >= 2 and corners >= 5:
-            checks.append("5️⃣ Cantos por equipe")
+    def get_stats(self) -> str:
+        return (f"📚 Perfis: {len(self._profiles)} em disco | faltam {len(self.missing())}/{len(self.wanted)} "
+                f"do dia | {self.fetched} buscados com {self.requests} req")
 
-    if minute >= 35 and home is not None and away is not None:
-        if home >= 3 and away >= 3:
-            checks.append("6️⃣ Ambos Times Cantos")
+    def __len__(self) -> int:
+        return len(self._profiles)
 
-    if minute >= 15 and corners >= 4:
-        media = corners / max(minute, 1)
-        if media >= 0.20:
-            checks.append("7️⃣ Pressão para próximo canto")
+    def close(self):
+        self._executor.shutdown(wait=True)
+        rows, self._pending = self._pending, []
+        if rows:
+            self._write_sync(rows)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
-    return checks
+team_profiles = TeamProfileStore(TEAM_PROFILE_DB)
 
 # =========================================================
 # ANALISADOR
@@ -399,13 +3298,20 @@ def apply_rules_from_values(minute: Optional[int], corners: int, home: int = Non
 
 class IntelligentAnalyzer:
     @staticmethod
-    def generate_checklist(stats: Dict, minute: int) -> str:
+    def generate_checklist(stats: Dict, minute: int, features: Optional[Dict] = None) -> str:
         corners_total = stats["corners_total"]
         corners_home = stats["corners_home"]
         corners_away = stats["corners_away"]
 
-        ritmo_5 = "Alto" if corners_total >= 3 else "Médio" if corners_total >= 2 else "Baixo"
-        ritmo_10 = "Alto" if corners_total >= 5 else "Médio" if corners_total >= 3 else "Baixo"
+        # Com histórico, ritmo real da janela; sem ele, o acumulado como aproximação
+        recent_5 = features["corners_5"] if features else corners_total
+        recent_10 = features["corners_10"] if features else corners_total
+        if features:
+            ritmo_5 = "Alto" if recent_5 >= 2 else "Médio" if recent_5 >= 1 else "Baixo"
+            ritmo_10 = "Alto" if recent_10 >= 3 else "Médio" if recent_10 >= 2 else "Baixo"
+        else:
+            ritmo_5 = "Alto" if recent_5 >= 3 else "Médio" if recent_5 >= 2 else "Baixo"
+            ritmo_10 = "Alto" if recent_10 >= 5 else "Médio" if recent_10 >= 3 else "Baixo"
 
         if corners_home > corners_away + 1:
             dominante = "Mandante"
@@ -425,74 +3331,64 @@ class IntelligentAnalyzer:
 """
 
     @staticmethod
-    def predict_next_corner_side(stats: Dict, home: str, away: str):
+    def predict_next_corner_side(stats: Dict, home: str, away: str, features: Optional[Dict] = None,
+                                 profiles: Optional[Tuple[TeamProfile, TeamProfile]] = None):
         if stats["corners_home"] > stats["corners_away"]:
             return "Mandante", f"{home} tem mais cantos"
         elif stats["corners_away"] > stats["corners_home"]:
             return "Visitante", f"{away} tem mais cantos"
+        # Empate no acumulado: desempata pelo ritmo dos últimos 10 minutos
+        if features and features["home_10"] != features["away_10"]:
+            if features["home_10"] > features["away_10"]:
+                return "Mandante", f"{home} pressiona mais nos últimos {features['span_10']}min"
+            return "Visitante", f"{away} pressiona mais nos últimos {features['span_10']}min"
+        # Ainda empatado: desempata pelo histórico dos times (perfis pré-carregados)
+        if profiles:
+            expected_home, expected_away = expected_corners(*profiles)
+            if expected_home - expected_away >= PROFILE_MIN_EDGE:
+                return "Mandante", f"{home} tem média de {profiles[0].corners_for:.1f} cantos por jogo"
+            if expected_away - expected_home >= PROFILE_MIN_EDGE:
+                return "Visitante", f"{away} tem média de {profiles[1].corners_for:.1f} cantos por jogo"
         return "Equilibrado", "Jogo equilibrado"
 
     @staticmethod
-    def generate_suggestions(stats: Dict, rules_hit: List[str], minute: int, home: str, away: str):
+    def generate_suggestions(stats: Dict, rules_hit: List[str], minute: int, home: str, away: str,
+                             features: Optional[Dict] = None, plan: Optional[RulePlan] = None,
+                             profiles: Optional[Tuple[TeamProfile, TeamProfile]] = None):
+        plan = plan or rule_engine.plan
         suggestions = []
         corners_home = stats["corners_home"]
         corners_away = stats["corners_away"]
         total = stats["corners_total"]
 
-        next_side, reason = IntelligentAnalyzer.predict_next_corner_side(stats, home, away)
-
-        if any("Próximo" in r for r in rules_hit):
-            suggestions.append(BetSuggestion(
-                bet_type="Próximo Escanteio",
-                side=next_side,
-                reason=reason,
-                odd=0.0,
-                corners_at_entry_home=corners_home,
-                corners_at_entry_away=corners_away,
-                predicted_next_corner=next_side,
-                result="PENDING"
-            ))
+        next_side, next_reason = IntelligentAnalyzer.predict_next_corner_side(stats, home, away, features, profiles)
 
-        if corners_home > corners_away:
-            suggestions.append(BetSuggestion(
-                bet_type="Cantos por equipe",
-                side="Mandante",
-                reason=f"{home} está melhor no jogo",
-                odd=0.0,
-                corners_at_entry_home=corners_home,
-                corners_at_entry_away=corners_away,
-                result="PENDING"
-            ))
-        elif corners_away > corners_home:
-            suggestions.append(BetSuggestion(
-                bet_type="Cantos por equipe",
-                side="Visitante",
-                reason=f"{away} está melhor no jogo",
-                odd=0.0,
-                corners_at_entry_home=corners_home,
-                corners_at_entry_away=corners_away,
-                result="PENDING"
-            ))
+        for spec in plan.suggestions:
+            if spec.requires_rule and not any(spec.requires_rule in r for r in rules_hit):
+                continue
+            if spec.max_minute is not None and minute > spec.max_minute:
+                continue
+            if total < spec.min_total:
+                continue
 
-        if minute <= 35 and total >= 4:
-            suggestions.append(BetSuggestion(
-                bet_type="Over HT 4.5",
-                side=None,
-                reason="Ritmo alto para bater +4.5 HT",
-                odd=0.0,
-                corners_at_entry_home=corners_home,
-                corners_at_entry_away=corners_away,
-                result="PENDING"
-            ))
+            if spec.side == "next":
+                side, reason = next_side, next_reason
+            elif spec.side == "lead":
+                if corners_home == corners_away:
+                    continue
+                side = "Mandante" if corners_home > corners_away else "Visitante"
+                reason = spec.reason.format(team=home if side == "Mandante" else away, home=home, away=away)
+            else:
+                side, reason = None, spec.reason.format(home=home, away=away)
 
-        if minute <= 70 and total >= 6:
             suggestions.append(BetSuggestion(
-                bet_type="Over FT 9.5",
-                side=None,
-                reason="Bom ritmo de cantos",
+                bet_type=spec.bet_type,
+                side=side,
+                reason=reason,
                 odd=0.0,
                 corners_at_entry_home=corners_home,
                 corners_at_entry_away=corners_away,
+                predicted_next_corner=side if spec.side == "next" else None,
                 result="PENDING"
             ))
 
@@ -502,39 +3398,168 @@ class IntelligentAnalyzer:
 # AVALIADOR DE RESULTADOS
 # =========================================================
 
+class SettlementIndex:
+    """
+    Sugestões pendentes indexadas por jogo e gatilho: um evento só acorda as
+    apostas que ele pode liquidar, então o custo por ciclo acompanha os
+    eventos, não o total de apostas abertas
+    """
+    def __init__(self):
+        self._pending: Dict[int, Dict[Trigger, List[BetSuggestion]]] = {}
+        self._ready: Dict[int, Set[Trigger]] = {}
+        self.woken = 0
+        self.settled = 0
+
+    def add(self, md: MatchData):
+        """
+        Indexa as sugestões pendentes de uma entrada confirmada. Gatilhos que
+        já aconteceram (ex.: canto durante o envio) ficam prontos para o
+        próximo processamento do jogo
+        """
+        by_trigger: Dict[Trigger, List[BetSuggestion]] = {}
+        for sug in md.suggestions:
+            if sug.result == "PENDING":
+                by_trigger.setdefault(sug.kind.trigger, []).append(sug)
+        if not by_trigger:
+            return
+        self._pending[md.fixture_id] = by_trigger
+        ready = md.fired_triggers() & by_trigger.keys()
+        if ready:
+            self._ready[md.fixture_id] = ready
+
+    def waiting(self, fixture_id: int, trigger: Trigger) -> bool:
+        return trigger in self._pending.get(fixture_id, ())
+
+    def has_ready(self, fixture_id: int) -> bool:
+        return fixture_id in self._ready
+
+    def pop_ready(self, fixture_id: int) -> Set[Trigger]:
+        return self._ready.pop(fixture_id, set())
+
+    def pending(self, fixture_id: int) -> int:
+        return sum(len(sugs) for sugs in self._pending.get(fixture_id, {}).values())
+
+    def take(self, fixture_id: int, triggers: Set[Trigger]) -> List[BetSuggestion]:
+        by_trigger = self._pending.get(fixture_id)
+        if not by_trigger:
+            return []
+        woken = [sug for t in triggers for sug in by_trigger.pop(t, ())]
+        if not by_trigger:
+            del self._pending[fixture_id]
+        self.woken += len(woken)
+        return woken
+
+    def forget(self, fixture_id: int):
+        self._pending.pop(fixture_id, None)
+        self._ready.pop(fixture_id, None)
+
+    @property
+    def matches(self) -> int:
+        return len(self._pending)
+
+    def __len__(self) -> int:
+        return sum(self.pending(fid) for fid in self._pending)
+
+    def get_stats(self) -> str:
+        return f"🧾 Liquidação: {len(self)} pendentes em {self.matches} jogos, {self.settled} liquidadas"
+
+settlements = SettlementIndex()
+
+def track_entry(md: MatchData):
+    """
+    Passa uma entrada confirmada (nova, restaurada ou adotada) para o índice
+    """
+    settlements.add(md)
+    if not settlements.pending(md.fixture_id) and not md.result_updated:
+        md.result_updated = True
+        bot_stats.finish_entry()
+
+# Entradas alteradas desde a última gravação: persist_state só serializa estas
+dirty_matches: Set[int] = set()
+
+def detect_triggers(md: MatchData, status: Optional[str], stats: Dict) -> Set[Trigger]:
+    """
+    Registra no jogo os fatos novos desta leitura e devolve os gatilhos disparados
+    """
+    fired = set()
+    corners_home = stats["corners_home"]
+    corners_away = stats["corners_away"]
+    first_half_corners = md.first_half_corners
+
+    # Próximo escanteio após a entrada; se os dois lados mudaram entre duas
+    # leituras não dá para saber qual veio primeiro
+    if md.next_corner_after_entry is None:
+        home_moved = corners_home > md.corners_at_entry_home
+        away_moved = corners_away > md.corners_at_entry_away
+        if home_moved and away_moved:
+            md.next_corner_after_entry = NEXT_CORNER_BOTH
+        elif home_moved:
+            md.next_corner_after_entry = "Mandante"
+        elif away_moved:
+            md.next_corner_after_entry = "Visitante"
+        if md.next_corner_after_entry:
+            fired.add(Trigger.NEXT_CORNER)
+            logger.info(f"Próximo escanteio: {md.next_corner_after_entry}")
+
+    # Intervalo: lido no HT; se a leitura caiu já no 2º tempo, vale o último total do 1º
+    if md.half_time_corners is None:
+        if status in FIRST_HALF_STATUSES:
+            md.first_half_corners = corners_home + corners_away
+        elif status == "HT":
+            md.half_time_corners = corners_home + corners_away
+        elif status in PAST_HALF_TIME_STATUSES and md.entry_minute is not None and md.entry_minute <= 45:
+            md.half_time_corners = md.first_half_corners
+            logger.info(f"Intervalo sem leitura em {md.fixture_id}: usando {md.first_half_corners} do 1º tempo")
+        if md.half_time_corners is not None:
+            fired.add(Trigger.HALF_TIME)
+
+    # Fim de jogo: escanteios finais das estatísticas
+    if status in FINISHED_STATUSES and not md.is_finished:
+        md.is_finished = True
+        md.final_corners_home = corners_home
+        md.final_corners_away = corners_away
+        fired.add(Trigger.FULL_TIME)
+
+    if fired or md.first_half_corners != first_half_corners:
+        dirty_matches.add(md.fixture_id)
+    return fired
+
 class ResultEvaluator:
     @staticmethod
-    def evaluate_suggestion(sug: BetSuggestion, md: MatchData, current_stats: Dict, minute: int) -> Optional[str]:
+    def evaluate_suggestion(sug: BetSuggestion, md: MatchData) -> Optional[str]:
         """
-        Retorna "GREEN", "RED" ou None (ainda pendente)
+        Retorna "GREEN", "RED", "VOID" (sem como decidir) ou None (ainda pendente)
         """
-        bet = sug.bet_type
+        kind = sug.kind
         
         # Próximo Escanteio - avalia assim que acontecer
-        if "Próximo" in bet:
+        if kind is BetKind.NEXT_CORNER:
             if md.next_corner_after_entry:
                 if sug.predicted_next_corner == "Equilibrado":
                     return "GREEN"
+                if md.next_corner_after_entry == NEXT_CORNER_BOTH:
+                    return "VOID"
                 return "GREEN" if sug.predicted_next_corner == md.next_corner_after_entry else "RED"
             return None  # Ainda aguardando
         
         # Cantos por equipe - avalia no final do jogo
-        if "Cantos por equipe" in bet:
+        if kind is BetKind.TEAM_CORNERS:
             if not md.is_finished:
                 return None
             if sug.side == "Mandante":
                 return "GREEN" if md.final_corners_home > sug.corners_at_entry_home else "RED"
             if sug.side == "Visitante":
                 return "GREEN" if md.final_corners_away > sug.corners_at_entry_away else "RED"
+            return None
         
-        # Over HT 4.5 - avalia no intervalo (minuto 45+)
-        if "Over HT" in bet:
-            if minute >= 45 and md.half_time_corners is not None:
+        # Over HT 4.5 - avalia no intervalo
+        if kind is BetKind.OVER_HT:
+            if md.half_time_corners is not None:
                 return "GREEN" if md.half_time_corners >= 5 else "RED"
             return None
         
         # Over FT 9.5 - avalia no final
-        if "Over FT" in bet:
+        if kind is BetKind.OVER_FT:
             if not md.is_finished:
                 return None
             total = md.final_corners_home + md.final_corners_away
@@ -543,101 +3568,114 @@ class ResultEvaluator:
         return None
 
     @staticmethod
-    async def update_match_results(md: MatchData, current_stats: Dict, minute: int):
+    def settle(md: MatchData, triggers: Set[Trigger], current_stats: Dict, minute: int):
         """
-        Avalia todas as sugestões e atualiza a mensagem
+        Liquida só as sugestões acordadas pelos gatilhos e atualiza a mensagem
         """
-        has_update = False
-        greens = 0
-        reds = 0
-        pending = 0
+        # Entrada ainda na fila do Telegram: o índice só a recebe confirmada
+        if md.message_id is None or not triggers:
+            return
+        
+        woken = settlements.take(md.fixture_id, triggers)
+        if not woken:
+            return
+        dirty_matches.add(md.fixture_id)
+        
+        for sug in woken:
+            result = ResultEvaluator.evaluate_suggestion(sug, md)
+            if result is None:
+                logger.warning(f"Sugestão sem liquidação em {md.fixture_id}: {sug.bet_type}")
+                continue
+            sug.result = result
+            settlements.settled += 1
+            if result != "VOID":
+                bot_stats.add_result(result == "GREEN")
+        
+        greens = sum(1 for s in md.suggestions if s.result == "GREEN")
+        reds = sum(1 for s in md.suggestions if s.result == "RED")
+        pending = settlements.pending(md.fixture_id)
+        
+        # Um texto por idioma, editado em cada chat que recebeu a entrada
+        texts: Dict[str, str] = {}
+        for chat_id, message_id in md.messages.items():
+            lang = subscriptions.index.language(chat_id)
+            if lang not in texts:
+                texts[lang] = format_result_message(md, current_stats, minute, greens, reds, pending, lang)
+            safe_edit(chat_id, message_id, texts[lang])
+        logger.info(f"Resultados atualizados: {greens}G {reds}R {pending}P")
         
-        for sug in md.suggestions:
-            if sug.result == "PENDING":
-                result = ResultEvaluator.evaluate_suggestion(sug, md, current_stats, minute)
-                if result:
-                    sug.result = result
-                    has_update = True
-                    if result == "GREEN":
-                        greens += 1
-                        bot_stats.add_result(True)
-                    else:
-                        reds += 1
-                        bot_stats.add_result(False)
-                else:
-                    pending += 1
-            elif sug.result == "GREEN":
-                greens += 1
-            elif sug.result == "RED":
-                reds += 1
-        
-        # Atualiza mensagem se houver mudanças
-        if has_update and md.message_id:
-            updated_msg = format_result_message(md, current_stats, minute, greens, reds, pending)
-            await safe_edit(md.message_id, updated_msg)
-            logger.info(f"Resultados atualizados: {greens}G {reds}R {pending}P")
-        
-        # Marca como resultado atualizado se tudo foi avaliado
         if pending == 0 and not md.result_updated:
             md.result_updated = True
+            bot_stats.finish_entry()
             logger.info(f"Jogo finalizado: {md.home_team} vs {md.away_team}")
 
 # =========================================================
 # FORMATADORES DE MENSAGEM
 # =========================================================
 
-def format_entry_message(md: MatchData, stats: Dict, minute: int, rules: List[str], suggestions: List[BetSuggestion]) -> str:
+def format_entry_message(md: MatchData, stats: Dict, minute: int, rules: List[str], suggestions: List[BetSuggestion],
+                         features: Optional[Dict] = None,
+                         profiles: Optional[Tuple[TeamProfile, TeamProfile]] = None,
+                         lang: str = DEFAULT_LANGUAGE) -> str:
+    t = MESSAGES[lang]
     home = esc_html(md.home_team)
     away = esc_html(md.away_team)
     league = esc_html(md.league)
     
     msg = f"""
-🚨 <b>ENTRADA DETECTADA!</b>
+🚨 <b>{t['entry_title']}</b>
 
 ⚽ <b>{home} vs {away}</b>
 🏆 {league}
-⏱ Minuto: {minute}'
+⏱ {t['minute']}: {minute}'
 
-📊 <b>Escanteios no momento:</b>
-🏠 Casa: {stats['corners_home']}
-✈️ Fora: {stats['corners_away']}
-📈 Total: {stats['corners_total']}
-
-✅ <b>Regras ativadas:</b>
+📊 <b>{t['corners_now']}:</b>
+🏠 {t['home']}: {stats['corners_home']}
+✈️ {t['away']}: {stats['corners_away']}
+📈 {t['total']}: {stats['corners_total']}
 """
+    if features and features["span_10"] >= 5:
+        msg += (f"⚡ {t['recent'].format(span=features['span_10'])}: {features['corners_10']} "
+                f"({features['home_10']} x {features['away_10']})\n")
+    if profiles:
+        msg += (f"📚 {t['average']}: {profiles[0].corners_for:.1f} x {profiles[1].corners_for:.1f} "
+                f"({t['average_of'].format(n=min(p.matches for p in profiles))})\n")
+    msg += f"\n✅ <b>{t['rules']}:</b>\n"
     for r in rules:
         msg += f"• {r}\n"
     
-    msg += "\n💡 <b>Sugestões de apostas:</b>\n"
+    msg += f"\n💡 <b>{t['suggestions']}:</b>\n"
     for sug in suggestions:
-        side_text = f" ({sug.side})" if sug.side else ""
+        side_text = f" ({t['sides'].get(sug.side, sug.side)})" if sug.side else ""
         msg += f"• {sug.bet_type}{side_text}\n  📝 {sug.reason}\n"
     
-    msg += "\n⏳ Acompanhando resultado..."
+    msg += f"\n⏳ {t['tracking']}"
     return msg
 
-def format_result_message(md: MatchData, stats: Dict, minute: int, greens: int, reds: int, pending: int) -> str:
+def format_result_message(md: MatchData, stats: Dict, minute: int, greens: int, reds: int, pending: int,
+                          lang: str = DEFAULT_LANGUAGE) -> str:
+    t = MESSAGES[lang]
     home = esc_html(md.home_team)
     away = esc_html(md.away_team)
     league = esc_html(md.league)
     
     msg = f"""
-📊 <b>ATUALIZAÇÃO DE RESULTADO</b>
+📊 <b>{t['result_title']}</b>
 
 ⚽ <b>{home} vs {away}</b>
 🏆 {league}
-⏱ Minuto: {minute}'
+⏱ {t['minute']}: {minute}'
 
-📊 <b>Escanteios atuais:</b>
-🏠 Casa: {stats['corners_home']}
-✈️ Fora: {stats['corners_away']}
-📈 Total: {stats['corners_total']}
+📊 <b>{t['corners_current']}:</b>
+🏠 {t['home']}: {stats['corners_home']}
+✈️ {t['away']}: {stats['corners_away']}
+📈 {t['total']}: {stats['corners_total']}
 
-📊 <b>Entrada em {md.entry_minute}':</b>
-🏠 Casa: {md.corners_at_entry_home}
-✈️ Fora: {md.corners_at_entry_away}
+📊 <b>{t['entry_at'].format(minute=md.entry_minute)}:</b>
+🏠 {t['home']}: {md.corners_at_entry_home}
+✈️ {t['away']}: {md.corners_at_entry_away}
 
-🎯 <b>Resultado das sugestões:</b>
+🎯 <b>{t['results']}:</b>
 """
     
     for sug in md.suggestions:
@@ -645,13 +3683,15 @@ def format_result_message(md: MatchData, stats: Dict, minute: int, greens: int,
             emoji = "✅"
         elif sug.result == "RED":
             emoji = "❌"
+        elif sug.result == "VOID":
+            emoji = "➖"
         else:
             emoji = "⏳"
         
-        side_text = f" ({sug.side})" if sug.side else ""
+        side_text = f" ({t['sides'].get(sug.side, sug.side)})" if sug.side else ""
         msg += f"{emoji} {sug.bet_type}{side_text}\n"
     
-    msg += f"\n📈 <b>Resumo:</b> {greens} GREEN | {reds} RED | {pending} PENDENTE"
+    msg += f"\n📈 <b>{t['summary']}:</b> {greens} GREEN | {reds} RED | {pending} {t['pending']}"
     
     return msg
 
@@ -659,120 +3699,569 @@ def format_result_message(md: MatchData, stats: Dict, minute: int, greens: int,
 # LOOP PRINCIPAL
 # =========================================================
 
-async def main_loop():
-    active_matches: Dict[int, MatchData] = {}
+def restore_state() -> Dict[int, MatchData]:
+    t0 = time.perf_counter()
+    active_matches = state_store.load_matches()
+    
+    saved_stats = state_store.get("bot_stats")
+    if saved_stats:
+        bot_stats.load_dict(saved_stats)
+    saved_counter = state_store.get("req_counter")
+    if saved_counter:
+        req_counter.load_dict(saved_counter)
+    saved_cache = state_store.get("stats_cache")
+    if saved_cache:
+        smart_cache.load_stats(saved_cache)
+    saved_leagues = state_store.get("league_ids")
+    if saved_leagues:
+        league_filter.set_ids(saved_leagues["ids"], saved_leagues["resolved_on"])
+    saved_schedule = state_store.get("schedule")
+    if saved_schedule and saved_schedule.get("date") == clock.now().date().isoformat():
+        scheduler.set_schedule([datetime.fromtimestamp(ts) for ts in saved_schedule["kickoffs"]])
+        team_profiles.want(saved_schedule.get("teams", []))
+    
+    for md in active_matches.values():
+        if md.message_id is not None:
+            track_entry(md)
+            # Com shards, o banco compartilhado recebe a cópia na 1ª gravação
+            if coordinator:
+                dirty_matches.add(md.fixture_id)
+    
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    logger.info(f"Estado restaurado em {elapsed_ms:.1f}ms: {len(active_matches)} jogos ativos, {req_counter.get_stats()}")
+    return active_matches
+
+def persist_state(active_matches: Dict[int, MatchData]):
+    """
+    Grava só as entradas que mudaram no ciclo; o cache de estatísticas é
+    gravado pelo próprio cache, a cada limpeza
+    """
+    for fid in dirty_matches:
+        md = active_matches.get(fid)
+        if md is not None and md.message_id is not None:
+            state_store.put_match(md)
+            if coordinator:
+                coordinator.put_match(md)
+    dirty_matches.clear()
+    state_store.put("bot_stats", bot_stats.to_dict())
+    state_store.put("req_counter", req_counter.to_dict())
+    if scheduler.kickoffs is not None:
+        state_store.put("schedule", {
+            "date": scheduler.schedule_date.isoformat(),
+            "kickoffs": [k.timestamp() for k in scheduler.kickoffs],
+            "teams": sorted(team_profiles.wanted),
+        })
+
+def on_entry_sent(fut: asyncio.Future, md: MatchData, chats: List[int], active_matches: Dict[int, MatchData],
+                  rules_count: int):
+    md.messages = {chat_id: message_id for chat_id, message_id in zip(chats, fut.result()) if message_id}
+    if not md.messages:
+        # Falhou em todos os chats: libera o jogo para uma nova tentativa no próximo ciclo
+        if active_matches.get(md.fixture_id) is md:
+            del active_matches[md.fixture_id]
+        if coordinator:
+            asyncio.ensure_future(coordinator.release_alert(md.fixture_id))
+        return
+    md.message_id = next(iter(md.messages.values()))
+    bot_stats.add_entry()
+    track_entry(md)
+    # Reagenda com o que a entrada agora espera (o ciclo da entrada ainda não a via no índice)
+    poll_queue.schedule(md.fixture_id, fixture_poll_delay(
+        md.entry_minute, md.corners_at_entry_home, md.corners_at_entry_away, md
+    ))
+    dirty_matches.add(md.fixture_id)
+    logger.info(f"ENTRADA: {md.home_team} vs {md.away_team} ({md.entry_minute}') - {rules_count} regras, "
+                f"{len(md.messages)}/{len(chats)} chats")
+
+async def load_fixture(client: OptimizedApiClient, m: Dict, active_matches: Dict[int, MatchData]) -> Optional[Tuple[int, Dict]]:
+    """
+    Estatísticas de um jogo alterado, ou None se não há o que avaliar
+    (antes do minuto 10, encerrado ou erro). Devolve (minuto, estatísticas).
+    Leitura que falhou não é avaliada nem liquida nada: o jogo volta no
+    próximo ciclo
+    """
+    fid = m.get("fixture", {}).get("id")
+    try:
+        minute = m["fixture"]["status"].get("elapsed")
+        
+        if minute is None or minute < 10:
+            return None
+        
+        status = m["fixture"]["status"]["short"]
+        if status in FINISHED_STATUSES:
+            # Encerrado: só interessa se ainda há apostas para liquidar
+            if not settlements.pending(fid):
+                return None
+            stats = await client.get_final_statistics(fid, status, minute)
+        else:
+            stats = await client.get_full_statistics(fid, status, minute)
+    
+    except Exception as e:
+        logger.error(f"Erro ao carregar jogo {fid}: {e}")
+        stats = None
+    
+    if stats is None:
+        change_detector.invalidate(fid)
+        logger.warning(f"Sem estatísticas para {fid}: nova tentativa no próximo ciclo")
+        return None
+    return minute, stats
+
+async def process_fixture(m: Dict, minute: int, stats: Dict, rules_hit: List[str], plan: RulePlan,
+                          active_matches: Dict[int, MatchData], changes: List[Change]):
+    """
+    Processa um jogo alterado com as regras já avaliadas: entrada e acompanhamento
+    """
+    try:
+        fid = m["fixture"]["id"]
+        corners_home = stats["corners_home"]
+        corners_away = stats["corners_away"]
+        
+        changes = changes + change_detector.diff_stats(fid, stats)
+        logger.debug(f"Δ {fid}: {', '.join(str(c) for c in changes)}")
+        
+        # Nova entrada para os chats que assinam a liga e alguma regra disparada
+        # (com shards, só quem travar o jogo primeiro envia)
+        status = m["fixture"]["status"]["short"]
+        recipients = (subscriptions.index.recipients(m["league"].get("id"), rules_hit)
+                      if rules_hit and status not in FINISHED_STATUSES and fid not in active_matches else [])
+        if recipients and (not coordinator or await coordinator.claim_alert(fid)):
+            home = m["teams"]["home"]["name"]
+            away = m["teams"]["away"]["name"]
+            league = m["league"]["name"]
+            
+            md = MatchData(fid, home, away, league, None, minute, corners_home, corners_away)
+            features = corner_series.features(fid)
+            profiles = team_profiles.pair(m)
+            md.suggestions = IntelligentAnalyzer.generate_suggestions(
+                stats, rules_hit, minute, home, away, features, plan, profiles
+            )
+            
+            # Um texto por idioma, enviado a cada chat
+            texts: Dict[str, str] = {}
+            sends = []
+            for chat_id in recipients:
+                lang = subscriptions.index.language(chat_id)
+                if lang not in texts:
+                    texts[lang] = format_entry_message(md, stats, minute, rules_hit, md.suggestions, features,
+                                                       profiles, lang)
+                sends.append(safe_send(texts[lang], chat_id))
+            subscriptions.fanout += len(sends)
+            
+            # Reserva o jogo já; os message_ids chegam quando o outbox enviar
+            active_matches[fid] = md
+            asyncio.gather(*sends).add_done_callback(
+                lambda f: on_entry_sent(f, md, recipients, active_matches, len(rules_hit))
+            )
+        
+        # Jogos ativos: registra os eventos e liquida só o que eles acordam
+        if fid in active_matches:
+            md = active_matches[fid]
+            triggers = detect_triggers(md, status, stats)
+            if md.message_id is not None:
+                triggers |= settlements.pop_ready(fid)
+            ResultEvaluator.settle(md, triggers, stats, minute)
+        
+        poll_queue.schedule(fid, fixture_poll_delay(
+            minute, corners_home, corners_away, active_matches.get(fid)
+        ))
+    
+    except Exception as e:
+        logger.error(f"Erro ao processar jogo {m.get('fixture', {}).get('id')}: {e}")
+
+async def settle_vanished(client: OptimizedApiClient, active_matches: Dict[int, MatchData], live_ids: Set[int]):
+    """
+    Entradas com apostas pendentes cujo jogo saiu da lista ao vivo (em geral
+    encerrado sem que o FT fosse lido): consulta em lote por /fixtures?ids=,
+    no máximo a cada FIXTURE_POLL_WARM por jogo
+    """
+    now = clock.time()
+    vanished = [
+        md for fid, md in active_matches.items()
+        if fid not in live_ids and md.message_id is not None and settlements.pending(fid)
+        and now - md.last_check >= FIXTURE_POLL_WARM
+    ]
+    if not vanished:
+        return
+    for md in vanished:
+        md.last_check = now
+
+    for item in await client.get_fixtures([md.fixture_id for md in vanished]):
+        md = active_matches.get(item["fixture"]["id"])
+        if md is None:
+            continue
+        status = item["fixture"]["status"]
+        short = status.get("short")
+        if short in FINISHED_STATUSES:
+            # Sem as estatísticas dos dois times o jogo segue pendente até a próxima consulta
+            if not has_team_stats(item.get("statistics")):
+                logger.info(f"Jogo {md.fixture_id} {short} ainda sem estatísticas: liquidação adiada")
+                continue
+            stats = parse_corner_stats(item["statistics"])
+            minute = status.get("elapsed") or 90
+            ResultEvaluator.settle(md, detect_triggers(md, short, stats), stats, minute)
+        elif short in ABANDONED_STATUSES:
+            # Sem resultado possível: as pendentes ficam sem liquidação
+            settlements.forget(md.fixture_id)
+            md.is_finished = True
+            md.result_updated = True
+            dirty_matches.add(md.fixture_id)
+            bot_stats.finish_entry()
+            logger.info(f"Jogo {md.fixture_id} {short}: apostas pendentes canceladas")
+
+async def fetch_live(client: OptimizedApiClient) -> List[Dict]:
+    """
+    Lista ao vivo completa. Com shards, só o líder chama a API (e publica a
+    lista depois de escolher o intervalo); os demais leem a lista publicada,
+    ou buscam sozinhos se ainda não há nenhuma ou se ela venceu
+    """
+    live = None
+    if coordinator and not coordinator.is_leader:
+        live = await coordinator.read_live()
+    if live is None:
+        live = await client.get_live_smart()
+    return live
+
+async def rebalance_matches(active_matches: Dict[int, MatchData], live_matches: List[Dict]):
+    """
+    Entrega as entradas dos jogos que mudaram de dono e adota as de outros
+    workers nos jogos que passaram a ser deste
+    """
+    for fid in [fid for fid, md in active_matches.items() if md.message_id is not None and not coordinator.owns(fid)]:
+        coordinator.put_match(active_matches.pop(fid))
+        settlements.forget(fid)
+        state_store.delete_match(fid)
+        coordinator.handed_off += 1
+        logger.info(f"🧩 Jogo {fid} entregue para {coordinator.owner(fid)}")
+    await coordinator.flush()
+
+    # Após mudança nos workers, todos os jogos sem entrada local; senão só os
+    # travados por outro worker (a entrada dele chega quando ele a entregar)
+    live_ids = {m["fixture"]["id"] for m in live_matches}
+    coordinator.blocked &= live_ids
+    if coordinator.needs_adoption:
+        coordinator.needs_adoption = False
+        candidates = [fid for fid in live_ids if fid not in active_matches]
+    else:
+        candidates = [fid for fid in coordinator.blocked if fid not in active_matches]
+    for md in await coordinator.adopt(candidates):
+        active_matches[md.fixture_id] = md
+        track_entry(md)
+        coordinator.blocked.discard(md.fixture_id)
+        state_store.put_match(md)
+        logger.info(f"🧩 Jogo {md.fixture_id} adotado: {md.home_team} vs {md.away_team}")
+
+class CycleTicket:
+    """
+    Acompanha os jogos despachados num ciclo; quando o último passa pela
+    avaliação, fecha o ciclo (duração ponta a ponta e on_cycle)
+    """
+    __slots__ = ("record", "started", "deadline", "remaining", "on_done", "requests_before", "bytes_before",
+                 "parse_before")
+
+    def __init__(self, record: Dict, started: float, on_done: Optional[Callable[[Dict], None]],
+                 deadline: Optional[float] = None):
+        self.record = record
+        self.started = started
+        self.deadline = deadline
+        self.remaining = 0
+        self.on_done = on_done
+        self.requests_before = req_counter.count
+        self.bytes_before = metrics.api_bytes
+        self.parse_before = metrics.api_parse_seconds
+
+    def done(self, count: int = 1):
+        self.remaining -= count
+        if self.remaining <= 0:
+            self.finish()
+
+    def finish(self):
+        # Consumo da API até o último jogo do ciclo (ciclos sobrepostos somam juntos)
+        record = self.record
+        cycle_seconds = time.perf_counter() - self.started
+        record["seconds"] = cycle_seconds
+        record["requests"] = req_counter.count - self.requests_before
+        record["bytes"] = metrics.api_bytes - self.bytes_before
+        record["parse_seconds"] = metrics.api_parse_seconds - self.parse_before
+        metrics.cycles += 1
+        metrics.cycle_duration.observe(cycle_seconds)
+        logger.info(f"📦 Ciclo #{record['cycle']}: {record['processed']} jogos em {cycle_seconds:.2f}s, "
+                    f"{record['bytes'] / 1024:.1f} KB baixados, parse {record['parse_seconds'] * 1000:.1f} ms")
+        if self.on_done:
+            self.on_done(self.record)
+
+class FixturePipeline:
+    """
+    Estágios ligados por filas limitadas: o ciclo (busca) só despacha lotes
+    de até STATS_BATCH_SIZE jogos; os loaders carregam as estatísticas (um
+    lote preso em backoff ocupa só um loader); o avaliador roda as regras em
+    lote e liquida; a notificação é o outbox do Telegram. Filas cheias seguram
+    o estágio anterior (backpressure)
+    """
+    def __init__(self, client: OptimizedApiClient, active_matches: Dict[int, MatchData]):
+        self.client = client
+        self.active_matches = active_matches
+        self.load_queue: asyncio.Queue = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self.eval_queue: asyncio.Queue = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self.inflight: Set[int] = set()
+        self.workers: List[asyncio.Task] = []
+        self.evaluated = 0
+        self.deferred = 0
+        self.fallbacks = 0
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._loader()) for _ in range(PIPELINE_LOADERS)]
+        self.workers.append(asyncio.create_task(self._evaluator()))
+
+    def stop(self):
+        for task in self.workers:
+            task.cancel()
+
+    async def drain(self):
+        await self.load_queue.join()
+        await self.eval_queue.join()
+
+    async def submit(self, items: List[Tuple[Dict, List[Change]]], ticket: CycleTicket):
+        ticket.remaining = len(items)
+        if not items:
+            ticket.finish()
+            return
+        # Lotes cheios para quem precisa buscar; o resto já está em cache
+        fetch, cached = [], []
+        for item in items:
+            fid = item[0]["fixture"]["id"]
+            self.inflight.add(fid)
+            (fetch if needs_statistics(item[0]) and not smart_cache.is_fresh(fid) else cached).append(item)
+        for group in (fetch, cached):
+            for i in range(0, len(group), STATS_BATCH_SIZE):
+                await self.load_queue.put((group[i:i + STATS_BATCH_SIZE], ticket))
+
+    def _release(self, m: Dict, ticket: CycleTicket):
+        self.inflight.discard(m["fixture"]["id"])
+        ticket.done()
+
+    async def _loader(self):
+        while True:
+            chunk, ticket = await self.load_queue.get()
+            # As requisições do lote respeitam o prazo do ciclo que o despachou
+            request_deadline.set(ticket.deadline)
+            try:
+                # 1 req para o lote. Lote que falhou não vira 20 consultas
+                # individuais: serve o cache vencido ou adia o jogo; só quem o
+                # lote respondeu sem trazer cai no fallback, até STATS_FALLBACK_MAX
+                wanted = [m["fixture"]["id"] for m, _ in chunk if needs_statistics(m)]
+                try:
+                    failed = await self.client.prefetch_statistics(wanted)
+                except Exception as e:
+                    logger.error(f"Erro no lote de estatísticas: {e}")
+                    failed = set(wanted)
+                loads = []
+                fallbacks = 0
+                for m, changes in chunk:
+                    fid = m["fixture"]["id"]
+                    if not needs_statistics(m) or smart_cache.is_fresh(fid):
+                        loads.append(self._load_one(m, changes, ticket))
+                    elif fid in failed:
+                        stale = smart_cache.get_stale(fid)
+                        if stale is not None:
+                            loads.append(self._eval_one(m, changes, (m["fixture"]["status"]["elapsed"], stale), ticket))
+                        else:
+                            self._defer(m, ticket)
+                    elif fallbacks < STATS_FALLBACK_MAX:
+                        fallbacks += 1
+                        self.fallbacks += 1
+                        loads.append(self._load_one(m, changes, ticket))
+                    else:
+                        self._defer(m, ticket)
+                await asyncio.gather(*loads)
+            finally:
+                self.load_queue.task_done()
+
+    def _defer(self, m: Dict, ticket: CycleTicket):
+        # Sem estatísticas neste ciclo: o jogo volta no próximo
+        change_detector.invalidate(m["fixture"]["id"])
+        self.deferred += 1
+        self._release(m, ticket)
+
+    async def _load_one(self, m: Dict, changes: List[Change], ticket: CycleTicket):
+        snap = await load_fixture(self.client, m, self.active_matches)
+        if snap is None:
+            self._release(m, ticket)
+            return
+        await self._eval_one(m, changes, snap, ticket)
+
+    async def _eval_one(self, m: Dict, changes: List[Change], snap: Tuple[int, Dict], ticket: CycleTicket):
+        await self.eval_queue.put((m, changes, snap, ticket))
+
+    async def _evaluator(self):
+        while True:
+            batch = [await self.eval_queue.get()]
+            while len(batch) < EVAL_BATCH_MAX and not self.eval_queue.empty():
+                batch.append(self.eval_queue.get_nowait())
+            try:
+                # A série entra antes das regras: min_rate_10 usa a janela com esta leitura
+                rates_10 = []
+                for m, _, (minute, stats), _ in batch:
+                    fid = m["fixture"]["id"]
+                    corner_series.update(fid, minute, stats["corners_home"], stats["corners_away"])
+                    features = corner_series.features(fid)
+                    rates_10.append(features["rate_10"] if features else None)
+                # Regras num lote só com o plano do momento, depois cada jogo segue
+                plan = rule_engine.plan
+                hits = plan.evaluate_batch([
+                    (minute, stats["corners_home"], stats["corners_away"]) for _, _, (minute, stats), _ in batch
+                ], rates_10)
+                await asyncio.gather(*(
+                    process_fixture(m, minute, stats, rules_hit, plan, self.active_matches, changes)
+                    for (m, changes, (minute, stats), _), rules_hit in zip(batch, hits)
+                ))
+            except Exception as e:
+                logger.error(f"Erro no estágio de avaliação: {e}")
+            finally:
+                for m, _, _, ticket in batch:
+                    self._release(m, ticket)
+                    self.eval_queue.task_done()
+                self.evaluated += len(batch)
+
+    def get_stats(self) -> str:
+        return (f"🚰 Pipeline: {len(self.inflight)} em andamento | filas {self.load_queue.qsize()} lotes / "
+                f"{self.eval_queue.qsize()} jogos | {self.evaluated} avaliados | {self.deferred} adiados, "
+                f"{self.fallbacks} individuais")
+
+def remove_settled(active_matches: Dict[int, MatchData], live_ids: Set[int]):
+    """
+    Remove jogos já liquidados; enquanto o jogo segue ao vivo a entrada
+    fica, para não disparar outra no mesmo jogo
+    """
+    to_remove = [
+        fid for fid, md in active_matches.items()
+        if md.result_updated and (md.is_finished or fid not in live_ids)
+    ]
+    for fid in to_remove:
+        del active_matches[fid]
+        settlements.forget(fid)
+        state_store.delete_match(fid)
+        if coordinator:
+            coordinator.finish_match(fid)
+        logger.info(f"Removido jogo finalizado: {fid}")
+
+async def main_loop(player: Optional[TapePlayer] = None, until: Optional[float] = None,
+                    max_cycles: Optional[int] = None, on_cycle: Optional[Callable[[Dict], None]] = None):
+    active_matches = restore_state()
+    metrics.active_matches = active_matches
     cycles_count = 0
     
     async with aiohttp.ClientSession() as session:
-        client = OptimizedApiClient(session, API_KEY)
+        global api_client, pipeline
+        client = api_client = OptimizedApiClient(session, player)
+        pipeline = FixturePipeline(client, active_matches)
+        pipeline.start()
         
         logger.info("Sistema iniciado!")
-        await safe_send("Sistema iniciado com sucesso!")
+        logger.info(f"Decodificação JSON: {'orjson' if orjson else 'json'}"
+                    f"{' + streaming ijson' if ijson else ''}")
+        if coordinator:
+            await coordinator.heartbeat()
+        if not coordinator or coordinator.is_leader:
+            safe_send("Sistema iniciado com sucesso!")
         
-        while True:
-            try:
-                cycles_count += 1
-                current_interval = get_current_interval()
-                
-                logger.info(f"Ciclo #{cycles_count} - Intervalo: {current_interval}s")
-                
-                live_matches = await client.get_live_smart()
-                
-                if not live_matches:
-                    logger.info("Nenhum jogo ao vivo no momento")
-                    await asyncio.sleep(current_interval)
-                    continue
-                
-                logger.info(f"Analisando {len(live_matches)} jogos ao vivo...")
-                
-                for m in live_matches:
-                    try:
-                        fid = m["fixture"]["id"]
-                        minute = m["fixture"]["status"].get("elapsed")
-                        
-                        if minute is None or minute < 10:
-                            continue
-                        
-                        status = m["fixture"]["status"]["short"]
-                        if status in ("FT", "AET", "PEN"):
-                            if fid in active_matches:
-                                active_matches[fid].is_finished = True
-                                active_matches[fid].final_corners_home = m.get("score", {}).get("home")
-                                active_matches[fid].final_corners_away = m.get("score", {}).get("away")
-                            continue
-                        
-                        stats = await client.get_full_statistics(fid)
-                        corners_home = stats["corners_home"]
-                        corners_away = stats["corners_away"]
-                        total_corners = stats["corners_total"]
-                        
-                        # Aplica regras para novas entradas
-                        rules_hit = apply_rules_from_values(minute, total_corners, corners_home, corners_away)
+        current_interval = POLL_INTERVAL_MIN
+        # Prazo fixo por ciclo: a duração do ciclo sai do intervalo, sem deriva
+        deadline = clock.monotonic()
+        
+        try:
+            while until is None or clock.time() < until:
+                try:
+                    cycles_count += 1
+                    deadline = max(deadline, clock.monotonic())
+                    request_deadline.set(deadline + CYCLE_DEADLINE)
+                    ticket = CycleTicket({"cycle": cycles_count, "processed": 0}, time.perf_counter(), on_cycle,
+                                         request_deadline.get())
+                    
+                    if scheduler.needs_schedule():
+                        # Uma tentativa por dia no máximo; sucesso vale por LEAGUE_IDS_TTL_DAYS
+                        if league_filter.needs_resolve():
+                            await client.resolve_priority_leagues()
+                        scheduler.set_schedule(await client.get_today_schedule())
+                    
+                    # O intervalo sai da lista inteira, não da partição: um worker
+                    # sem jogos próprios segue no ritmo dos demais
+                    live_all = await fetch_live(client)
+                    current_interval = scheduler.next_interval(len(live_all))
+                    live_matches = live_all
+                    if coordinator:
+                        if coordinator.is_leader:
+                            await coordinator.publish_live(live_all, current_interval)
+                        live_matches = [m for m in live_all if coordinator.owns(m["fixture"]["id"])]
+                    live_ids = {m["fixture"]["id"] for m in live_matches}
+                    if coordinator:
+                        await rebalance_matches(active_matches, live_matches)
+                    await settle_vanished(client, active_matches, live_ids)
+                    
+                    logger.info(f"Ciclo #{cycles_count} - {scheduler.get_stats()}")
+                    
+                    # Só consulta os jogos cuja vez chegou na agenda por jogo;
+                    # jogos encerrados passam sempre para registrar o fim. Jogos
+                    # ainda no pipeline (ex.: em backoff) ficam para o próximo ciclo
+                    to_process: List[Tuple[Dict, List[Change]]] = []
+                    unchanged = 0
+                    if live_matches:
+                        now = clock.monotonic()
+                        poll_queue.sync(live_ids, now)
+                        change_detector.forget(live_ids)
+                        corner_series.forget(live_ids)
+                        smart_cache.forget(live_ids)
+                        due = poll_queue.pop_due(now)
                         
-                        # Nova entrada
-                        if rules_hit and fid not in active_matches:
-                            home = m["teams"]["home"]["name"]
-                            away = m["teams"]["away"]["name"]
-                            league = m["league"]["name"]
-                            
-                            md = MatchData(fid, home, away, league, None, minute, corners_home, corners_away)
-                            md.suggestions = IntelligentAnalyzer.generate_suggestions(
-                                stats, rules_hit, minute, home, away
-                            )
-                            
-                            msg_text = format_entry_message(md, stats, minute, rules_hit, md.suggestions)
-                            msg = await safe_send(msg_text)
-                            
-                            if msg:
-                                md.message_id = msg.message_id
-                                active_matches[fid] = md
-                                bot_stats.add_entry()
-                                logger.info(f"ENTRADA: {home} vs {away} ({minute}') - {len(rules_hit)} regras")
+                        # Jogos sem mudança no payload ao vivo não gastam estatísticas
+                        for m in live_matches:
+                            fid = m["fixture"]["id"]
+                            if fid in pipeline.inflight:
+                                continue
+                            if fid not in due and needs_statistics(m):
+                                continue
+                            changes = change_detector.diff_live(m)
+                            if not changes:
+                                if fid in due:
+                                    poll_queue.schedule(fid, 0, now)
+                                unchanged += 1
+                                continue
+                            to_process.append((m, changes))
                         
-                        # Atualiza jogos ativos
-                        if fid in active_matches:
-                            md = active_matches[fid]
-                            
-                            # Detecta próximo escanteio após entrada
-                            if md.next_corner_after_entry is None:
-                                if corners_home > md.corners_at_entry_home:
-                                    md.next_corner_after_entry = "Mandante"
-                                    logger.info(f"Próximo escanteio: Mandante")
-                                elif corners_away > md.corners_at_entry_away:
-                                    md.next_corner_after_entry = "Visitante"
-                                    logger.info(f"Próximo escanteio: Visitante")
-                            
-                            # Atualiza resultados
-                            await ResultEvaluator.update_match_results(md, stats, minute)
+                        logger.info(f"Analisando {len(to_process)}/{len(live_matches)} jogos ao vivo "
+                                    f"({unchanged} sem mudança)...")
+                    else:
+                        logger.info("Nenhum jogo ao vivo no momento")
                     
-                    except Exception as e:
-                        logger.error(f"Erro ao processar jogo {m.get('fixture', {}).get('id')}: {e}")
-                        continue
-                
-                # Remove jogos já finalizados e avaliados (após 5 minutos)
-                to_remove = []
-                for fid, md in active_matches.items():
-                    if md.result_updated:
-                        to_remove.append(fid)
-                
-                for fid in to_remove:
-                    del active_matches[fid]
-                    logger.info(f"Removido jogo finalizado: {fid}")
-                
-                # Relatório periódico
-                if cycles_count % 10 == 0:
-                    report = f"""
+                    # Despacha para o pipeline; o ciclo fecha quando o último jogo for avaliado
+                    ticket.record.update(live=len(live_matches), processed=len(to_process))
+                    await pipeline.submit(to_process, ticket)
+                    
+                    remove_settled(active_matches, live_ids)
+                    persist_state(active_matches)
+                    
+                    # Relatório periódico (com shards, só o líder envia o seu)
+                    if cycles_count % 10 == 0 and (not coordinator or coordinator.is_leader):
+                        report = f"""
 {req_counter.get_stats()}
 {bot_stats.get_summary()}
+{coordinator.get_stats() if coordinator else ""}
 Ciclo: #{cycles_count}
 """
-                    await safe_send(report)
-                
-                await asyncio.sleep(current_interval)
+                        safe_send(report)
+                    
+                    if max_cycles and cycles_count >= max_cycles:
+                        break
+                    
+                except Exception as e:
+                    logger.error(f"Erro no loop principal: {e}", exc_info=True)
                 
-            except Exception as e:
-                logger.error(f"Erro no loop principal: {e}", exc_info=True)
-                await asyncio.sleep(current_interval)
+                deadline += current_interval
+                await clock.sleep(deadline - clock.monotonic())
+            
+            # Fim do replay/benchmark: termina o que já foi despachado
+            await pipeline.drain()
+        finally:
+            pipeline.stop()
 
 # =========================================================
 # KEEP-ALIVE + START
@@ -781,6 +4270,17 @@ Ciclo: #{cycles_count}
 async def handle(request):
     stats = f"""CornerBot PRO Online
 {req_counter.get_stats()}
+{scheduler.get_stats()}
+{smart_cache.get_summary()}
+{api_client.get_stats() if api_client else ""}
+{breakers_summary()}
+{outbox.get_stats()}
+{subscriptions.get_stats()}
+{rule_engine.get_stats()}
+{settlements.get_stats()}
+{team_profiles.get_stats()}
+{pipeline.get_stats() if pipeline else ""}
+{coordinator.get_stats() if coordinator else ""}
 Entradas: {bot_stats.total_entries}
 Greens: {bot_stats.total_greens}
 Reds: {bot_stats.total_reds}
@@ -788,9 +4288,63 @@ Win Rate: {bot_stats.get_winrate():.1f}%
 """
     return web.Response(text=stats)
 
+async def handle_metrics(request):
+    return web.Response(
+        body=metrics.render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+def admin_only(handler):
+    """
+    Protege uma rota administrativa: token em ADMIN_HEADER ou, sem
+    ADMIN_TOKEN configurado, só chamadas do próprio host
+    """
+    async def wrapper(request):
+        if ADMIN_TOKEN:
+            allowed = hmac.compare_digest(request.headers.get(ADMIN_HEADER, "").encode(), ADMIN_TOKEN.encode())
+        else:
+            allowed = request.remote in ("127.0.0.1", "::1")
+        if not allowed:
+            logger.warning(f"Acesso negado a {request.path} de {request.remote}")
+            return web.json_response({"ok": False, "detail": "não autorizado"}, status=401)
+        return await handler(request)
+    return wrapper
+
+async def handle_rules(request):
+    plan = rule_engine.plan
+    return web.json_response({
+        "source": plan.source,
+        "rules": [asdict(w) for w in plan.windows],
+        "suggestions": [asdict(s) for s in plan.suggestions],
+        "predicates": [f"{c} {op} {v}" for c, op, v in plan.predicates],
+    })
+
+async def handle_rules_reload(request):
+    ok, detail = rule_engine.reload()
+    return web.json_response({"ok": ok, "detail": detail}, status=200 if ok else 400)
+
+async def handle_subscriptions(request):
+    index = subscriptions.index
+    return web.json_response({
+        "source": index.source,
+        "chats": [{"chat_id": s.chat_id,
+                   "leagues": sorted(s.leagues) if s.leagues is not None else None,
+                   "rules": sorted(s.rules) if s.rules is not None else None,
+                   "language": s.language} for s in index.by_chat.values()],
+    })
+
+async def handle_subscriptions_reload(request):
+    ok, detail = subscriptions.reload()
+    return web.json_response({"ok": ok, "detail": detail}, status=200 if ok else 400)
+
 async def start_server():
     app = web.Application()
     app.router.add_get("/", handle)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/rules", admin_only(handle_rules))
+    app.router.add_post("/rules/reload", admin_only(handle_rules_reload))
+    app.router.add_get("/subscriptions", admin_only(handle_subscriptions))
+    app.router.add_post("/subscriptions/reload", admin_only(handle_subscriptions_reload))
     port = int(os.environ.get("PORT", 3000))
     runner = web.AppRunner(app)
     await runner.setup()
@@ -798,9 +4352,66 @@ async def start_server():
     await site.start()
     logger.info(f"Servidor keep-alive na porta {port}")
 
+def start_background_tasks() -> List[asyncio.Task]:
+    return [
+        asyncio.create_task(state_store.run()),
+        asyncio.create_task(smart_cache.run_sweeper()),
+        asyncio.create_task(outbox.run()),
+        asyncio.create_task(rule_engine.run_watcher()),
+        asyncio.create_task(subscriptions.run_watcher()),
+        asyncio.create_task(team_profiles.run()),
+    ] + ([asyncio.create_task(coordinator.run())] if coordinator else [])
+
+async def run_replay(path: str):
+    """
+    Roda o bot inteiro sobre uma fita gravada, com relógio virtual e Telegram falso
+    """
+    global clock
+    player = TapePlayer(path)
+    clock = ReplayClock(player.start)
+    
+    background = [asyncio.create_task(clock.run())] + start_background_tasks()
+    t0 = time.perf_counter()
+    try:
+        await main_loop(player=player, until=player.end + POLL_INTERVAL_MIN)
+        await outbox.drain()
+    finally:
+        for task in background:
+            task.cancel()
+        state_store.close()
+    
+    elapsed = time.perf_counter() - t0
+    virtual = clock.time() - player.start
+    logger.info(f"Replay concluído: {virtual / 60:.0f} min virtuais em {elapsed:.1f}s "
+                f"({virtual / max(elapsed, 1e-9):.0f}×) | {len(bot.transcript)} mensagens")
+    logger.info(bot_stats.get_summary())
+    
+    if REPLAY_OUTPUT:
+        with open(REPLAY_OUTPUT, "w", encoding="utf-8") as f:
+            for entry in bot.transcript:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        logger.info(f"Transcrição gravada em {REPLAY_OUTPUT}")
+
 async def main():
+    check_env()
+    if TAPE_REPLAY:
+        await run_replay(TAPE_REPLAY)
+        return
+    
     await start_server()
-    await main_loop()
+    background = start_background_tasks()
+    try:
+        await main_loop()
+    finally:
+        for task in background:
+            task.cancel()
+        state_store.put("stats_cache", smart_cache.export_stats())
+        state_store.close()
+        team_profiles.close()
+        if coordinator:
+            coordinator.close()
+        if tape_recorder:
+            tape_recorder.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
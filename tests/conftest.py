@@ -0,0 +1,42 @@
+import os
+import sys
+
+# main lê a configuração do ambiente na importação: bancos em memória,
+# Telegram falso (sem token) e só o CHAT_ID como assinante
+os.environ.update({
+    "API_KEYS": "k1,k2,k3",
+    "CHAT_ID": "1",
+    "STATE_DB": ":memory:",
+    "TEAM_PROFILE_DB": ":memory:",
+    "SUBSCRIPTIONS_FILE": "",
+})
+os.environ.pop("TELEGRAM_TOKEN", None)
+os.environ.pop("TAPE_REPLAY", None)
+os.environ.pop("COORD_DB", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+REPLAY_START = 1_777_000_000.0
+
+
+@pytest.fixture
+def replay_clock(monkeypatch):
+    import main
+    clock = main.ReplayClock(REPLAY_START)
+    monkeypatch.setattr(main, "clock", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def fresh_singletons(monkeypatch):
+    """
+    Cada teste começa com cache, índice de liquidação e estado vazios
+    """
+    import main
+    monkeypatch.setattr(main, "smart_cache", main.SmartCache())
+    monkeypatch.setattr(main, "settlements", main.SettlementIndex())
+    monkeypatch.setattr(main, "change_detector", main.ChangeDetector())
+    monkeypatch.setattr(main, "state_store", main.StateStore(":memory:"))
+    monkeypatch.setattr(main, "dirty_matches", set())
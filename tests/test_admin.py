@@ -0,0 +1,36 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import main
+
+
+def call(path: str, method: str = "GET", headers=None) -> int:
+    async def go():
+        app = web.Application()
+        app.router.add_get("/rules", main.admin_only(main.handle_rules))
+        app.router.add_post("/rules/reload", main.admin_only(main.handle_rules_reload))
+        app.router.add_get("/subscriptions", main.admin_only(main.handle_subscriptions))
+        app.router.add_post("/subscriptions/reload", main.admin_only(main.handle_subscriptions_reload))
+        app.router.add_get("/", main.handle)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.request(method, path, headers=headers)
+            return resp.status
+    return asyncio.run(go())
+
+
+def test_admin_routes_require_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert call("/rules") == 401
+    assert call("/rules/reload", "POST", {main.ADMIN_HEADER: "wrong"}) == 401
+    assert call("/rules", headers={main.ADMIN_HEADER: "s3cret"}) == 200
+    assert call("/subscriptions") == 401
+    assert call("/subscriptions/reload", "POST") == 401
+    assert call("/subscriptions", headers={main.ADMIN_HEADER: "s3cret"}) == 200
+    assert call("/") == 200
+
+
+def test_admin_routes_local_only_without_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert call("/rules") == 200
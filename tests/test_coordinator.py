@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "coord.db")
+
+
+@pytest.fixture
+def workers(path):
+    pair = [main.Coordinator(path, "w1"), main.Coordinator(path, "w2")]
+    yield pair
+    for c in pair:
+        c.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_only_first_claim_wins(workers):
+    a, b = workers
+    assert run(a.claim_alert(1))
+    assert not run(b.claim_alert(1))
+    assert 1 in b.blocked
+    assert b.duplicates_blocked == 1
+    # Travado localmente: nem consulta o banco de novo
+    assert not run(b.claim_alert(1))
+    assert b.duplicates_blocked == 1
+
+
+def test_release_frees_the_claim_for_others(workers):
+    a, b = workers
+    assert run(a.claim_alert(2))
+    run(b.release_alert(2))          # só o dono libera
+    assert not run(b.claim_alert(2))
+    run(a.release_alert(2))
+    b.blocked.clear()
+    assert run(b.claim_alert(2))
+
+
+def test_partition_is_disjoint_and_complete(workers):
+    a, b = workers
+    run(a.heartbeat())
+    run(b.heartbeat())
+    run(a.heartbeat())
+    assert a.members == b.members == ["w1", "w2"]
+    assert a.is_leader and not b.is_leader
+    for fid in range(500):
+        assert a.owns(fid) != b.owns(fid)
+    assert 100 < sum(a.owns(fid) for fid in range(500)) < 400
+
+
+def test_entry_is_adopted_by_the_next_owner(workers):
+    a, b = workers
+    md = main.MatchData(3, "H", "A", "Liga", 7, 20, 3, 1, messages={main.CHAT_ID: 7})
+    assert run(a.claim_alert(3))
+    a.put_match(md)
+    run(a.flush())
+
+    adopted = run(b.adopt([3, 4]))
+    assert [m.fixture_id for m in adopted] == [3]
+    assert adopted[0].messages == {main.CHAT_ID: 7}
+    # Agora é de b: adotar de novo não traz nada
+    assert run(b.adopt([3])) == []
+
+
+def test_stale_live_list_is_ignored(workers, replay_clock):
+    a, b = workers
+    live = [{"fixture": {"id": 9, "status": {"short": "1H", "elapsed": 30}}}]
+    run(a.publish_live(live, 30))
+
+    replay_clock._now += 50
+    assert run(b.read_live()) == live
+    replay_clock._now += 20
+    assert run(b.read_live()) is None
+    assert b.stale_reads == 1
+
+
+def test_staleness_follows_the_leader_interval(workers, replay_clock):
+    # Líder sem jogos esperando o próximo início: a lista vazia segue válida
+    a, b = workers
+    run(a.publish_live([], main.POLL_INTERVAL_LOW))
+    replay_clock._now += main.POLL_INTERVAL_LOW + main.POLL_INTERVAL_MIN
+    assert run(b.read_live()) == []
+    assert b.stale_reads == 0
@@ -0,0 +1,69 @@
+import main
+
+
+def spend(pool: main.KeyPool, n: int):
+    keys = []
+    for _ in range(n):
+        key = pool.acquire()
+        keys.append(key and key.label)
+        if key:
+            pool.increment(key)
+    return keys
+
+
+def test_from_env_parses_limits(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:5, bbbb2222 ,")
+    assert [k.counter.daily_limit for k in pool.keys] == [5, main.API_DAILY_LIMIT]
+    assert pool.daily_limit == 5 + main.API_DAILY_LIMIT
+
+
+def test_requests_rotate_to_the_key_with_most_headroom(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:3,bbbb2222:3")
+    assert sorted(spend(pool, 4)) == ["…1111", "…1111", "…2222", "…2222"]
+    assert [k.headroom() for k in pool.keys] == [1, 1]
+
+
+def test_throttled_key_is_skipped_until_cooldown(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:10,bbbb2222:10")
+    first, second = pool.keys
+    pool.throttle(first, 30)
+    assert spend(pool, 3) == ["…2222"] * 3
+    assert first.cooling() == 30
+
+    replay_clock._now += 30
+    assert pool.acquire() is first
+
+
+def test_exhausted_pool(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:1,bbbb2222:1")
+    assert None not in spend(pool, 2)
+    assert pool.acquire() is None
+    assert not pool.can_request()
+    assert pool.wait_time() == 0.0
+
+
+def test_all_keys_cooling_reports_shortest_wait(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:5,bbbb2222:5")
+    pool.throttle(pool.keys[0], 20)
+    pool.throttle(pool.keys[1], None)
+    assert pool.acquire() is None
+    assert pool.can_request()
+    assert pool.wait_time() == 20
+
+
+def test_daily_reset_restores_quota(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:1")
+    spend(pool, 1)
+    assert pool.acquire() is None
+    replay_clock._now += 86400
+    assert pool.acquire() is pool.keys[0]
+
+
+def test_sync_remaining_only_raises_count(replay_clock):
+    pool = main.KeyPool.from_env("aaaa1111:100")
+    key = pool.keys[0]
+    spend(pool, 5)
+    pool.sync_remaining(key, 90)
+    assert key.counter.count == 10
+    pool.sync_remaining(key, 95)
+    assert key.counter.count == 10
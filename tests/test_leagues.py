@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+import main
+
+
+def league(league_id=None, name=None, country=None) -> dict:
+    return {"league": {"id": league_id, "name": name, "country": country}}
+
+
+def test_unresolved_filter_matches_exact_name_and_country():
+    name, country = next(iter(main.PRIORITY_LEAGUE_LOOKUP.values()))
+    league_filter = main.LeagueFilter()
+    assert league_filter.live_param == "all"
+    assert league_filter.needs_resolve()
+    assert league_filter.matches(league(1, name.upper(), country))
+    assert not league_filter.matches(league(1, name, "Outro"))
+    assert not league_filter.matches({})
+
+
+def test_resolved_ids_drive_the_live_param_and_matching():
+    league_filter = main.LeagueFilter()
+    league_filter.set_ids([140, 39, 78], "2026-05-02")
+    assert league_filter.live_param == "39-78-140"
+    assert league_filter.matches(league(39))
+    # Resolvido, o nome não conta mais
+    name, country = next(iter(main.PRIORITY_LEAGUE_LOOKUP.values()))
+    assert not league_filter.matches(league(1, name, country))
+
+
+def test_resolution_expires_after_ttl(replay_clock):
+    league_filter = main.LeagueFilter()
+    today = main.clock.now().date()
+    league_filter.set_ids([39], today.isoformat())
+    assert not league_filter.needs_resolve()
+    replay_clock._now += (main.LEAGUE_IDS_TTL_DAYS - 1) * 86400
+    assert not league_filter.needs_resolve()
+    league_filter.set_ids([39], (today - timedelta(days=main.LEAGUE_IDS_TTL_DAYS)).isoformat())
+    assert league_filter.needs_resolve()
+    league_filter.set_ids([], today.isoformat())
+    assert league_filter.needs_resolve() and league_filter.live_param == "all"
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+import main
+
+class FlakyBot(main.FakeBot):
+    """
+    Bot falso que responde flood wait nas primeiras chamadas de um chat
+    """
+    def __init__(self, flood_chat: int, retry_after: int, times: int = 1):
+        super().__init__()
+        self.flood_chat = flood_chat
+        self.retry_after = retry_after
+        self.times = times
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if chat_id == self.flood_chat and self.times:
+            self.times -= 1
+            raise RetryAfter(self.retry_after)
+        return await super().send_message(chat_id, text, parse_mode)
+
+
+def run(scenario, bot):
+    async def go():
+        outbox = main.TelegramOutbox(bot)
+        tasks = [asyncio.create_task(main.clock.run()), asyncio.create_task(outbox.run())]
+        try:
+            return await scenario(outbox)
+        finally:
+            for task in tasks:
+                task.cancel()
+    return asyncio.run(go())
+
+
+def test_pending_edits_are_coalesced(replay_clock):
+    bot = main.FakeBot()
+
+    async def scenario(outbox):
+        mid = await outbox.send(1, "entrada")
+        for text in ("v1", "v2", "v3"):
+            outbox.edit(1, mid, text)
+        await outbox.drain()
+        outbox.edit(1, mid, "v3")
+        await outbox.drain()
+        return outbox
+
+    outbox = run(scenario, bot)
+    edits = [e["text"] for e in bot.transcript if e["kind"] == "edit"]
+    assert edits == ["v3"]
+    assert outbox.coalesced == 2
+    assert outbox.dropped == 1
+
+
+def test_edits_of_different_messages_are_kept(replay_clock):
+    bot = main.FakeBot()
+
+    async def scenario(outbox):
+        first = await outbox.send(1, "a")
+        second = await outbox.send(1, "b")
+        outbox.edit(1, first, "a2")
+        outbox.edit(1, second, "b2")
+        await outbox.drain()
+
+    run(scenario, bot)
+    assert [(e["message_id"], e["text"]) for e in bot.transcript if e["kind"] == "edit"] == [(1, "a2"), (2, "b2")]
+
+
+def test_retry_after_pauses_only_that_chat(replay_clock):
+    bot = FlakyBot(flood_chat=1, retry_after=30)
+
+    async def scenario(outbox):
+        results = await asyncio.gather(outbox.send(1, "lento"), outbox.send(2, "livre"))
+        return outbox, results
+
+    start = replay_clock.time()
+    outbox, results = run(scenario, bot)
+    assert all(results)
+    sent = {e["chat_id"]: e["t"] for e in bot.transcript}
+    assert sent[2] == start
+    assert sent[1] >= start + 30
+    assert outbox.flood_waits == 1
+
+
+def test_retry_after_gives_up_after_max_attempts(replay_clock):
+    bot = FlakyBot(flood_chat=1, retry_after=5, times=main.TELEGRAM_MAX_ATTEMPTS)
+
+    async def scenario(outbox):
+        result = await outbox.send(1, "nunca")
+        return outbox, result
+
+    outbox, result = run(scenario, bot)
+    assert result is None
+    assert outbox.failed == 1
+    assert outbox.flood_waits == main.TELEGRAM_MAX_ATTEMPTS
+    assert bot.transcript == []
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import main
+
+
+def live_fixture(fid: int, minute: int = 30) -> dict:
+    return {"fixture": {"id": fid, "status": {"short": "1H", "elapsed": minute}},
+            "league": {"id": 39, "name": "Premier League"},
+            "teams": {"home": {"id": fid * 10, "name": f"H{fid}"}, "away": {"id": fid * 10 + 1, "name": f"A{fid}"}},
+            "goals": {"home": 0, "away": 0}}
+
+
+class StubClient:
+    """
+    Cliente com o lote controlado pelo teste; conta as consultas individuais
+    """
+    def __init__(self, failed=None, answered=()):
+        self.failed = failed
+        self.answered = set(answered)
+        self.single = []
+
+    async def prefetch_statistics(self, fixture_ids):
+        if self.failed is not None:
+            return set(fixture_ids)
+        for fid in fixture_ids:
+            if fid in self.answered:
+                main.smart_cache.set_stats(fid, {"corners_home": 1, "corners_away": 0, "corners_total": 1}, "1H", 30)
+        return set()
+
+    async def get_full_statistics(self, fixture_id, status=None, minute=None):
+        cached = main.smart_cache.get_stats(fixture_id)
+        if cached:
+            return cached
+        self.single.append(fixture_id)
+        return {"corners_home": 0, "corners_away": 0, "corners_total": 0}
+
+
+def run_chunk(client, fixtures):
+    async def go():
+        pipeline = main.FixturePipeline(client, {})
+        pipeline.start()
+        ticket = main.CycleTicket({"cycle": 1, "processed": len(fixtures)}, time.perf_counter(), None)
+        await pipeline.submit([(m, []) for m in fixtures], ticket)
+        await pipeline.drain()
+        pipeline.stop()
+        return pipeline
+    return asyncio.run(go())
+
+
+def test_failed_batch_defers_without_individual_calls():
+    fixtures = [live_fixture(fid) for fid in range(1, 21)]
+    client = StubClient(failed=True)
+    pipeline = run_chunk(client, fixtures)
+    assert client.single == []
+    assert pipeline.deferred == 20
+    assert pipeline.evaluated == 0
+    assert not pipeline.inflight
+
+
+def test_failed_batch_serves_stale_cache():
+    fixtures = [live_fixture(fid) for fid in range(1, 5)]
+    stats = {"corners_home": 2, "corners_away": 1, "corners_total": 3}
+    main.smart_cache.set_stats(1, stats, "1H", 30)
+    main.smart_cache._stats_cache[1] = (main.clock.monotonic() - 1, stats)
+    client = StubClient(failed=True)
+    pipeline = run_chunk(client, fixtures)
+    assert client.single == []
+    assert pipeline.evaluated == 1
+    assert pipeline.deferred == 3
+
+
+def test_missing_from_successful_batch_falls_back_with_cap():
+    fixtures = [live_fixture(fid) for fid in range(1, 11)]
+    client = StubClient(answered=range(1, 6))
+    pipeline = run_chunk(client, fixtures)
+    assert len(client.single) == main.STATS_FALLBACK_MAX
+    assert pipeline.evaluated == 5 + main.STATS_FALLBACK_MAX
+    assert pipeline.deferred == 5 - main.STATS_FALLBACK_MAX
+
+
+def test_stale_stats_refresh_is_held_until_done():
+    client = main.OptimizedApiClient(None)
+    calls = []
+
+    async def fetch(url, params=None, compact=None):
+        calls.append(params)
+        await asyncio.sleep(0)
+        return {"response": [{"statistics": [{"type": "Corner Kicks", "value": 5}]},
+                             {"statistics": [{"type": "Corner Kicks", "value": 2}]}]}
+
+    client._fetch_json = fetch
+    stale = {"corners_home": 2, "corners_away": 1, "corners_total": 3}
+    main.smart_cache.set_stats(1, stale, "1H", 30)
+    main.smart_cache._stats_cache[1] = (main.clock.monotonic() - 1, stale)
+
+    async def go():
+        assert await client.get_full_statistics(1, "1H", 30) == stale
+        assert await client.get_full_statistics(1, "1H", 30) == stale
+        task = client._refreshing[1]
+        await task
+        await asyncio.sleep(0)
+
+    asyncio.run(go())
+    assert len(calls) == 1
+    assert not client._refreshing
+    assert main.smart_cache.get_stats(1)["corners_total"] == 7
@@ -0,0 +1,88 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+from datetime import datetime
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_tape(path: str, fids=(101, 102, 103), seed: int = 1):
+    """
+    Fita sintética: 110 minutos de três jogos, lista ao vivo e lote de
+    estatísticas a cada minuto
+    """
+    rng = random.Random(seed)
+    t0 = datetime(2026, 5, 2, 15, 0).timestamp()
+    date = datetime.fromtimestamp(t0).strftime("%Y-%m-%d")
+    corners = {fid: [0, 0] for fid in fids}
+
+    def fixture(fid, minute, status):
+        return {"fixture": {"id": fid, "timestamp": int(t0), "status": {"short": status, "elapsed": minute}},
+                "league": {"id": 39, "name": "Premier League", "country": "England"},
+                "teams": {"home": {"id": fid * 10, "name": f"H{fid}"}, "away": {"id": fid * 10 + 1, "name": f"A{fid}"}},
+                "goals": {"home": 0, "away": 0}}
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        def record(t, params, response):
+            f.write(json.dumps({"t": t, "path": "/fixtures", "params": params, "status": 200,
+                                "body": json.dumps({"response": response})}) + "\n")
+
+        record(t0 - 5, {"date": date}, [fixture(fid, None, "NS") for fid in fids])
+        for minute in range(111):
+            status = "1H" if minute <= 45 else "HT" if minute < 60 else "2H" if minute < 110 else "FT"
+            elapsed = min(minute, 45) if minute < 60 else min(minute - 15, 90)
+            for fid in fids:
+                if rng.random() < 0.12 + (fid == fids[0]) * 0.1:
+                    corners[fid][0 if rng.random() < 0.7 else 1] += 1
+            t = t0 + minute * 60
+            record(t, {"live": "all"}, [fixture(fid, elapsed, status) for fid in fids])
+            items = []
+            for fid in fids:
+                item = fixture(fid, elapsed, status)
+                item["statistics"] = [{"team": {}, "statistics": [{"type": "Corner Kicks", "value": corners[fid][0]}]},
+                                      {"team": {}, "statistics": [{"type": "Corner Kicks", "value": corners[fid][1]}]}]
+                items.append(item)
+            record(t, {"ids": "-".join(map(str, fids))}, items)
+
+
+def replay(tmp_path, tape: str, name: str) -> bytes:
+    output = tmp_path / f"{name}.jsonl"
+    env = dict(os.environ, TELEGRAM_TOKEN="x", TAPE_REPLAY=tape, REPLAY_OUTPUT=str(output),
+               STATE_DB=":memory:", TEAM_PROFILE_DB=":memory:", SUBSCRIPTIONS_FILE="")
+    subprocess.run([sys.executable, os.path.join(ROOT, "main.py")], env=env, cwd=tmp_path,
+                   check=True, capture_output=True, timeout=120)
+    return output.read_bytes()
+
+
+def test_replay_is_deterministic(tmp_path):
+    tape = str(tmp_path / "tape.jsonl.gz")
+    write_tape(tape)
+    first = replay(tmp_path, tape, "first")
+    second = replay(tmp_path, tape, "second")
+    assert first == second
+    kinds = [json.loads(line)["kind"] for line in first.splitlines()]
+    assert kinds.count("send") > 1
+
+
+def test_replay_clock_without_ready_queue_still_orders_wakeups():
+    clock = main.ReplayClock(1000.0)
+    clock._ready_queue = lambda: None
+    woke = []
+
+    async def sleeper(tag, delay):
+        await clock.sleep(delay)
+        woke.append((tag, clock.time()))
+
+    async def go():
+        runner = asyncio.ensure_future(clock.run())
+        await asyncio.gather(sleeper("b", 20), sleeper("a", 5), sleeper("c", 20))
+        runner.cancel()
+
+    asyncio.run(go())
+    assert woke == [("a", 1005.0), ("b", 1020.0), ("c", 1020.0)]
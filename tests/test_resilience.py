@@ -0,0 +1,108 @@
+import asyncio
+
+import main
+from main import BreakerState
+
+
+def open_breaker() -> main.CircuitBreaker:
+    breaker = main.CircuitBreaker("test")
+    for _ in range(main.BREAKER_FAILURES):
+        assert breaker.allow()
+        breaker.failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures(replay_clock):
+    breaker = main.CircuitBreaker("test")
+    for _ in range(main.BREAKER_FAILURES - 1):
+        breaker.failure()
+    breaker.success()
+    for _ in range(main.BREAKER_FAILURES - 1):
+        breaker.failure()
+    assert breaker.state is BreakerState.CLOSED
+
+    breaker.failure()
+    assert breaker.state is BreakerState.OPEN
+    assert not breaker.allow()
+    assert breaker.short_circuits == 1
+
+
+def test_half_open_lets_one_probe_and_closes_on_success(replay_clock):
+    breaker = open_breaker()
+    replay_clock._now += main.BREAKER_COOLDOWN
+    assert breaker.allow()
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.success()
+    assert breaker.state is BreakerState.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(replay_clock):
+    breaker = open_breaker()
+    cooldown = main.BREAKER_COOLDOWN
+    for _ in range(10):
+        replay_clock._now += cooldown
+        assert breaker.allow()
+        breaker.failure()
+        cooldown = min(cooldown * 2, main.BREAKER_COOLDOWN_MAX)
+        assert breaker.state is BreakerState.OPEN
+        assert breaker.cooldown == cooldown
+    assert breaker.cooldown == main.BREAKER_COOLDOWN_MAX
+
+    breaker.success()
+    assert breaker.cooldown == main.BREAKER_COOLDOWN
+
+
+def test_released_probe_frees_the_slot(replay_clock):
+    breaker = open_breaker()
+    replay_clock._now += main.BREAKER_COOLDOWN
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_retry_budget_is_earned_by_successes(monkeypatch):
+    monkeypatch.setattr(main, "req_counter", main.KeyPool.from_env("aaaa1111:1000"))
+    budget = main.RetryBudget()
+    spent = sum(budget.spend() for _ in range(main.RETRY_BUDGET_MAX + 3))
+    assert spent == main.RETRY_BUDGET_MAX
+    assert budget.denied == 3
+
+    for _ in range(int(round(1 / main.RETRY_BUDGET_RATIO))):
+        budget.earn()
+    assert budget.spend()
+    assert not budget.spend()
+
+
+def test_retry_budget_keeps_the_daily_reserve(monkeypatch):
+    pool = main.KeyPool.from_env(f"aaaa1111:{main.BUDGET_RESERVE + 1}")
+    monkeypatch.setattr(main, "req_counter", pool)
+    budget = main.RetryBudget()
+    assert budget.spend()
+    pool.increment(pool.keys[0])
+    assert not budget.spend()
+    assert budget.denied == 1
+
+
+def test_no_key_available_is_neutral(replay_clock, monkeypatch):
+    breaker = open_breaker()
+    replay_clock._now += main.BREAKER_COOLDOWN
+    budget = main.RetryBudget()
+    budget.tokens = 0.0
+    monkeypatch.setitem(main.breakers, main.ENDPOINT_STATISTICS, breaker)
+    monkeypatch.setattr(main, "retry_budget", budget)
+    client = main.OptimizedApiClient(None)
+
+    async def no_key():
+        return None
+
+    client._acquire_key = no_key
+    result = asyncio.run(client._fetch_json_upstream(f"{main.BASE}/fixtures/statistics", {"fixture": 1}))
+    assert result is None
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert budget.tokens == 0.0
+    # A sonda não foi gasta: a próxima chamada ainda pode testar a API
+    assert breaker.allow()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+
+
+def baseline_rules(minute, corners, home=None, away=None):
+    """
+    As regras fixas de antes do rules.json, como referência
+    """
+    checks = []
+    if minute is None:
+        return checks
+    if 15 <= minute <= 35 and corners == 4:
+        checks.append("1️⃣ Over HT > 4.5")
+    if 55 <= minute <= 75 and corners in (8, 9):
+        checks.append("2️⃣ Over FT > 9.5")
+    if minute >= 12 and corners >= 3 and home is not None and away is not None:
+        if abs(home - away) >= 3:
+            checks.append("3️⃣ Próximo Escanteio")
+    if minute >= 30 and home is not None and away is not None:
+        if abs(home - away) >= 3 and corners >= 6:
+            checks.append("4️⃣ AH asiático cantos")
+    if minute >= 25 and home is not None and away is not None:
+        if abs(home - away) >= 2 and corners >= 5:
+            checks.append("5️⃣ Cantos por equipe")
+    if minute >= 35 and home is not None and away is not None:
+        if home >= 3 and away >= 3:
+            checks.append("6️⃣ Ambos Times Cantos")
+    if minute >= 15 and corners >= 4:
+        if corners / max(minute, 1) >= 0.20:
+            checks.append("7️⃣ Pressão para próximo canto")
+    return checks
+
+
+@pytest.fixture(scope="module")
+def plan():
+    with open(main.RULES_FILE, encoding="utf-8") as f:
+        return main.compile_rules(json.load(f), main.RULES_FILE)
+
+
+def snapshots():
+    return [(minute, home, away) for minute in range(0, 101) for home in range(12) for away in range(12)]
+
+
+def test_plan_matches_baseline(plan):
+    for minute, home, away in snapshots():
+        assert plan.evaluate(minute, home + away, home, away) == baseline_rules(minute, home + away, home, away)
+
+
+def test_plan_without_sides_matches_baseline(plan):
+    for minute in (None, 0, 14, 15, 30, 35, 60, 90):
+        for total in range(15):
+            assert plan.evaluate(minute, total) == baseline_rules(minute, total)
+
+
+def test_batch_matches_baseline(plan):
+    snaps = snapshots()
+    assert plan.evaluate_batch(snaps) == [baseline_rules(m, h + a, h, a) for m, h, a in snaps]
+
+
+def test_apply_rules_uses_active_plan():
+    assert main.apply_rules_from_values(20, 4, 4, 0) == baseline_rules(20, 4, 4, 0)
+
+
+def test_shared_predicates_compiled_once(plan):
+    assert len(plan.predicates) == len(set(plan.predicates))
+    assert ("minute", ">=", 15) in plan.predicates
+
+
+@pytest.mark.parametrize("config", [
+    {"rules": [{"name": "a", "min_minute": 10}, {"name": "a", "min_minute": 20}]},
+    {"rules": [{"name": "a", "min_minute": "10"}]},
+    {"rules": [{"name": "a", "min_minute": 30, "max_minute": 20}]},
+    {"rules": [{"name": "a", "min_minute": 10, "min_total": 5, "max_total": 4}]},
+    {"rules": [{"name": "a", "min_minute": 10}], "suggestions": [{"bet_type": "Over FT 9.5", "side": "left"}]},
+    {"rules": [{"name": "a", "min_minute": 10}], "suggestions": [{"bet_type": "Over FT 9.5", "requires_rule": "x"}]},
+    {"rules": [{"name": "a", "min_minute": 10, "unknown": 1}]},
+    {"rules": [{"name": "a", "min_minute": 10, "min_rate_10": "0.3"}]},
+])
+def test_invalid_config_rejected(config):
+    with pytest.raises((ValueError, TypeError, KeyError)):
+        main.compile_rules(config, "test")
+
+
+def test_recent_rate_rule_needs_the_window():
+    plan = main.compile_rules({"rules": [
+        {"name": "ritmo", "min_minute": 20, "min_total": 2, "min_rate_10": 0.3},
+        {"name": "total", "min_minute": 20, "min_total": 2},
+    ]}, "test")
+    assert plan.evaluate(30, 4, 2, 2) == ["total"]
+    assert plan.evaluate(30, 4, 2, 2, 0.2) == ["total"]
+    assert plan.evaluate(30, 4, 2, 2, 0.3) == ["ritmo", "total"]
+    assert plan.evaluate(10, 4, 2, 2, 0.5) == []
+    assert plan.predicates[-1] == ("rate_10", ">=", 0.3)
+
+    snaps = [(30, 2, 2), (30, 2, 2), (30, 2, 2), (10, 2, 2)]
+    rates = [None, 0.2, 0.3, 0.5]
+    assert plan.evaluate_batch(snaps, rates) == [plan.evaluate(m, h + a, h, a, r) for (m, h, a), r in zip(snaps, rates)]
+    assert plan.evaluate_batch(snaps) == [["total"]] * 3 + [[]]
+
+
+def test_evaluator_feeds_the_series_before_the_rules(monkeypatch):
+    plan = main.compile_rules({"rules": [{"name": "ritmo", "min_minute": 1, "min_rate_10": 0.3}]}, "test")
+    monkeypatch.setattr(main.rule_engine, "plan", plan)
+    monkeypatch.setattr(main, "corner_series", main.CornerSeriesStore())
+    seen = []
+
+    async def process(m, minute, stats, rules_hit, plan, active_matches, changes):
+        seen.append(rules_hit)
+
+    monkeypatch.setattr(main, "process_fixture", process)
+    main.corner_series.update(1, 20, 1, 0)
+
+    async def go():
+        pipeline = main.FixturePipeline(None, {})
+        pipeline.start()
+        fixture = {"fixture": {"id": 1, "status": {"short": "1H", "elapsed": 30}}}
+        ticket = main.CycleTicket({"cycle": 1, "processed": 1}, 0.0, None)
+        pipeline.inflight.add(1)
+        await pipeline._eval_one(fixture, [], (30, {"corners_home": 4, "corners_away": 1}), ticket)
+        await pipeline.eval_queue.join()
+        pipeline.stop()
+
+    asyncio.run(go())
+    assert seen == [["ritmo"]]
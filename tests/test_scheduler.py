@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def scheduler(replay_clock):
+    return main.BudgetScheduler(main.RequestCounter(1000))
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2026, 5, 2, hour, minute)
+
+
+def test_waits_for_the_next_kickoff_when_nothing_is_expected(scheduler, replay_clock):
+    replay_clock._now = at(12).timestamp()
+    scheduler.set_schedule([at(12, 20), at(15)])
+    assert scheduler.next_interval(0) == 20 * 60
+    assert scheduler.last_decision["reason"] == "aguardando próximo jogo"
+
+
+def test_wait_is_capped_at_the_low_interval(scheduler, replay_clock):
+    replay_clock._now = at(9).timestamp()
+    scheduler.set_schedule([at(15)])
+    assert scheduler.next_interval(0) == main.POLL_INTERVAL_LOW
+
+
+def test_failed_live_fetch_during_matchday_keeps_polling(scheduler, replay_clock):
+    # 8 jogos em andamento, mas a busca ao vivo falhou e voltou vazia
+    replay_clock._now = at(15, 40).timestamp()
+    scheduler.set_schedule([at(15)] * 8)
+    interval = scheduler.next_interval(0)
+    assert scheduler.last_decision["reason"] == "orçamento distribuído"
+    assert interval < main.POLL_INTERVAL_LOW
+    assert interval == scheduler.next_interval(8)
+
+
+def test_interval_spreads_the_remaining_budget(scheduler, replay_clock):
+    replay_clock._now = at(20).timestamp()
+    scheduler.set_schedule([at(20)] * 4)
+    relaxed = scheduler.next_interval(4)
+    scheduler.counter.count = 900
+    assert scheduler.next_interval(4) > relaxed
+    scheduler.counter.count = 1000
+    assert scheduler.next_interval(4) == main.POLL_INTERVAL_LOW
+    assert scheduler.last_decision["reason"] == "orçamento esgotado"
+
+
+def test_interval_never_below_the_minimum(scheduler, replay_clock):
+    replay_clock._now = at(23, 50).timestamp()
+    scheduler.set_schedule([at(23)])
+    assert scheduler.next_interval(1) == main.POLL_INTERVAL_MIN
+
+
+def test_peak_hours_stand_in_for_a_missing_schedule(scheduler, replay_clock):
+    replay_clock._now = at(15).timestamp()
+    scheduler.set_schedule(None)
+    assert scheduler.next_interval(0) < main.POLL_INTERVAL_LOW
+    assert scheduler.last_decision["reason"] == "orçamento distribuído"
@@ -0,0 +1,56 @@
+import main
+
+
+def filled(snapshots, capacity: int = main.CORNER_SERIES_SIZE) -> main.CornerSeries:
+    series = main.CornerSeries(capacity)
+    for snap in snapshots:
+        series.append(*snap)
+    return series
+
+
+def test_ring_wraps_around_keeping_the_newest():
+    series = filled([(m, m, 0) for m in range(10)], capacity=4)
+    assert series.size == 4
+    assert [series.snapshot(i) for i in range(4)] == [(6, 6, 0), (7, 7, 0), (8, 8, 0), (9, 9, 0)]
+    assert series.window(2) == (2, 0, 2)
+
+
+def test_late_snapshot_is_dropped_and_same_minute_overwrites():
+    series = filled([(10, 1, 0), (20, 2, 1)])
+    series.append(15, 9, 9)
+    assert series.size == 2
+    assert series.snapshot(1) == (20, 2, 1)
+    series.append(20, 3, 1)
+    assert series.size == 2
+    assert series.snapshot(1) == (20, 3, 1)
+
+
+def test_window_spans():
+    series = filled([(0, 0, 0), (5, 1, 0), (12, 2, 1), (20, 4, 1), (24, 5, 2)])
+    # Últimos 10 minutos: de 12' (último snapshot até 14') a 24'
+    assert series.window(10) == (3, 1, 12)
+    # Sem snapshot em 19', a janela de 5 começa no anterior e cobre mais
+    assert series.window(5) == (3, 1, 12)
+    assert series.window(4) == (1, 1, 4)
+    # Janela maior que o histórico: cobre só o que existe
+    assert series.window(60) == (5, 2, 24)
+    assert filled([(30, 1, 1)]).window(10) == (0, 0, 0)
+
+
+def test_features():
+    features = filled([(0, 0, 0), (10, 2, 2), (20, 6, 2)]).features()
+    assert features["corners_10"] == 4 and features["span_10"] == 10
+    assert features["home_10"] == 4 and features["away_10"] == 0
+    assert features["rate_10"] == 0.4
+    assert abs(features["momentum"] - (0.4 - 8 / 20)) < 1e-9
+
+
+def test_store_forgets_finished_fixtures():
+    store = main.CornerSeriesStore()
+    store.update(1, 10, 1, 0)
+    assert store.features(1) is None
+    store.update(1, 20, 2, 0)
+    store.update(2, 10, 0, 0)
+    assert store.features(1)["corners_10"] == 1
+    store.forget({2})
+    assert len(store) == 1 and store.features(1) is None
@@ -0,0 +1,182 @@
+import asyncio
+
+import main
+from main import BetKind, BetSuggestion, MatchData, Trigger
+
+FID = 5000
+
+
+def stats(home: int, away: int) -> dict:
+    return {"corners_home": home, "corners_away": away, "corners_total": home + away}
+
+
+def team_stats(home: int, away: int) -> list:
+    return [{"statistics": [{"type": "Corner Kicks", "value": home}]},
+            {"statistics": [{"type": "Corner Kicks", "value": away}]}]
+
+
+def entry(fid: int = FID, minute: int = 20, home: int = 3, away: int = 1) -> MatchData:
+    """
+    Entrada confirmada com uma sugestão de cada tipo
+    """
+    md = MatchData(fid, "H", "A", "Liga", None, minute, home, away)
+    md.suggestions = [
+        BetSuggestion("Próximo Escanteio", None, "", 1.8, home, away, "Mandante", "PENDING"),
+        BetSuggestion("Cantos por equipe", "Mandante", "", 1.8, home, away, None, "PENDING"),
+        BetSuggestion("Over HT 4.5", None, "", 1.8, home, away, None, "PENDING"),
+        BetSuggestion("Over FT 9.5", None, "", 1.8, home, away, None, "PENDING"),
+    ]
+    md.messages = {main.CHAT_ID: 10}
+    md.message_id = 10
+    main.track_entry(md)
+    return md
+
+
+def read(md: MatchData, status: str, minute: int, home: int, away: int) -> set:
+    s = stats(home, away)
+    triggers = main.detect_triggers(md, status, s) | main.settlements.pop_ready(md.fixture_id)
+    main.ResultEvaluator.settle(md, triggers, s, minute)
+    return triggers
+
+
+def results(md: MatchData) -> dict:
+    return {s.kind: s.result for s in md.suggestions}
+
+
+def test_each_event_wakes_only_its_bets():
+    md = entry()
+    assert main.settlements.pending(FID) == 4
+
+    assert read(md, "1H", 22, 3, 1) == set()
+    assert main.settlements.pending(FID) == 4
+
+    assert read(md, "1H", 25, 4, 1) == {Trigger.NEXT_CORNER}
+    assert results(md)[BetKind.NEXT_CORNER] == "GREEN"
+    assert main.settlements.pending(FID) == 3
+
+    assert read(md, "HT", 45, 4, 2) == {Trigger.HALF_TIME}
+    assert results(md)[BetKind.OVER_HT] == "GREEN"
+    assert results(md)[BetKind.OVER_FT] == "PENDING"
+
+    assert read(md, "FT", 90, 6, 2) == {Trigger.FULL_TIME}
+    assert results(md) == {BetKind.NEXT_CORNER: "GREEN", BetKind.TEAM_CORNERS: "GREEN",
+                           BetKind.OVER_HT: "GREEN", BetKind.OVER_FT: "RED"}
+    assert main.settlements.pending(FID) == 0
+    assert md.result_updated
+
+
+def test_half_time_fallback_only_after_the_interval():
+    md = entry(fid=FID)
+    read(md, "1H", 40, 4, 1)
+    for status in ("SUSP", "INT", "BT", "LIVE"):
+        read(md, status, 41, 4, 1)
+        assert md.half_time_corners is None
+        assert results(md)[BetKind.OVER_HT] == "PENDING"
+
+    assert Trigger.HALF_TIME in read(md, "2H", 50, 6, 1)
+    assert md.half_time_corners == 5
+    assert results(md)[BetKind.OVER_HT] == "GREEN"
+
+
+def test_trigger_fired_before_confirmation_is_ready():
+    md = MatchData(FID, "H", "A", "Liga", None, 20, 3, 1)
+    md.suggestions = [BetSuggestion("Próximo Escanteio", None, "", 1.8, 3, 1, "Visitante", "PENDING")]
+    main.detect_triggers(md, "1H", stats(3, 2))
+    md.messages = {main.CHAT_ID: 11}
+    md.message_id = 11
+    main.track_entry(md)
+    assert main.settlements.has_ready(md.fixture_id)
+    read(md, "1H", 22, 3, 2)
+    assert results(md)[BetKind.NEXT_CORNER] == "GREEN"
+
+
+class FailingClient:
+    def __init__(self, items=None):
+        self.items = items or []
+        self.calls = 0
+
+    async def get_final_statistics(self, fixture_id, status, minute):
+        self.calls += 1
+        return None
+
+    async def get_full_statistics(self, fixture_id, status=None, minute=None):
+        self.calls += 1
+        return None
+
+    async def get_fixtures(self, fixture_ids):
+        return [item for item in self.items if item["fixture"]["id"] in fixture_ids]
+
+
+def finished(fid: int, statistics=None) -> dict:
+    item = {"fixture": {"id": fid, "status": {"short": "FT", "elapsed": 90}},
+            "league": {"id": 39, "name": "Liga"}, "goals": {"home": 0, "away": 0}}
+    if statistics is not None:
+        item["statistics"] = statistics
+    return item
+
+
+def test_failed_final_read_settles_nothing_and_retries():
+    md = entry(fid=FID)
+    m = finished(md.fixture_id)
+    main.change_detector.diff_live(m)
+    client = FailingClient()
+    assert asyncio.run(main.load_fixture(client, m, {md.fixture_id: md})) is None
+    assert client.calls == 1
+    assert main.settlements.pending(md.fixture_id) == 4
+    assert not md.is_finished
+    # A leitura perdida não conta como vista: o próximo ciclo processa o jogo de novo
+    assert main.change_detector.diff_live(m)
+
+
+def test_failed_statistics_call_is_not_cached():
+    client = main.OptimizedApiClient(None)
+
+    async def empty(url, params=None, compact=None):
+        return {"response": []}
+
+    async def failed(url, params=None, compact=None):
+        return None
+
+    for fetch in (empty, failed):
+        client._fetch_json = fetch
+        assert asyncio.run(client.get_full_statistics(FID, "2H", 60)) is None
+        assert main.smart_cache.get_stale(FID) is None
+
+
+def test_vanished_fixture_waits_for_both_teams():
+    md = entry(fid=FID)
+    read(md, "1H", 25, 4, 1)
+    active = {md.fixture_id: md}
+
+    client = FailingClient([finished(md.fixture_id, [])])
+    asyncio.run(main.settle_vanished(client, active, set()))
+    assert main.settlements.pending(md.fixture_id) == 3
+    assert not md.is_finished
+
+    md.last_check = 0
+    client.items = [finished(md.fixture_id, team_stats(7, 4))]
+    asyncio.run(main.settle_vanished(client, active, set()))
+    assert main.settlements.pending(md.fixture_id) == 0
+    assert results(md)[BetKind.OVER_FT] == "GREEN"
+
+
+def test_both_sides_moving_between_reads_voids_next_corner():
+    md = entry()
+    md.suggestions.append(BetSuggestion("Próximo Escanteio", None, "", 1.8, 3, 1, "Equilibrado", "PENDING"))
+    main.settlements.forget(FID)
+    main.track_entry(md)
+    greens = main.bot_stats.total_greens
+    reds = main.bot_stats.total_reds
+
+    assert read(md, "1H", 30, 4, 2) == {Trigger.NEXT_CORNER}
+    assert md.next_corner_after_entry == main.NEXT_CORNER_BOTH
+    assert [s.result for s in md.suggestions if s.kind is BetKind.NEXT_CORNER] == ["VOID", "GREEN"]
+    assert main.settlements.pending(FID) == 3
+    assert (main.bot_stats.total_greens, main.bot_stats.total_reds) == (greens + 1, reds)
+
+
+def test_entry_waiting_on_next_corner_is_polled_every_cycle():
+    md = entry()
+    assert main.fixture_poll_delay(30, 3, 1, md) == main.FIXTURE_POLL_HOT
+    read(md, "1H", 31, 3, 2)
+    assert main.fixture_poll_delay(31, 3, 2, md) == main.FIXTURE_POLL_WARM
@@ -0,0 +1,66 @@
+import asyncio
+
+import main
+
+
+def client_with_upstream(delay: float = 0.0):
+    client = main.OptimizedApiClient(None)
+    calls = []
+
+    async def upstream(url, params, compact=None):
+        calls.append((url, params))
+        await asyncio.sleep(delay)
+        return {"response": [params]}
+
+    client._fetch_json_upstream = upstream
+    return client, calls
+
+
+def test_concurrent_identical_calls_share_one_upstream_request():
+    client, calls = client_with_upstream(0.01)
+
+    async def go():
+        return await asyncio.gather(*(client._fetch_json(f"{main.BASE}/fixtures", {"live": "all"})
+                                      for _ in range(5)))
+
+    results = asyncio.run(go())
+    assert len(calls) == 1
+    assert client.upstream_calls == 1 and client.coalesced == 4
+    assert all(r == {"response": [{"live": "all"}]} for r in results)
+    assert not client._inflight
+
+
+def test_different_params_are_not_coalesced():
+    client, calls = client_with_upstream(0.01)
+
+    async def go():
+        await asyncio.gather(client._fetch_json(f"{main.BASE}/fixtures", {"ids": "1-2"}),
+                             client._fetch_json(f"{main.BASE}/fixtures", {"ids": "1-3"}))
+
+    asyncio.run(go())
+    assert len(calls) == 2 and client.coalesced == 0
+
+
+def test_finished_call_is_not_reused():
+    client, calls = client_with_upstream()
+
+    async def go():
+        await client._fetch_json(f"{main.BASE}/fixtures", {"live": "all"})
+        await client._fetch_json(f"{main.BASE}/fixtures", {"live": "all"})
+
+    asyncio.run(go())
+    assert len(calls) == 2 and client.coalesced == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_request():
+    client, calls = client_with_upstream(0.01)
+
+    async def go():
+        first = asyncio.ensure_future(client._fetch_json(f"{main.BASE}/fixtures", {"live": "all"}))
+        second = asyncio.ensure_future(client._fetch_json(f"{main.BASE}/fixtures", {"live": "all"}))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(go()) == {"response": [{"live": "all"}]}
+    assert len(calls) == 1
@@ -0,0 +1,31 @@
+import main
+from main import BetSuggestion, MatchData
+
+
+def pending_matches() -> set:
+    return {key for table, key in main.state_store._pending if table == "matches"}
+
+
+def test_only_changed_entries_are_persisted():
+    md = MatchData(7000, "H", "A", "Liga", 1, 60, 3, 1, messages={main.CHAT_ID: 1})
+    md.suggestions = [BetSuggestion("Over FT 9.5", None, "", 1.8, 3, 1, None, "PENDING")]
+    other = MatchData(7001, "H", "A", "Liga", 2, 60, 0, 0, messages={main.CHAT_ID: 2})
+    active = {md.fixture_id: md, other.fixture_id: other}
+    main.track_entry(md)
+    main.track_entry(other)
+    main.persist_state(active)
+    main.state_store._pending.clear()
+
+    # Leitura sem fato novo no 2º tempo: nada a gravar
+    main.detect_triggers(md, "2H", {"corners_home": 3, "corners_away": 1, "corners_total": 4})
+    main.persist_state(active)
+    assert pending_matches() == set()
+
+    main.detect_triggers(md, "2H", {"corners_home": 4, "corners_away": 1, "corners_total": 5})
+    main.persist_state(active)
+    assert pending_matches() == {md.fixture_id}
+    assert ("kv", "stats_cache") not in main.state_store._pending
+
+    main.state_store._pending.clear()
+    main.persist_state(active)
+    assert pending_matches() == set()
@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+import main
+
+RULE_A = "1️⃣ Over HT > 4.5"
+RULE_B = "3️⃣ Próximo Escanteio"
+
+
+@pytest.fixture(scope="module")
+def index():
+    return main.compile_subscriptions({"chats": [
+        {"chat_id": 10},
+        {"chat_id": 20, "leagues": [39, 140]},
+        {"chat_id": 30, "rules": [RULE_A]},
+        {"chat_id": 40, "leagues": [39], "rules": [RULE_B], "language": "en"},
+    ]}, "test")
+
+
+def brute_force(index, league_id, rules_hit):
+    """
+    Referência: percorre todos os chats
+    """
+    if not rules_hit:
+        return []
+    return sorted(
+        s.chat_id for s in index.by_chat.values()
+        if (s.leagues is None or league_id in s.leagues)
+        and (s.rules is None or any(r in s.rules for r in rules_hit))
+    )
+
+
+def test_main_chat_always_subscribed(index):
+    assert main.CHAT_ID in index.by_chat
+    assert index.by_chat[main.CHAT_ID].leagues is None
+
+
+def test_recipients(index):
+    assert index.recipients(39, [RULE_B]) == [main.CHAT_ID, 10, 20, 40]
+    assert index.recipients(140, [RULE_A]) == [main.CHAT_ID, 10, 20, 30]
+    assert index.recipients(78, [RULE_B]) == [main.CHAT_ID, 10]
+    assert index.recipients(78, [RULE_A, RULE_B]) == [main.CHAT_ID, 10, 30]
+
+
+def test_recipients_match_brute_force(index):
+    rules = [RULE_A, RULE_B, "outra"]
+    for league_id in (None, 39, 140, 78):
+        for n in range(len(rules) + 1):
+            for hit in itertools.combinations(rules, n):
+                if hit:
+                    assert index.recipients(league_id, list(hit)) == brute_force(index, league_id, hit)
+
+
+def test_language(index):
+    assert index.language(40) == "en"
+    assert index.language(10) == main.DEFAULT_LANGUAGE
+    assert index.language(999) == main.DEFAULT_LANGUAGE
+
+
+@pytest.mark.parametrize("data", [
+    {"chats": [{"chat_id": "10"}]},
+    {"chats": [{"chat_id": True}]},
+    {"chats": [{"chat_id": 10}, {"chat_id": 10}]},
+    {"chats": [{"chat_id": 10, "leagues": "39"}]},
+    {"chats": [{"chat_id": 10, "rules": [1]}]},
+    {"chats": [{"chat_id": 10, "language": "xx"}]},
+    {"chats": [{"chat_id": 10, "extra": 1}]},
+])
+def test_invalid_subscriptions_rejected(data):
+    with pytest.raises(ValueError):
+        main.compile_subscriptions(data, "test")
+
+
+def test_subscribed_leagues_are_fetched(index):
+    assert index.leagues == {39, 140}
+    league_filter = main.LeagueFilter()
+    league_filter.set_extra_ids(frozenset({39, 999}))
+    assert league_filter.live_param == "all"
+    assert league_filter.matches({"league": {"id": 999, "name": "Liga Local", "country": "X"}})
+
+    league_filter.set_ids([39, 140], "2026-05-02")
+    assert league_filter.live_param == "39-140-999"
+    assert league_filter.matches({"league": {"id": 999}})
+    assert not league_filter.matches({"league": {"id": 78}})